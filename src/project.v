@@ -5,6 +5,32 @@
 
 `default_nettype none
 
+// Pipeline registers in the styler (0, 1 or 2): the styled bitmap is read
+// this many clocks after the inputs that produce it.
+`ifndef STYLER_PIPELINE
+`define STYLER_PIPELINE 0
+`endif
+
+// Styler lanes (1 or 2): with 2, a second lane styles the next character
+// alongside the first one.
+`ifndef STYLER_LANES
+`define STYLER_LANES 1
+`endif
+
+// Modes built in, as a mask of the mode bits in ATTR3: 2 burst, 4 stream,
+// 8 shift, 16 buffer, 32 line, 64 cursor, 128 blink. A mode that is not
+// built reads back as 0 when set. The default, burst, stream and line
+// modes, fits a 1x1 tile; every mode (254) with the palette does not.
+`ifndef STYLER_MODES
+`define STYLER_MODES 38
+`endif
+
+// Attribute palette (0 or 1): with 1, the store and recall commands copy
+// the attributes to and from four palette entries; with 0 they are ignored.
+`ifndef STYLER_PALETTE
+`define STYLER_PALETTE 0
+`endif
+
 module tt_um_rebeccargb_styler (
     input  wire [7:0] ui_in,    // Dedicated inputs
     output wire [7:0] uo_out,   // Dedicated outputs
@@ -22,14 +48,125 @@ module tt_um_rebeccargb_styler (
   reg [15:0] bitmapIn;
   wire [15:0] bitmapOut;
   reg [24:0] attr;
+  reg [6:0] mode;
+
+  localparam PIPELINE = `STYLER_PIPELINE;
+  localparam DUAL = (`STYLER_LANES == 2);
+  localparam [7:0] MODES = `STYLER_MODES;
+  localparam PALETTE = (`STYLER_PALETTE == 1);
+
+  // A clock with /OE and /WE both low is a command cycle: ui_in[2:0] is
+  // the command and the bidirectional pins are its operand.
+  wire writeCycle = ~ui_in[7] & ui_in[6];
+  wire commandCycle = ~ui_in[7] & ~ui_in[6];
+
+  // Buffer mode: writes go to shadow registers, which the commit command
+  // copies to the active registers all at once.
+  reg [7:0] ctrlNext;
+  reg [15:0] bitmapNext;
+  reg [24:0] attrNext;
+  wire bufferEnable = MODES[4] & mode[3];
+
+  // Attribute palette: the store command copies the attributes to an entry
+  // and the recall command copies an entry back to the attributes.
+  reg [24:0] palette [0:3];
+
+  // Burst mode: repeated accesses to the same address in the same
+  // direction step through ATTR0-ATTR3 or BMAP low-high. Any other access,
+  // or a clock with both /OE and /WE high, starts a new burst.
+  reg [2:0] burstAddr;
+  reg burstWrite;
+  reg burstValid;
+  reg [1:0] burstCount;
+
+  wire burstEnable = MODES[1] & mode[0];
+  wire burstHit = (
+    burstEnable & burstValid &
+    (burstAddr == ui_in[2:0]) & (burstWrite == ~ui_in[7])
+  );
+  wire [1:0] burstOffset = burstHit ? burstCount : 2'd0;
+
+  wire [2:0] addr = (
+    ui_in[2] ? {1'b1, ui_in[1:0] + burstOffset} :
+    ui_in[1] ? {2'b01, ui_in[0] ^ burstOffset[0]} :
+    ui_in[2:0]
+  );
+
+  // Dual lanes: the second lane has its own bitmap and attribute registers
+  // and its own styler, and shares everything else. The lane bit written
+  // with the scanline selects the lane accessed at addresses 0 and 2-7. A
+  // bitmap burst goes on to the other lane after the high byte, and a burst
+  // read of the logical scanline alternates between the lanes. The second
+  // lane is only built with two lanes (see lane1 below); with one, its
+  // attributes and outputs are 0.
+  reg lane;
+  wire [24:0] attr1;
+  wire [24:0] attrNext1;
+  wire [3:0] scanlineOut1;
+  wire [15:0] bitmapOut1;
+  wire laneOffset = (
+    ui_in[2] ? 1'b0 :
+    ui_in[1] ? burstOffset[1] :
+    ui_in[7] & ~ui_in[0] & burstOffset[0]
+  );
+  wire accessLane = DUAL & (lane ^ laneOffset);
+
+  // Stream mode: while the bitmap is written, the dedicated outputs present
+  // the styled bitmap latched when the previous row was completed.
+  // Line mode: completing a row also advances the scanline, so the row is
+  // latched the same way.
+  reg [15:0] streamOut;
+  wire streamEnable = MODES[2] & mode[1] & ~bufferEnable;
+  wire lineAuto = MODES[5] & mode[4] & ~bufferEnable;
+  wire latchEnable = streamEnable | lineAuto;
+  wire streamLine = streamEnable & ~lineAuto & ui_in[6] & (addr == 3'd0);
+  wire streamLoad = latchEnable & writeCycle & (addr == 3'd3) & ~accessLane;
+  wire [3:0] styleScanline = streamLine ? uio_in[3:0] : scanlineIn;
+  wire [15:0] styleBitmap = streamLoad ? {uio_in, bitmapIn[7:0]} : bitmapIn;
+
+  // With pipeline registers, the row is latched when its styled bitmap
+  // comes out of the styler, PIPELINE clocks after it was completed.
+  reg [1:0] streamLoadPipe;
+  wire [2:0] streamLoads = {streamLoadPipe, streamLoad};
+  wire streamCapture = streamLoads[PIPELINE];
+
+  // Shift mode: uo_out[7] shifts out the styled bitmap, left pixel first,
+  // one pixel per clock, reloading every 16 clocks without a gap.
+  reg [15:0] shiftOut;
+  reg [3:0] shiftCount;
+  wire shiftEnable = MODES[3] & mode[2];
+
+  // Cursor mode: the cursor is shown on the character whose column and row
+  // match the cursor position, instead of following ui_in[5]. The character
+  // counter advances as each character's bitmap is loaded (or committed in
+  // buffer mode) and is reset by hsync; the row counter advances when hsync
+  // wraps the scanline and is reset by vsync.
+  reg [7:0] cursorColumn;
+  reg [7:0] cursorRow;
+  reg [7:0] charCount;
+  reg [7:0] rowCount;
+  wire cursorAuto = MODES[6] & mode[5];
+  wire charAdvance = (
+    bufferEnable ? commandCycle & (ui_in[2:0] == 3'd0) :
+    writeCycle & (addr == 3'd2) & ~accessLane
+  );
+  wire cursorMatch = (charCount == cursorColumn) & (rowCount == cursorRow);
+
+  // Blink mode: the blink phase, and the cursor phase if decoupled, come
+  // from a frame counter advanced by vsync, toggling every 2**rate frames.
+  reg [7:0] frameCount;
+  reg [2:0] blinkRate;
+  reg [2:0] cursorRate;
+  wire blinkAuto = MODES[7] & mode[6];
 
   wire faintPhase = ui_in[3] & ~ctrl[7];
-  wire blinkPhase = ui_in[4];
-  wire cursorPhase = ctrl[7] ? ui_in[3] : ~ui_in[4];
-  wire cursorEnable = ui_in[5] & ctrl[3];
+  wire blinkPhase = blinkAuto ? frameCount[blinkRate] : ui_in[4];
+  wire cursorPhase = ctrl[7] ? (blinkAuto ? frameCount[cursorRate] : ui_in[3]) : ~blinkPhase;
+  wire cursorEnable = (cursorAuto ? cursorMatch : ui_in[5]) & ctrl[3];
 
-  styler s(
-    .scanlineIn(scanlineIn), .bitmapIn(bitmapIn),
+  styler #(.PIPELINE(PIPELINE)) s(
+    .clk(clk),
+    .scanlineIn(styleScanline), .bitmapIn(styleBitmap),
     .xoffset(attr[0]), .xscale(attr[1]),
     .yoffset(attr[2]), .yscale(attr[3]),
     .xPreMirror(attr[4]), .xPostMirror(attr[5]),
@@ -46,50 +183,237 @@ module tt_um_rebeccargb_styler (
     .scanlineOut(scanlineOut), .bitmapOut(bitmapOut)
   );
 
+  // The second lane is never latched or shifted, and always takes the
+  // cursor from ui_in[5]. It has its own registers, written like the
+  // first lane's when it is accessed, committed along with them, and
+  // recalled into when it is selected.
+  generate if (DUAL) begin : lane1
+    reg [15:0] bitmapIn1;
+    reg [24:0] attr1Reg;
+    reg [15:0] bitmapNext1;
+    reg [24:0] attrNext1Reg;
+
+    assign attr1 = attr1Reg;
+    assign attrNext1 = attrNext1Reg;
+
+    styler #(.PIPELINE(PIPELINE)) s1(
+      .clk(clk),
+      .scanlineIn(scanlineIn), .bitmapIn(bitmapIn1),
+      .xoffset(attr1[0]), .xscale(attr1[1]),
+      .yoffset(attr1[2]), .yscale(attr1[3]),
+      .xPreMirror(attr1[4]), .xPostMirror(attr1[5]),
+      .yPreMirror(attr1[6]), .yPostMirror(attr1[7]),
+      .bold(attr1[8]), .faint(attr1[9]), .italic(attr1[10]), .reverseItalic(attr1[11]),
+      .blink(attr1[12]), .alternate(attr1[13]), .inverse(attr1[14]), .hidden(attr1[15]),
+      .underline(attr1[16]), .doubleUnderline(attr1[17]), .dottedUnderline(attr1[18]),
+      .strikethru(attr1[19]), .doubleStrikethru(attr1[20]), .dottedStrikethru(attr1[21]),
+      .overline(attr1[22]), .doubleOverline(attr1[23]), .dottedOverline(attr1[24]),
+      .extraBold(ctrl[6]), .blinkEnable(ctrl[5]), .lineEnable(ctrl[4]),
+      .cursorEnable(ui_in[5] & ctrl[3]), .cursorBlink(ctrl[2]),
+      .cursorTop(ctrl[1]), .cursorBottom(ctrl[0]),
+      .faintPhase(faintPhase), .blinkPhase(blinkPhase), .cursorPhase(cursorPhase),
+      .scanlineOut(scanlineOut1), .bitmapOut(bitmapOut1)
+    );
+
+    task writeLane1; begin
+      case (addr)
+        2: bitmapNext1[7:0] <= uio_in;
+        3: bitmapNext1[15:8] <= uio_in;
+        4: attrNext1Reg[7:0] <= uio_in;
+        5: attrNext1Reg[15:8] <= uio_in;
+        6: attrNext1Reg[23:16] <= uio_in;
+        7: attrNext1Reg[24] <= uio_in[0];
+        default: ;
+      endcase
+      if (~bufferEnable) begin
+        case (addr)
+          2: bitmapIn1[7:0] <= uio_in;
+          3: bitmapIn1[15:8] <= uio_in;
+          4: attr1Reg[7:0] <= uio_in;
+          5: attr1Reg[15:8] <= uio_in;
+          6: attr1Reg[23:16] <= uio_in;
+          7: attr1Reg[24] <= uio_in[0];
+          default: ;
+        endcase
+      end
+    end endtask
+
+    always @(posedge clk) begin
+      if (~rst_n) begin
+        bitmapIn1 <= 16'h0000;
+        attr1Reg <= 25'h0000000;
+        bitmapNext1 <= 16'h0000;
+        attrNext1Reg <= 25'h0000000;
+      end else begin
+        if (writeCycle & accessLane) writeLane1;
+        if (commandCycle & (ui_in[2:0] == 3'd0) & MODES[4]) begin
+          bitmapIn1 <= bitmapNext1;
+          attr1Reg <= attrNext1Reg;
+        end
+        if (commandCycle & (ui_in[2:0] == 3'd2) & PALETTE & lane) begin
+          attrNext1Reg <= palette[uio_in[1:0]];
+          if (~bufferEnable) attr1Reg <= palette[uio_in[1:0]];
+        end
+      end
+    end
+  end else begin
+    assign attr1 = 25'h0000000;
+    assign attrNext1 = 25'h0000000;
+    assign scanlineOut1 = 4'h0;
+    assign bitmapOut1 = 16'h0000;
+  end endgenerate
+
+  wire [24:0] attrRead = accessLane ? attr1 : attr;
+
   wire [7:0] a8 = (
-    ui_in[1] ?
-    (ui_in[0] ? {7'b0, attr[24]} : attr[23:16]) :
-    (ui_in[0] ? attr[15:8] : attr[7:0])
+    addr[1] ?
+    (addr[0] ? {mode, attrRead[24]} : attrRead[23:16]) :
+    (addr[0] ? attrRead[15:8] : attrRead[7:0])
   );
 
+  wire [15:0] b16 = latchEnable ? streamOut : bitmapOut;
+  wire [15:0] bitmapRead = accessLane ? bitmapOut1 : b16;
+
   wire [7:0] b8 = (
-    ui_in[0] ? bitmapOut[15:8] : bitmapOut[7:0]
+    addr[0] ? bitmapRead[15:8] : bitmapRead[7:0]
   );
 
   wire [7:0] f8 = (
-    ui_in[2] ? a8 :
-    ui_in[1] ? b8 :
-    ui_in[0] ? ctrl :
-    {4'b0, scanlineOut}
+    addr[2] ? a8 :
+    addr[1] ? b8 :
+    addr[0] ? ctrl :
+    {4'b0, accessLane ? scanlineOut1 : scanlineOut}
   );
 
-  assign uo_out  = f8;
+  assign uo_out  = shiftEnable ? {shiftOut[15], f8[6:0]} : f8;
   assign uio_out = f8;
-  assign uio_oe  = {8{~ui_in[6]}};
+  assign uio_oe  = {8{~ui_in[6] & ui_in[7]}};
 
   task reset; begin
     scanlineIn <= 4'h0;
     ctrl <= 8'h3C;
     bitmapIn <= 16'h0000;
     attr <= 25'h0000000;
+    ctrlNext <= 8'h3C;
+    bitmapNext <= 16'h0000;
+    attrNext <= 25'h0000000;
+    lane <= 1'b0;
+    palette[0] <= 25'h0000000;
+    palette[1] <= 25'h0000000;
+    palette[2] <= 25'h0000000;
+    palette[3] <= 25'h0000000;
+    mode <= 7'h00;
+    burstAddr <= 3'h0;
+    burstWrite <= 1'b0;
+    burstValid <= 1'b0;
+    burstCount <= 2'h0;
+    streamOut <= 16'h0000;
+    streamLoadPipe <= 2'b00;
+    shiftOut <= 16'h0000;
+    shiftCount <= 4'h0;
+    cursorColumn <= 8'h00;
+    cursorRow <= 8'h00;
+    charCount <= 8'hFF;
+    rowCount <= 8'h00;
+    frameCount <= 8'h00;
+    blinkRate <= 3'd4;
+    cursorRate <= 3'd4;
   end endtask
 
   task write; begin
+    case (addr)
+      0: begin scanlineIn <= uio_in[3:0]; lane <= DUAL & uio_in[4]; end
+      1: begin ctrlNext <= uio_in; if (~bufferEnable) ctrl <= uio_in; end
+      7: mode <= uio_in[7:1] & MODES[7:1];
+      default: ;
+    endcase
+    if (~accessLane) writeLane0;
+  end endtask
+
+  task writeLane0; begin
+    case (addr)
+      2: bitmapNext[7:0] <= uio_in;
+      3: bitmapNext[15:8] <= uio_in;
+      4: attrNext[7:0] <= uio_in;
+      5: attrNext[15:8] <= uio_in;
+      6: attrNext[23:16] <= uio_in;
+      7: attrNext[24] <= uio_in[0];
+      default: ;
+    endcase
+    if (~bufferEnable) begin
+      case (addr)
+        2: bitmapIn[7:0] <= uio_in;
+        3: bitmapIn[15:8] <= uio_in;
+        4: attr[7:0] <= uio_in;
+        5: attr[15:8] <= uio_in;
+        6: attr[23:16] <= uio_in;
+        7: attr[24] <= uio_in[0];
+        default: ;
+      endcase
+    end
+  end endtask
+
+  task command; begin
     case (ui_in[2:0])
-      0: scanlineIn <= uio_in[3:0];
-      1: ctrl <= uio_in;
-      2: bitmapIn[7:0] <= uio_in;
-      3: bitmapIn[15:8] <= uio_in;
-      4: attr[7:0] <= uio_in;
-      5: attr[15:8] <= uio_in;
-      6: attr[23:16] <= uio_in;
-      7: attr[24] <= uio_in[0];
+      0: if (MODES[4]) begin
+        ctrl <= ctrlNext;
+        bitmapIn <= bitmapNext;
+        attr <= attrNext;
+      end
+      1: if (PALETTE) begin
+        // (without buffer mode, the shadow attributes are the attributes)
+        if (MODES[4]) palette[uio_in[1:0]] <= lane ? attrNext1 : attrNext;
+        else palette[uio_in[1:0]] <= lane ? attr1 : attr;
+      end
+      2: if (PALETTE & ~lane) begin
+        attrNext <= palette[uio_in[1:0]];
+        if (~bufferEnable) attr <= palette[uio_in[1:0]];
+      end
+      3: begin
+        scanlineIn <= scanlineIn + 4'd1;
+        charCount <= 8'hFF;
+        if (&scanlineIn) rowCount <= rowCount + 8'd1;
+      end
+      4: begin
+        scanlineIn <= 4'h0;
+        charCount <= 8'hFF;
+        rowCount <= 8'h00;
+        frameCount <= frameCount + 8'd1;
+      end
+      5: cursorColumn <= uio_in;
+      6: cursorRow <= uio_in;
+      7: begin
+        blinkRate <= uio_in[2:0];
+        cursorRate <= uio_in[6:4];
+      end
     endcase
   end endtask
 
+  task burst; begin
+    burstAddr <= ui_in[2:0];
+    burstWrite <= ~ui_in[7];
+    burstValid <= ui_in[7] ^ ui_in[6];
+    burstCount <= burstOffset + 2'd1;
+  end endtask
+
+  task shift; begin
+    if (shiftEnable & ~&shiftCount) shiftOut <= {shiftOut[14:0], 1'b0};
+    else shiftOut <= b16;
+    shiftCount <= shiftEnable ? shiftCount + 4'd1 : 4'd0;
+  end endtask
+
   always @(posedge clk) begin
     if (~rst_n) reset;
-    else if (~ui_in[7]) write;
+    else begin
+      shift;
+      if (writeCycle) write;
+      if (commandCycle) command;
+      if (streamCapture) streamOut <= bitmapOut;
+      streamLoadPipe <= streamLoads[1:0];
+      if (streamLoad & lineAuto) scanlineIn <= scanlineIn + 4'd1;
+      if (charAdvance) charCount <= charCount + 8'd1;
+      burst;
+    end
   end
 
   // List all unused inputs to prevent warnings
@@ -135,7 +135,10 @@ module styler_invert (
 endmodule
 
 
-module styler (
+module styler #(
+	parameter PIPELINE = 0
+) (
+	input wire clk,
 	input wire [3:0] scanlineIn,
 	input wire [15:0] bitmapIn,
 	input wire xoffset,
@@ -229,19 +232,40 @@ module styler (
 		bitmapInt
 	);
 
+	// Optional pipeline registers for a shorter critical path. With
+	// PIPELINE = 1 the styled bitmap is registered; with PIPELINE = 2 the
+	// inputs of styler_invert are registered as well. bitmapOut is then the
+	// result for the inputs PIPELINE clocks earlier. scanlineOut is never
+	// registered, since it selects the next bitmap row.
+	wire [25:0] invertIn = {
+		bitmapInt, blink, alternate, inverseInt, hidden, blinkPhase,
+		blinkEnable, faintInt, faintPhaseInt, solidLineInt, xPostMirror
+	};
+	reg [25:0] invertReg;
+	wire [25:0] invertStage = (PIPELINE >= 2) ? invertReg : invertIn;
+	wire [15:0] bitmapStyled;
+	reg [15:0] bitmapReg;
+
+	always @(posedge clk) begin
+		invertReg <= invertIn;
+		bitmapReg <= bitmapStyled;
+	end
+
 	styler_invert inv(
-		bitmapInt,
-		blink,
-		alternate,
-		inverseInt,
-		hidden,
-		blinkPhase,
-		blinkEnable,
-		faintInt,
-		faintPhaseInt,
-		solidLineInt,
-		xPostMirror,
-		bitmapOut
+		invertStage[25:10],
+		invertStage[9],
+		invertStage[8],
+		invertStage[7],
+		invertStage[6],
+		invertStage[5],
+		invertStage[4],
+		invertStage[3],
+		invertStage[2],
+		invertStage[1],
+		invertStage[0],
+		bitmapStyled
 	);
 
+	assign bitmapOut = (PIPELINE >= 1) ? bitmapReg : bitmapStyled;
+
 endmodule
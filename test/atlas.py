@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Pre-styled font atlas: every glyph of a font styled with every style
+# (phase pins and attr word) in a screen's working set, in one array('H'),
+# so that drawing a frame is a gather of rows from the atlas with no
+# styling at all. Screens tend to use a handful of attribute words across
+# thousands of cells, so the atlas is small next to the work it saves.
+#
+# The atlas is laid out by scanline: plane s holds scanline s of every
+# (style, glyph) pair, and the pair's key is the same in each plane. A row
+# of cells is therefore the same gather in all 16 planes (operator.itemgetter
+# over the keys of the row, built once per row). Atlas.logical gives the
+# logical scanline (styler_linegen's bitmap scanline) read from the font for
+# each physical scanline of a style: the rows Y_SCALE and Y_OFFSET cells
+# take from the font, for a host that feeds the chip the rows itself.
+#
+# Run as a script, it builds the atlas for a screen of text and reports the
+# build time and memory, and the time to draw a frame from the atlas and
+# with video.render:
+#
+#   ./atlas.py --mode 800x600@60
+#   ./atlas.py --font /usr/share/consolefonts/Lat15-Terminus16.psf.gz --phases 2 --all-glyphs
+
+import argparse
+import array
+import operator
+import random
+import sys
+import time
+
+import model
+import video
+from font import Font, load as load_font
+from model import CURSOR, CTRL_DEFAULT
+
+ROWS = 16
+
+
+def screen_styles(screen, phase=0):
+    """Return the (phase, attr) styles of the cells of screen, the cursor cell with the CURSOR pin HIGH."""
+    styles = {(phase, attr) for attr in screen.attrs}
+    if screen.cursor is not None:
+        x, y = screen.cursor
+        styles.add((phase | CURSOR, screen.attrs[y * screen.columns + x]))
+    return sorted(styles)
+
+
+def screen_glyphs(screen):
+    """Return the glyphs of the cells of screen."""
+    return sorted(set(screen.glyphs))
+
+
+class Atlas:
+    """Every glyph of font (or of glyphs) styled with each (phase, attr) of styles, by scanline."""
+
+    def __init__(self, font, styles, ctrl=CTRL_DEFAULT, glyphs=None, style_glyphs=model.style_glyphs):
+        self.ctrl = ctrl
+        self.styles = list(styles)
+        self.glyphs = range(len(font)) if glyphs is None else list(glyphs)
+        # Slots of the styles and glyphs in each plane
+        self.style_slot = {style: slot for slot, style in enumerate(self.styles)}
+        self.glyph_slot = None if glyphs is None else {glyph: slot for slot, glyph in enumerate(self.glyphs)}
+        self.size = len(self.styles) * len(self.glyphs)
+        self.rows = array.array("H", bytes(2 * ROWS * self.size))
+        self.logical = {}
+        rows = [font[glyph] for glyph in self.glyphs]
+        for slot, (phase, attr) in enumerate(self.styles):
+            self.logical[phase, attr] = bytes(model.styler(phase, ctrl, attr, s, 0)[0] for s in range(ROWS))
+            styled = style_glyphs(phase, ctrl, attr, rows)
+            start = slot * len(self.glyphs)
+            for scanline in range(ROWS):
+                base = scanline * self.size + start
+                self.rows[base:base + len(styled)] = array.array("H", [glyph[scanline] for glyph in styled])
+        self.planes = [memoryview(self.rows)[s * self.size:(s + 1) * self.size] for s in range(ROWS)]
+
+    def key(self, phase, attr, glyph):
+        """Return the index of the styled glyph in each plane."""
+        glyph_slot = glyph if self.glyph_slot is None else self.glyph_slot[glyph]
+        return self.style_slot[phase, attr] * len(self.glyphs) + glyph_slot
+
+    def glyph(self, phase, attr, glyph):
+        """Return the 16 styled rows of glyph, as model.style_glyph would."""
+        key = self.key(phase, attr, glyph)
+        return [plane[key] for plane in self.planes]
+
+
+def render(mode, screen, atlas, phase=0, frame=None, rows=None):
+    """Draw screen into frame (a new video.Frame by default) from atlas, as video.render would; return the frame.
+
+    atlas must hold every style of screen_styles(screen, phase) and every glyph of screen.
+    rows is the range of rows of cells to draw (default: all of them).
+    """
+    if frame is None:
+        frame = video.Frame(mode)
+    columns = screen.columns
+    every = range(min(screen.rows, mode.v_active // ROWS))
+    for row in every if rows is None else every[rows.start:rows.stop]:
+        start = row * columns
+        keys = [
+            atlas.key(phase, attr, glyph)
+            for glyph, attr in zip(screen.glyphs[start:start + columns], screen.attrs[start:start + columns])
+        ]
+        if screen.cursor is not None and screen.cursor[1] == row:
+            x = screen.cursor[0]
+            keys[x] = atlas.key(phase | CURSOR, screen.attrs[start + x], screen.glyphs[start + x])
+        gather = operator.itemgetter(*keys)
+        for scanline, plane in enumerate(atlas.planes):
+            values = gather(plane)
+            # itemgetter of a single key gives the value itself
+            line = array.array("H", values if columns > 1 else [values])
+            if sys.byteorder == "little":
+                line.byteswap()
+            frame.row(row * ROWS + scanline)[:2 * columns] = memoryview(line).cast("B")
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a pre-styled font atlas for a screen and draw frames from it.")
+    parser.add_argument("--mode", default="640x480@60", choices=sorted(video.MODES),
+                        help="video mode (default: 640x480@60)")
+    parser.add_argument("--font", help="PSF or BDF font (default: random glyphs)")
+    parser.add_argument("--all-glyphs", action="store_true",
+                        help="style every glyph of the font, not only those on the screen")
+    parser.add_argument("--phases", type=int, default=1, choices=[1, 2],
+                        help="blink phases to build the atlas for (default: 1)")
+    parser.add_argument("--frames", type=int, default=8, help="frames to draw for the render times (default: 8)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mode = video.MODES[args.mode]
+    font = load_font(args.font) if args.font else video.sample_font(rng)
+    screen = video.sample_screen(rng, mode, font.index if isinstance(font, Font) else None)
+    phases = [0, model.BLINK_PHASE][:args.phases]
+    styles = sorted({style for phase in phases for style in screen_styles(screen, phase)})
+
+    start = time.perf_counter()
+    atlas = Atlas(font, styles, glyphs=None if args.all_glyphs else screen_glyphs(screen))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.mode}: atlas of {len(atlas.glyphs)} glyphs in {len(styles)} styles, "
+        f"{atlas.rows.itemsize * len(atlas.rows) / 1024:.0f} KiB, built in {elapsed * 1e3:.0f} ms"
+    )
+    for name, draw in (
+        ("atlas", lambda phase, frame: render(mode, screen, atlas, phase, frame)),
+        ("video.render", lambda phase, frame: video.render(mode, screen, font, phase=phase, frame=frame)),
+    ):
+        frame = video.Frame(mode)
+        start = time.perf_counter()
+        for number in range(args.frames):
+            draw(phases[number % len(phases)], frame)
+        elapsed = (time.perf_counter() - start) / args.frames
+        print(f"  {name}: {elapsed * 1e3:.2f} ms per frame")
+    for phase in phases:
+        assert render(mode, screen, atlas, phase).pixels == video.render(mode, screen, font, phase=phase).pixels
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Benchmark workload: a fixed, seeded list of random vectors, each one
+# driven through the DUT and checked against the Python model.
+#
+#   make MODULE=bench BENCH_VECTORS=10000 BENCH_ACCESS=backdoor
+#
+# BENCH_VECTORS  number of vectors (default 10000)
+# BENCH_SEED     random seed (default 1)
+# BENCH_ACCESS   frontdoor or backdoor (default frontdoor)
+# BENCH_CYCLES   clocks per frontdoor bus operation, 3 or 1 (default 3)
+# BENCH_RESULT   if set, a JSON summary is written to this file
+#
+# run_bench.py runs this under several configurations and collects the
+# results into a CSV file.
+
+import json
+import os
+import random
+import time
+
+import cocotb
+
+from driver import reset, Frontdoor, Backdoor
+from model import styler, random_vector
+from shrink import explain
+
+
+@cocotb.test()
+async def bench(dut):
+    vectors = int(os.environ.get("BENCH_VECTORS", "10000"))
+    seed = int(os.environ.get("BENCH_SEED", "1"))
+    access = os.environ.get("BENCH_ACCESS", "frontdoor")
+    cycles = int(os.environ.get("BENCH_CYCLES", "3"))
+
+    await reset(dut)
+
+    if access == "backdoor":
+        drv = Backdoor(dut)
+    else:
+        drv = Frontdoor(dut, cycles)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(vectors):
+        vector = random_vector(rng)
+        if await drv.style(*vector) != styler(*vector):
+            # Shrink the row as a glyph using the same bitmap for every row.
+            phase, ctrl, attr, scanline, bitmap = vector
+            raise AssertionError(await explain(dut, (phase, ctrl, attr, (bitmap,) * 16)))
+    elapsed = time.perf_counter() - start
+
+    dut._log.info(f"{vectors} vectors in {elapsed:.3f} s ({vectors / elapsed:.1f} vectors/s)")
+
+    if os.environ.get("BENCH_RESULT"):
+        with open(os.environ["BENCH_RESULT"], "w") as f:
+            json.dump({"vectors": vectors, "seed": seed, "seconds": elapsed}, f)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# A virtual tt_um_rebeccargb_styler for host software, served at the pin
+# level over a Unix socket, with model.Chip standing in for the chip.
+#
+# Each connection is a chip of its own, reset when it connects. With --pty
+# the chip is served on a pseudo-terminal instead, as a stand-in for a
+# board on a serial port (see host.SerialBackend). A client sends frames
+# of clock cycles and gets back a frame of outputs, all integers little
+# endian:
+#
+#   request   u32 count, then count cycles of 3 bytes: ui_in, uio_in, rst_n
+#   response  u32 count, then count cycles of 3 bytes: uo_out, uio_out, uio_oe
+#
+# The outputs of each cycle are those with its inputs applied, before the
+# rising edge of clk that ends it (where the test drivers sample them, at
+# the falling edge). A request of zero cycles is answered with the
+# connection's statistics instead: u32 length, then that many bytes of
+# JSON. The statistics are also logged when the client disconnects.
+#
+# bench sends random pin sequences in frames of --batch cycles and reports
+# the round trip latency and the cycles per second, both seen by the client
+# and spent in the model. Without --socket it serves a chip of its own.
+#
+#   ./chipserver.py serve --socket /tmp/styler.sock
+#   ./chipserver.py serve --pty
+#   ./chipserver.py bench --socket /tmp/styler.sock --frames 200 --batch 4096
+#   ./chipserver.py bench --pipeline 2 --lanes 2
+#   ./chipserver.py serve --pty --modes 254 --palette
+
+import argparse
+import collections
+import json
+import os
+import random
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import model
+
+HEADER = struct.Struct("<I")
+
+# Largest frame accepted, in cycles; anything bigger closes the connection.
+MAX_CYCLES = 1 << 20
+
+# Frame latencies kept for the percentiles.
+LATENCIES = 10000
+
+
+def recv_exact(read, size):
+    """Return exactly size bytes from read (sock.recv, say), or None if it reaches the end first."""
+    data = bytearray()
+    while len(data) < size:
+        chunk = read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def pack(cycles):
+    """Pack (ui_in, uio_in, rst_n) cycles for a request frame."""
+    return b"".join(bytes((ui_in & 0xFF, uio_in & 0xFF, rst_n & 1)) for ui_in, uio_in, rst_n in cycles)
+
+
+def unpack(data):
+    """Unpack a response frame into (uo_out, uio_out, uio_oe) tuples."""
+    return [tuple(data[i:i + 3]) for i in range(0, len(data), 3)]
+
+
+def run_cycles(chip, data):
+    """Clock chip through the cycles packed in data, returning the packed outputs."""
+    out = bytearray(len(data))
+    for i in range(0, len(data), 3):
+        ui_in, uio_in, rst_n = data[i], data[i + 1], data[i + 2]
+        out[i], out[i + 1] = chip.outputs(ui_in, uio_in)
+        # The bidirectional pins are outputs while /OE is low and /WE high
+        out[i + 2] = 0xFF if ui_in & 0xC0 == 0x80 else 0x00
+        chip.clock(ui_in, uio_in, rst_n)
+    return bytes(out)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Stats:
+    """Frames, cycles and frame latencies, in seconds."""
+
+    def __init__(self):
+        self.frames = 0
+        self.cycles = 0
+        self.busy = 0.0
+        self.latencies = collections.deque(maxlen=LATENCIES)
+
+    def add(self, cycles, seconds):
+        self.frames += 1
+        self.cycles += cycles
+        self.busy += seconds
+        self.latencies.append(seconds)
+
+    def summary(self):
+        def us(seconds):
+            return None if seconds is None else round(seconds * 1e6, 1)
+
+        return {
+            "frames": self.frames,
+            "cycles": self.cycles,
+            "cycles_per_second": round(self.cycles / self.busy) if self.busy else None,
+            "latency_us": {
+                "p50": us(percentile(self.latencies, 0.50)),
+                "p99": us(percentile(self.latencies, 0.99)),
+                "max": us(max(self.latencies, default=None)),
+            },
+        }
+
+
+def serve_frames(read, write, chip, stats):
+    """Answer the frames from read with write until read reaches the end or a frame is too big."""
+    while True:
+        header = recv_exact(read, HEADER.size)
+        if header is None:
+            return
+        (count,) = HEADER.unpack(header)
+        if count == 0:
+            text = json.dumps(stats.summary()).encode()
+            write(HEADER.pack(len(text)) + text)
+            continue
+        if count > MAX_CYCLES:
+            return
+        data = recv_exact(read, count * 3)
+        if data is None:
+            return
+        start = time.perf_counter()
+        out = run_cycles(chip, data)
+        stats.add(count, time.perf_counter() - start)
+        write(HEADER.pack(count) + out)
+
+
+class Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        stats = Stats()
+        chip = model.Chip(self.server.pipeline, self.server.lanes, self.server.modes, self.server.palette)
+        serve_frames(self.request.recv, self.request.sendall, chip, stats)
+        if not self.server.quiet:
+            print(f"disconnected: {json.dumps(stats.summary())}", file=sys.stderr)
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, pipeline=0, lanes=1, modes=model.MODES_DEFAULT, palette=False, quiet=False):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, Handler)
+        self.pipeline = pipeline
+        self.lanes = lanes
+        self.modes = modes
+        self.palette = palette
+        self.quiet = quiet
+
+
+class Client:
+    """A connection to a virtual chip."""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, data):
+        """Send cycles already packed as 3 bytes each, returning the packed outputs."""
+        count = len(data) // 3
+        assert 0 < count <= MAX_CYCLES and len(data) == count * 3
+        self.sock.sendall(HEADER.pack(count) + data)
+        header = recv_exact(self.sock.recv, HEADER.size)
+        if header is None or HEADER.unpack(header)[0] != count:
+            raise ConnectionError("virtual chip closed the connection")
+        return recv_exact(self.sock.recv, count * 3)
+
+    def cycles(self, cycles):
+        """Run each (ui_in, uio_in, rst_n) of cycles, returning (uo_out, uio_out, uio_oe) for each."""
+        return unpack(self.send(pack(cycles)))
+
+    def stats(self):
+        self.sock.sendall(HEADER.pack(0))
+        (size,) = HEADER.unpack(recv_exact(self.sock.recv, HEADER.size))
+        return json.loads(recv_exact(self.sock.recv, size))
+
+
+def write_all(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def serve_pty(pipeline, lanes, modes, palette):
+    """Serve a chip on a new pseudo-terminal, a frame at a time, until interrupted."""
+    # Only needed for the pseudo-terminal, and only available on Unix
+    import tty
+
+    master, slave = os.openpty()
+    # No echo or line editing: the frames are binary
+    tty.setraw(slave)
+    print(f"serving on {os.ttyname(slave)}", file=sys.stderr)
+    stats = Stats()
+    chip = model.Chip(pipeline, lanes, modes, palette)
+    try:
+        serve_frames(lambda size: os.read(master, size), lambda data: write_all(master, data), chip, stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"stopped: {json.dumps(stats.summary())}", file=sys.stderr)
+        os.close(master)
+        os.close(slave)
+
+
+def random_frame(rng, count):
+    """Return count random cycles packed for Client.send, with few mode writes (as in test_pipeline)."""
+    data = bytearray()
+    for _ in range(count):
+        ui_in, uio_in = rng.getrandbits(8), rng.getrandbits(8)
+        if ui_in & 0xC7 == 0x47 and rng.random() < 0.75:
+            ui_in ^= 0x04
+        data += bytes((ui_in, uio_in, 1))
+    return bytes(data)
+
+
+def bench(args):
+    server = None
+    path = args.socket
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "styler.sock")
+        server = Server(path, args.pipeline, args.lanes, args.modes, args.palette, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rng = random.Random(args.seed)
+    frames = [random_frame(rng, args.batch) for _ in range(min(args.frames, 16))]
+    latencies = []
+    with Client(path) as client:
+        # Reset the chip, which also warms up the connection
+        client.cycles([(0xC0, 0, 0)] * 3)
+        start = time.perf_counter()
+        for i in range(args.frames):
+            sent = time.perf_counter()
+            client.send(frames[i % len(frames)])
+            latencies.append(time.perf_counter() - sent)
+        elapsed = time.perf_counter() - start
+        served = client.stats()
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    cycles = args.frames * args.batch
+    print(f"{args.frames} frames of {args.batch} cycles")
+    print(
+        f"round trip: p50 {percentile(latencies, 0.50) * 1e3:.2f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1e3:.2f} ms, "
+        f"{cycles / elapsed:.0f} cycles per second"
+    )
+    print(
+        f"model: p50 {served['latency_us']['p50'] / 1e3:.2f} ms, "
+        f"p99 {served['latency_us']['p99'] / 1e3:.2f} ms, "
+        f"{served['cycles_per_second']} cycles per second"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a virtual styler chip over a Unix socket, or benchmark one.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="serve virtual chips")
+    where = serve_parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", help="Unix socket path")
+    where.add_argument("--pty", action="store_true", help="serve one chip on a new pseudo-terminal")
+    bench_parser = sub.add_parser("bench", help="benchmark a virtual chip")
+    bench_parser.add_argument("--socket", help="Unix socket path (default: serve a chip in this process)")
+    bench_parser.add_argument("--frames", type=int, default=100, help="frames to send (default: 100)")
+    bench_parser.add_argument("--batch", type=int, default=4096, help="cycles per frame (default: 4096)")
+    bench_parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    for p in (serve_parser, bench_parser):
+        p.add_argument("--pipeline", type=int, default=0, choices=[0, 1, 2],
+                       help="pipeline registers of the chip served, see STYLER_PIPELINE (default: 0)")
+        p.add_argument("--lanes", type=int, default=1, choices=[1, 2],
+                       help="styler lanes of the chip served, see STYLER_LANES (default: 1)")
+        p.add_argument("--modes", type=int, default=model.MODES_DEFAULT,
+                       help=f"modes built into the chip served, see STYLER_MODES (default: {model.MODES_DEFAULT})")
+        p.add_argument("--palette", action="store_true",
+                       help="serve a chip with the attribute palette, see STYLER_PALETTE")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        assert 0 < args.batch <= MAX_CYCLES
+        bench(args)
+        return
+    if args.pty:
+        serve_pty(args.pipeline, args.lanes, args.modes, args.palette)
+        return
+    with Server(args.socket, args.pipeline, args.lanes, args.modes, args.palette) as server:
+        print(f"serving on {args.socket}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# pytest support for test_runner.py.
+#
+# The design is built once per session (by the controller when running
+# under pytest-xdist), and only if tests from test_runner.py were
+# collected, so the simulator-free tests never wait for it. Every worker
+# then copies the build into its own sim_build/pytest/<worker> directory,
+# which is also where it runs its tests and writes its results files.
+
+import os
+import shutil
+
+import pytest
+from cocotb.runner import get_runner
+
+import regress
+from model import MODES_DEFAULT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+
+# Keep in sync with PROJECT_SOURCES in the Makefile.
+PROJECT_SOURCES = ["project.v", "styler.v"]
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("styler")
+    group.addoption("--sim", default=os.environ.get("SIM", "icarus"), help="simulator (default: icarus)")
+    group.addoption("--gates", action="store_true", default=os.environ.get("GATES") == "yes",
+                    help="simulate gate_level_netlist.v instead of the RTL")
+    group.addoption("--no-dump", action="store_true", default=os.environ.get("DUMP") == "no",
+                    help="don't write tb.vcd")
+    group.addoption("--pipeline", type=int, default=int(os.environ.get("PIPELINE", "0")),
+                    help="pipeline registers in the styler, 0-2 (default: 0)")
+    group.addoption("--lanes", type=int, default=int(os.environ.get("LANES", "1")), choices=[1, 2],
+                    help="styler lanes, 1 or 2 (default: 1)")
+    group.addoption("--modes", type=int, default=int(os.environ.get("MODES", str(MODES_DEFAULT))),
+                    help=f"modes built in, a mask of the ATTR3 mode bits (default: {MODES_DEFAULT})")
+    group.addoption("--palette", action="store_true", default=os.environ.get("PALETTE") == "1",
+                    help="build in the attribute palette")
+    group.addoption("--shards", type=int, default=4, help="number of random-seed shards (default: 4)")
+    group.addoption("--shard-vectors", type=int, default=1000, help="random vectors per shard (default: 1000)")
+    group.addoption("--seed", type=int, default=1, help="seed of the first shard (default: 1)")
+
+
+def build_dir(config):
+    netlist = "gl" if config.getoption("gates") else "rtl"
+    pipeline = config.getoption("pipeline")
+    lanes = config.getoption("lanes")
+    modes = config.getoption("modes")
+    palette = "-palette" if config.getoption("palette") else ""
+    return os.path.join(
+        HERE, "sim_build", "pytest", f"{config.getoption('sim')}-{netlist}-p{pipeline}-l{lanes}-m{modes}{palette}"
+    )
+
+
+def simulator(config):
+    """Return a cocotb runner for the selected simulator, or None if it is not installed."""
+    try:
+        return get_runner(config.getoption("sim"))
+    except SystemExit:
+        return None
+
+
+def build(config):
+    sim = config.getoption("sim")
+    defines = {}
+    build_args = []
+    includes = []
+    if config.getoption("gates"):
+        pdk = os.path.join(os.environ["PDK_ROOT"], "sky130A", "libs.ref", "sky130_fd_sc_hd", "verilog")
+        sources = [
+            os.path.join(pdk, "primitives.v"),
+            os.path.join(pdk, "sky130_fd_sc_hd.v"),
+            os.path.join(HERE, "gate_level_netlist.v"),
+        ]
+        defines.update(GL_TEST=1, FUNCTIONAL=1, USE_POWER_PINS=1, SIM=1, UNIT_DELAY="#1")
+    else:
+        sources = [os.path.join(SRC, source) for source in PROJECT_SOURCES]
+        includes.append(SRC)
+        defines["STYLER_PIPELINE"] = config.getoption("pipeline")
+        defines["STYLER_LANES"] = config.getoption("lanes")
+        defines["STYLER_MODES"] = config.getoption("modes")
+        defines["STYLER_PALETTE"] = int(config.getoption("palette"))
+    if config.getoption("no_dump"):
+        defines["NO_DUMP"] = 1
+    if sim == "verilator":
+        build_args.append("-Wno-fatal")
+        if not config.getoption("no_dump"):
+            build_args.append("--trace")
+
+    simulator(config).build(
+        verilog_sources=sources + [os.path.join(HERE, "tb.v")],
+        includes=includes,
+        defines=defines,
+        build_args=build_args,
+        hdl_toplevel="tb",
+        build_dir=build_dir(config),
+    )
+
+
+def build_for(config, nodeids):
+    """Build the design, once, if any of nodeids is a test in test_runner.py."""
+    if getattr(config, "_styler_built", False) or not simulator(config):
+        return
+    if any(n.split("::")[0].endswith("test_runner.py") for n in nodeids):
+        build(config)
+        config._styler_built = True
+
+
+def pytest_collection_finish(session):
+    # xdist workers use what the controller built.
+    if not hasattr(session.config, "workerinput"):
+        build_for(session.config, [item.nodeid for item in session.items])
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_node_collection_finished(node, ids):
+    # Under xdist the controller collects nothing itself, but this runs
+    # before any test is handed to a worker.
+    build_for(node.config, ids)
+
+
+def pytest_generate_tests(metafunc):
+    config = metafunc.config
+    if "group" in metafunc.fixturenames:
+        found, _ = regress.groups(os.path.join(HERE, "test.py"))
+        metafunc.parametrize("group", list(found))
+    if "seed" in metafunc.fixturenames:
+        first = config.getoption("seed")
+        metafunc.parametrize("seed", range(first, first + config.getoption("shards")))
+
+
+@pytest.fixture(scope="session")
+def sim(pytestconfig):
+    """Return a function that runs a cocotb test module in this worker's own build directory."""
+    runner = simulator(pytestconfig)
+    if runner is None:
+        pytest.skip(f"{pytestconfig.getoption('sim')} not found")
+
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    own = os.path.join(HERE, "sim_build", "pytest", worker)
+    shutil.rmtree(own, ignore_errors=True)
+    shutil.copytree(build_dir(pytestconfig), own)
+
+    def run(module, testcase=None, **env):
+        env.setdefault("PIPELINE", str(pytestconfig.getoption("pipeline")))
+        env.setdefault("LANES", str(pytestconfig.getoption("lanes")))
+        env.setdefault("MODES", str(pytestconfig.getoption("modes")))
+        env.setdefault("PALETTE", str(int(pytestconfig.getoption("palette"))))
+        return runner.test(
+            test_module=module,
+            hdl_toplevel="tb",
+            hdl_toplevel_lang="verilog",
+            testcase=testcase,
+            extra_env=env,
+            build_dir=own,
+            test_dir=own,
+        )
+
+    return run
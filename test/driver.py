@@ -0,0 +1,393 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Reusable ways of getting a row of pixels through the DUT.
+#
+# Frontdoor drives the pins the same way a host would: cycles=3 is the
+# set-up / strobe / hold sequence used by test.py, cycles=1 holds each
+# address and data for a single clock. Reads are sampled at the falling
+# edge of clk, before the rising edge that ends them. After set_mode(BURST)
+# the bitmap and attribute bytes are transferred in bursts, with a single
+# set-up and hold around each burst; after set_mode(STREAM) stream_glyph()
+# reads each styled row from uo_out while the next row is written.
+# command() drives a command cycle, with /OE and /WE both low, and
+# frames() gives a run of one-clock vsync commands.
+# pixel_monitor() collects the pixels shifted out on uo_out[7] after
+# set_mode(SHIFT); output_monitor() collects the styler outputs at every
+# clock (RTL only). On a dual-lane build (LANES=2, the STYLER_LANES the RTL
+# was built with), style_glyph_pair() styles two adjacent glyphs at once,
+# one in each lane. MODES and PALETTE are the STYLER_MODES and
+# STYLER_PALETTE the RTL was built with, for skipping what it lacks.
+# Frontdoor.clocks counts the clocks used so far. With pipeline registers
+# (PIPELINE, the STYLER_PIPELINE the RTL was built with), Frontdoor idles
+# before each bitmap read until the styled bitmap has caught up with the
+# last write, so the flows work unchanged. Backdoor deposits the register
+# values directly into the RTL and samples the combinational outputs,
+# which only works for RTL simulation (not GATES=yes); set_frame() jumps the
+# blink mode frame counter. CocotbBackend runs the pin cycles compiled by
+# host.Host on the DUT.
+
+import os
+
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import ClockCycles, FallingEdge, Timer
+
+from model import LINE, CTRL, BMAP, ATTR, BURST, SHIFT, LINE_AUTO, VSYNC, PHASE_MASK, LANE_SELECT, MODES_DEFAULT
+
+# Pipeline registers in the RTL under test; see STYLER_PIPELINE in project.v.
+PIPELINE = int(os.environ.get("PIPELINE", "0"))
+# Styler lanes in the RTL under test; see STYLER_LANES in project.v.
+LANES = int(os.environ.get("LANES", "1"))
+# Modes built into the RTL under test; see STYLER_MODES in project.v.
+MODES = int(os.environ.get("MODES", str(MODES_DEFAULT)))
+# Whether the RTL under test has the palette; see STYLER_PALETTE in project.v.
+PALETTE = os.environ.get("PALETTE", "0") == "1"
+
+
+async def reset(dut):
+    # Set the clock period to 10 us (100 KHz)
+    clock = Clock(dut.clk, 10, units="us")
+    cocotb.start_soon(clock.start())
+
+    dut.ena.value = 1
+    dut.ui_in.value = 0xC0
+    dut.uio_in.value = 0
+    dut.rst_n.value = 0
+    await ClockCycles(dut.clk, 10)
+    dut.rst_n.value = 1
+
+
+async def pixel_monitor(dut, pixels):
+    """Append the shift mode pixel output to pixels at every falling edge of clk."""
+    while True:
+        await FallingEdge(dut.clk)
+        pixels.append((dut.uo_out.value & 0xFF) >> 7)
+
+
+async def output_monitor(dut, values):
+    """Append the styler outputs (scanlineOut, bitmapOut) to values at every falling edge of clk.
+
+    This reads the RTL signals directly, so it only works for RTL simulation.
+    """
+    top = dut.user_project
+    while True:
+        await FallingEdge(dut.clk)
+        values.append((top.scanlineOut.value.integer, top.bitmapOut.value.integer))
+
+
+class Frontdoor:
+
+    def __init__(self, dut, cycles=3, latency=PIPELINE):
+        assert cycles in (1, 3)
+        self.dut = dut
+        self.cycles = cycles
+        self.latency = latency
+        self.mode = 0
+        self.clocks = 0
+        # The styled bitmap is up to date from clock ready onwards
+        self.ready = 0
+        self.phase = 0
+
+    async def clock(self):
+        ui_in = self.dut.ui_in.value & 0xFF
+        self.note_phase(ui_in)
+        await ClockCycles(self.dut.clk, 1)
+        self.clocks += 1
+        if not ui_in & 0x80:
+            # A write or a command changes the registers from this clock on
+            self.ready = max(self.ready, self.clocks + self.latency)
+
+    def note_phase(self, ui_in):
+        if ui_in & PHASE_MASK != self.phase:
+            self.phase = ui_in & PHASE_MASK
+            self.ready = max(self.ready, self.clocks + self.latency)
+
+    async def settle(self, phase=0):
+        """Idle until the styled bitmap reflects every write so far (only needed with pipeline registers)."""
+        self.note_phase(phase)
+        if self.ready > self.clocks:
+            await self.idle(self.ready - self.clocks, phase)
+
+    async def sample(self):
+        dut = self.dut
+        await FallingEdge(dut.clk)
+        r1 = dut.uo_out.value & 0xFF
+        r2 = dut.uio_out.value & 0xFF
+        # In shift mode uo_out[7] is the pixel output
+        mask = 0x7F if self.mode & SHIFT else 0xFF
+        assert (r1 ^ r2) & mask == 0
+        return (r1 & mask) | (r2 & ~mask)
+
+    async def write(self, a, d):
+        dut = self.dut
+        dut.uio_in.value = d & 0xFF
+        if self.cycles == 1:
+            dut.ui_in.value = 0x40 | a
+            await self.clock()
+            return
+        # Set address and data
+        dut.ui_in.value = 0xC0 | a
+        await self.clock()
+        # Enable write
+        dut.ui_in.value = 0x40 | a
+        await self.clock()
+        # Disable write
+        dut.ui_in.value = 0xC0 | a
+        await self.clock()
+
+    async def command(self, c, d=0):
+        dut = self.dut
+        dut.uio_in.value = d & 0xFF
+        if self.cycles == 1:
+            dut.ui_in.value = 0x00 | c
+            await self.clock()
+            return
+        # Set command and operand
+        dut.ui_in.value = 0xC0 | c
+        await self.clock()
+        # Enable output and write together
+        dut.ui_in.value = 0x00 | c
+        await self.clock()
+        # Disable output and write
+        dut.ui_in.value = 0xC0 | c
+        await self.clock()
+
+    async def read(self, a):
+        dut = self.dut
+        if a & BMAP:
+            await self.settle(a & PHASE_MASK)
+        # Enable output
+        dut.ui_in.value = 0x80 | a
+        r = await self.sample()
+        await self.clock()
+        if self.cycles == 3:
+            # Disable output
+            dut.ui_in.value = 0xC0 | a
+            await self.clock()
+        return r
+
+    async def burst_write(self, a, data):
+        """Write each byte of data, returning what uo_out showed during each write."""
+        dut = self.dut
+        result = []
+        if self.cycles == 3:
+            # Set address and data
+            dut.uio_in.value = data[0] & 0xFF if data else 0
+            dut.ui_in.value = 0xC0 | a
+            await self.clock()
+        # Keep write enabled and the address unchanged for the whole burst
+        for d in data:
+            dut.uio_in.value = d & 0xFF
+            dut.ui_in.value = 0x40 | a
+            result.append(await self.sample())
+            await self.clock()
+        if self.cycles == 3:
+            dut.ui_in.value = 0xC0 | a
+            await self.clock()
+        return result
+
+    async def burst_read(self, a, count):
+        dut = self.dut
+        result = []
+        if a & BMAP:
+            await self.settle(a & PHASE_MASK)
+        # Keep output enabled and the address unchanged for the whole burst
+        dut.ui_in.value = 0x80 | a
+        for _ in range(count):
+            result.append(await self.sample())
+            await self.clock()
+        if self.cycles == 3:
+            dut.ui_in.value = 0xC0 | a
+            await self.clock()
+        return result
+
+    async def set_mode(self, mode, attr=0):
+        """Write the mode bits at address 7, along with the dotted overline bit of attr."""
+        self.mode = mode
+        await self.write(ATTR | 3, (attr >> 24) | mode)
+
+    async def attr_write(self, phase, attr):
+        data = [attr >> 0, attr >> 8, attr >> 16, (attr >> 24) | self.mode]
+        if self.mode & BURST:
+            await self.burst_write(phase | ATTR, data)
+            return
+        for i, d in enumerate(data):
+            await self.write(phase | ATTR | i, d)
+
+    async def bmp_write(self, a, d):
+        if self.mode & BURST:
+            await self.burst_write(a | BMAP, [d >> 0, d >> 8])
+            return
+        await self.write(a | BMAP | 0, d >> 0)
+        await self.write(a | BMAP | 1, d >> 8)
+
+    async def bmp_read(self, a):
+        if self.mode & BURST:
+            b1, b2 = await self.burst_read(a | BMAP, 2)
+        else:
+            b1 = await self.read(a | BMAP | 0)
+            b2 = await self.read(a | BMAP | 1)
+        return (b1 << 0) | (b2 << 8)
+
+    async def style(self, phase, ctrl, attr, scanline, bitmap):
+        await self.write(phase | CTRL, ctrl)
+        await self.attr_write(phase, attr)
+        await self.write(phase | LINE, scanline)
+        await self.bmp_write(phase, bitmap)
+        return (await self.read(phase | LINE), await self.bmp_read(phase))
+
+    async def style_glyph(self, phase, ctrl, attr, rows):
+        """Style a whole glyph the way the README describes; see model.style_glyph."""
+        await self.write(phase | CTRL, ctrl)
+        await self.attr_write(phase, attr)
+        if self.mode & LINE_AUTO:
+            await self.command(phase | VSYNC)
+        result = []
+        for scanline in range(16):
+            # In line mode the scanline advances as each row is written
+            if not self.mode & LINE_AUTO:
+                await self.write(phase | LINE, scanline)
+            log_line = await self.read(phase | LINE)
+            await self.bmp_write(phase, rows[log_line])
+            result.append(await self.bmp_read(phase))
+        return result
+
+    async def style_glyph_pair(self, phase, ctrl, attrs, rows):
+        """Style two adjacent glyphs, one in each lane (LANES=2 only); see model.style_glyph.
+
+        attrs and rows give the attributes and rows of each glyph; the result
+        is the styled rows of each glyph. In burst mode each scanline takes a
+        burst read of both logical scanlines, a burst write of both bitmaps
+        and a burst read of both styled bitmaps.
+        """
+        await self.write(phase | CTRL, ctrl)
+        for lane in (1, 0):
+            await self.write(phase | LINE, LANE_SELECT if lane else 0)
+            await self.attr_write(phase, attrs[lane])
+        result = ([], [])
+        for scanline in range(16):
+            if self.mode & BURST:
+                await self.write(phase | LINE, scanline)
+                log_lines = await self.burst_read(phase | LINE, 2)
+                data = []
+                for lane in (0, 1):
+                    data += [rows[lane][log_lines[lane]] >> 0, rows[lane][log_lines[lane]] >> 8]
+                await self.burst_write(phase | BMAP, data)
+                b = await self.burst_read(phase | BMAP, 4)
+                for lane in (0, 1):
+                    result[lane].append(b[lane * 2] | (b[lane * 2 + 1] << 8))
+                continue
+            for lane in (0, 1):
+                await self.write(phase | LINE, scanline | (LANE_SELECT if lane else 0))
+                log_line = await self.read(phase | LINE)
+                await self.bmp_write(phase, rows[lane][log_line])
+                result[lane].append(await self.bmp_read(phase))
+        return result
+
+    async def stream_bmp_write(self, a, d):
+        """Write a bitmap row in stream mode, returning the previous styled row."""
+        await self.settle(a & PHASE_MASK)
+        if self.mode & BURST:
+            b1, b2 = await self.burst_write(a | BMAP, [d >> 0, d >> 8])
+        else:
+            (b1,) = await self.burst_write(a | BMAP | 0, [d >> 0])
+            (b2,) = await self.burst_write(a | BMAP | 1, [d >> 8])
+        return (b1 << 0) | (b2 << 8)
+
+    async def stream_glyph(self, phase, ctrl, attr, rows):
+        """Style a whole glyph in stream mode; see model.style_glyph."""
+        await self.write(phase | CTRL, ctrl)
+        await self.attr_write(phase, attr)
+        result = []
+        for scanline in range(16):
+            # The logical scanline is on uo_out while the physical one is written
+            (log_line,) = await self.burst_write(phase | LINE, [scanline])
+            result.append(await self.stream_bmp_write(phase, rows[log_line]))
+        # The last row is still latched after the writes
+        result.append(await self.bmp_read(phase))
+        return result[1:]
+
+    async def idle(self, count, phase=0):
+        """Clock count times with output and write disabled."""
+        assert count >= 0
+        self.dut.ui_in.value = 0xC0 | phase
+        for _ in range(count):
+            await self.clock()
+
+    async def frames(self, count, phase=0):
+        """Give count vsync commands, one clock each (a quick way through many frames)."""
+        self.dut.ui_in.value = 0x00 | phase | VSYNC
+        for _ in range(count):
+            await self.clock()
+
+
+class CocotbBackend:
+    """A host.Host backend driving the DUT, sampling the outputs at the falling edge of clk."""
+
+    def __init__(self, dut):
+        self.dut = dut
+
+    async def run(self, cycles):
+        dut = self.dut
+        result = []
+        for ui_in, uio_in, rst_n in cycles:
+            dut.ui_in.value = ui_in
+            dut.uio_in.value = uio_in
+            dut.rst_n.value = rst_n
+            await FallingEdge(dut.clk)
+            result.append((dut.uo_out.value & 0xFF, dut.uio_out.value & 0xFF, dut.uio_oe.value & 0xFF))
+            await ClockCycles(dut.clk, 1)
+        return result
+
+
+class Backdoor:
+
+    def __init__(self, dut, latency=PIPELINE):
+        self.dut = dut
+        self.top = dut.user_project
+        self.latency = latency
+
+    @staticmethod
+    def available(dut):
+        """Return whether the register names exist, i.e. this is not a gate level simulation."""
+        try:
+            dut.user_project.attr
+            return True
+        except AttributeError:
+            return False
+
+    def set_frame(self, frame):
+        """Set the blink mode frame counter, as though frame vsync commands had been given."""
+        self.top.frameCount.value = frame & 0xFF
+
+    async def settle(self):
+        await Timer(1, units="ns")
+        if self.latency:
+            # Clock the styled bitmap through the pipeline registers
+            await ClockCycles(self.dut.clk, self.latency)
+            await Timer(1, units="ns")
+
+    async def style(self, phase, ctrl, attr, scanline, bitmap):
+        top = self.top
+        top.ctrl.value = ctrl
+        top.attr.value = attr
+        top.scanlineIn.value = scanline
+        top.bitmapIn.value = bitmap
+        self.dut.ui_in.value = 0xC0 | phase
+        await self.settle()
+        return (top.scanlineOut.value.integer, top.bitmapOut.value.integer)
+
+    async def style_glyph(self, phase, ctrl, attr, rows):
+        top = self.top
+        top.ctrl.value = ctrl
+        top.attr.value = attr
+        self.dut.ui_in.value = 0xC0 | phase
+        result = []
+        for scanline in range(16):
+            top.scanlineIn.value = scanline
+            await Timer(1, units="ns")
+            top.bitmapIn.value = rows[top.scanlineOut.value.integer]
+            await self.settle()
+            result.append(top.bitmapOut.value.integer)
+        return result
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Font loader for the chargen in docs/tmvdh.svg: PSF (versions 1 and 2, as
+# in /usr/share/consolefonts, gzipped or not) and BDF fonts of up to 16x16
+# pixels become one array('H') of 16 rows per glyph, each row in the
+# styler's layout (leftmost pixel in bit 15). Shorter glyphs are padded
+# with blank rows below, narrower ones with blank columns on the right.
+#
+# Files are memory-mapped rather than read, and PSF rows are converted with
+# slice assignments over the whole font, so even a 65,536-glyph font loads
+# without a loop over its glyphs. BDF is text, so it takes a loop, but
+# glyphs that fill their cell (as in unifont) are converted a whole glyph at
+# a time. font[n] is then glyph n as a memoryview
+# of the array, which the styler model (model.style_glyphs, video.render)
+# takes in place of a list of rows. font.index maps code points to glyph
+# numbers, from the PSF Unicode table or the BDF encodings.
+#
+# Run as a script, it reports the load time and size of each font given:
+#
+#   ./font.py /usr/share/consolefonts/Lat15-Terminus16.psf.gz unifont.bdf
+
+import argparse
+import array
+import gzip
+import mmap
+import re
+import struct
+import sys
+import time
+
+ROWS = 16
+
+PSF1_MAGIC = b"\x36\x04"
+PSF1_HEADER = struct.Struct("<2sBB")
+PSF1_MODE512 = 0x01
+PSF1_MODEHASTAB = 0x02
+PSF1_MODESEQ = 0x04
+PSF2_MAGIC = b"\x72\xb5\x4a\x86"
+PSF2_HEADER = struct.Struct("<4s7I")
+PSF2_HAS_UNICODE_TABLE = 0x01
+
+BDF_FONT_BBX = re.compile(rb"^FONTBOUNDINGBOX\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)", re.M)
+# ENCODING, BBX and BITMAP of each glyph
+BDF_CHAR = re.compile(
+    rb"^STARTCHAR.*?^ENCODING\s+(-?\d+).*?^BBX\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)\s+(-?\d+)"
+    rb".*?^BITMAP\s*$(.*?)^ENDCHAR",
+    re.M | re.S,
+)
+
+
+class Font:
+    """Glyphs of 16 rows of 16 pixels, all in one array('H'), and a map from code points to glyphs."""
+
+    def __init__(self, rows, width, height, index=None):
+        self.rows = rows
+        self.width = width
+        self.height = height
+        self.index = {code: code for code in range(len(self))} if index is None else index
+        self.view = memoryview(rows)
+
+    def __len__(self):
+        return len(self.rows) // ROWS
+
+    def __getitem__(self, glyph):
+        """Return the 16 rows of glyph number glyph as a memoryview of the array."""
+        if not 0 <= glyph < len(self):
+            raise IndexError(f"no glyph {glyph}")
+        return self.view[glyph * ROWS:(glyph + 1) * ROWS]
+
+    def glyph(self, code, default=0):
+        """Return the rows of the glyph for code point code, or of glyph number default if there is none."""
+        return self[self.index.get(code, default)]
+
+
+def _rows(data, count, height, row_bytes):
+    """Convert count glyphs of height rows of row_bytes big-endian bytes into an array('H') of 16 rows each."""
+    rows = array.array("H", bytes(2 * ROWS * count))
+    if row_bytes == 1:
+        # Each byte is the top byte of a row
+        words = bytearray(2 * height * count)
+        words[(sys.byteorder == "little")::2] = data
+        source = array.array("H", bytes(words))
+    else:
+        source = array.array("H", bytes(data))
+        if sys.byteorder == "little":
+            source.byteswap()
+    if height == ROWS:
+        return source
+    for row in range(height):
+        rows[row::ROWS] = source[row::height]
+    return rows
+
+
+def _psf1_table(data):
+    """Return {code point: glyph number} from a PSF1 Unicode table, ignoring sequences."""
+    codes = array.array("H", bytes(data[:len(data) & ~1]))
+    if sys.byteorder != "little":
+        codes.byteswap()
+    index = {}
+    glyph, sequence = 0, False
+    for code in codes:
+        if code == 0xFFFF:
+            glyph, sequence = glyph + 1, False
+        elif code == 0xFFFE:
+            sequence = True
+        elif not sequence:
+            index.setdefault(code, glyph)
+    return index
+
+
+def _psf2_table(data):
+    """Return {code point: glyph number} from a PSF2 Unicode table (UTF-8, never 0xFE or 0xFF), ignoring sequences."""
+    index = {}
+    for glyph, entry in enumerate(bytes(data).split(b"\xff")):
+        for c in entry.split(b"\xfe", 1)[0].decode("utf-8", "replace"):
+            index.setdefault(ord(c), glyph)
+    return index
+
+
+def load_psf(data):
+    """Load a PSF font (version 1 or 2) from a buffer."""
+    if data[:2] == PSF1_MAGIC:
+        mode, height = data[2], data[3]
+        count = 512 if mode & PSF1_MODE512 else 256
+        width, row_bytes, start = 8, 1, PSF1_HEADER.size
+        table = _psf1_table if mode & (PSF1_MODEHASTAB | PSF1_MODESEQ) else None
+    elif data[:4] == PSF2_MAGIC:
+        _, _, start, flags, count, size, height, width = PSF2_HEADER.unpack_from(data)
+        row_bytes = (width + 7) // 8
+        if size != row_bytes * height:
+            raise ValueError(f"PSF2 glyphs of {size} bytes for {width}x{height} pixels")
+        table = _psf2_table if flags & PSF2_HAS_UNICODE_TABLE else None
+    else:
+        raise ValueError("not a PSF font")
+    if width > 16 or height > ROWS:
+        raise ValueError(f"glyphs of {width}x{height} pixels do not fit the styler's 16x16")
+    end = start + count * height * row_bytes
+    if len(data) < end:
+        raise ValueError("PSF font is truncated")
+    rows = _rows(memoryview(data)[start:end], count, height, row_bytes)
+    return Font(rows, width, height, None if table is None else table(data[end:]))
+
+
+def load_bdf(data):
+    """Load a BDF font from a buffer, placing each glyph in its font bounding box."""
+    font_bbx = BDF_FONT_BBX.search(data)
+    if font_bbx is None:
+        raise ValueError("not a BDF font")
+    width, height, x_offset, y_offset = map(int, font_bbx.groups())
+    if width > 16 or height > ROWS:
+        raise ValueError(f"glyphs of {width}x{height} pixels do not fit the styler's 16x16")
+    # Big-endian rows of every glyph, converted to the array at the end
+    rows = bytearray()
+    index = {}
+    for char in BDF_CHAR.finditer(data):
+        code, w, h, x, y, bitmap = char.groups()
+        code, w, h, x, y = int(code), int(w), int(h), int(x), int(y)
+        if code < 0:
+            continue
+        index.setdefault(code, len(rows) // (2 * ROWS))
+        lines = bitmap.split()
+        # The top row of the glyph in the cell, and the shift to the cell's left edge
+        top = (height + y_offset) - (y + h)
+        shift = 16 - 4 * len(lines[0]) - (x - x_offset) if lines else 0
+        if top == 0 and len(lines) == ROWS and shift in (0, 8):
+            # A whole cell, 8 or 16 pixels wide
+            glyph = bytes.fromhex(b"".join(lines).decode())
+            if shift:
+                rows += bytes(2 * ROWS)
+                rows[-2 * ROWS::2] = glyph
+            else:
+                rows += glyph
+            continue
+        glyph = [0] * ROWS
+        for row, line in enumerate(lines):
+            if 0 <= top + row < ROWS:
+                value = int(line, 16)
+                glyph[top + row] = (value << shift if shift >= 0 else value >> -shift) & 0xFFFF
+        rows += b"".join(row.to_bytes(2, "big") for row in glyph)
+    return Font(_rows(rows, len(rows) // (2 * ROWS), ROWS, 2), width, height, index)
+
+
+def load(path):
+    """Load a PSF or BDF font file, memory-mapping it unless it is gzipped."""
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+        return load_bdf(data) if data.startswith(b"STARTFONT") else load_psf(data)
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return load_bdf(data) if data[:9] == b"STARTFONT" else load_psf(data)
+    finally:
+        data.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load PSF and BDF fonts and report the time taken.")
+    parser.add_argument("paths", nargs="+", help="font files")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        start = time.perf_counter()
+        font = load(path)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{path}: {len(font)} glyphs of {font.width}x{font.height}, {len(font.index)} code points, "
+            f"{font.rows.itemsize * len(font.rows) / 1024:.0f} KiB, loaded in {elapsed * 1e3:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
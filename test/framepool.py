@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Parallel rendering of long animations: every frame of an animation of a
+# screen (blinking as in blink mode, the cursor moving on a cell a frame as
+# if typing) drawn by a pool of worker processes, straight into one
+# multiprocessing.shared_memory block of packed frames, so that nothing but
+# the task ranges goes through a pipe.
+#
+# Each worker builds its own atlas.Atlas of the screen's styles and glyphs
+# when it starts, before FramePool returns, and then draws its tasks with
+# atlas.render. The work is split either by frames (runs of whole frames)
+# or by bands (rows of cells of one frame), for animations too short to
+# keep every worker busy with whole frames.
+#
+# Run as a script, it renders the animation with 1, 2, 4, ... up to
+# --workers processes, reports the frames per second and the speedup over
+# one worker at each size, and checks frames against video.render. With
+# --output, the frames are also written to a frame file (video.FrameFile):
+#
+#   ./framepool.py --frames 2000 --workers 16
+#   ./framepool.py --mode 800x600@60 --frames 16 --split bands
+#   ./framepool.py --frames 512 --workers 4 --output anim.fb
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+import video
+from atlas import Atlas, ROWS, render, screen_glyphs
+from model import BLINK_PHASE, CURSOR, CTRL_DEFAULT
+
+SPLITS = ["frames", "bands"]
+
+# Tasks per worker, so that workers finishing early take up the slack
+TASKS_PER_WORKER = 4
+
+# The worker's mode, screen, atlas, shared memory and blink rate
+_worker = None
+
+
+def animation_styles(screen):
+    """Return the (phase, attr) styles the animation of screen draws with: every attr, blinking, under the cursor or not."""
+    return sorted({
+        (phase | cursor, attr) for attr in set(screen.attrs) for phase in (0, BLINK_PHASE) for cursor in (0, CURSOR)
+    })
+
+
+def _start(mode, screen, glyphs, ctrl, name, rate, ready):
+    global _worker
+    atlas = Atlas(glyphs, animation_styles(screen), ctrl, sorted(glyphs))
+    _worker = mode, screen, atlas, shared_memory.SharedMemory(name), rate
+    ready.wait()
+
+
+def _draw(task):
+    """Draw frames first to last - 1 into the shared memory, only the rows of cells in rows if given."""
+    mode, screen, atlas, memory, rate = _worker
+    first, last, rows = task
+    size = (mode.h_active // 8) * mode.v_active
+    for number in range(first, last):
+        phase, screen.cursor = video.frame_state(number, screen, rate)
+        render(mode, screen, atlas, phase, video.Frame(mode, memory.buf, number * size), rows)
+
+
+def tasks(frames, rows, workers, split="frames"):
+    """Return the (first, last, rows) tasks of frames frames of rows rows of cells, split among workers."""
+    count = workers * TASKS_PER_WORKER
+    if split == "frames":
+        step = max(1, -(-frames // count))
+        return [(first, min(frames, first + step), None) for first in range(0, frames, step)]
+    # Bands of rows, enough of them per frame to give each worker its share
+    bands = max(1, min(rows, -(-count // max(1, frames))))
+    step = -(-rows // bands)
+    return [
+        (number, number + 1, range(start, min(rows, start + step)))
+        for number in range(frames) for start in range(0, rows, step)
+    ]
+
+
+class FramePool:
+    """A pool of workers drawing frames frames of the animation of screen into shared memory.
+
+    frame(number) is frame number as a video.Frame of the shared memory,
+    once render() has drawn it. Frames of the pool must not be in use when
+    it is closed.
+    """
+
+    def __init__(self, mode, screen, font, frames, workers=None, ctrl=CTRL_DEFAULT, blink_rate=4):
+        self.mode = mode
+        self.screen = screen
+        self.frames = frames
+        self.workers = workers or os.cpu_count()
+        self.size = (mode.h_active // 8) * mode.v_active
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, frames * self.size))
+        # Only the glyphs of the screen go to the workers, as lists of rows
+        glyphs = {glyph: list(font[glyph]) for glyph in screen_glyphs(screen)}
+        ready = multiprocessing.Barrier(self.workers + 1)
+        self.pool = multiprocessing.Pool(
+            self.workers, _start, (mode, screen, glyphs, ctrl, self.memory.name, blink_rate, ready)
+        )
+        ready.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.memory.close()
+        self.memory.unlink()
+
+    def render(self, split="frames"):
+        """Draw every frame, splitting the work by frames or by bands of rows of cells."""
+        rows = min(self.screen.rows, self.mode.v_active // ROWS)
+        self.pool.map(_draw, tasks(self.frames, rows, self.workers, split), chunksize=1)
+
+    def frame(self, number):
+        return video.Frame(self.mode, self.memory.buf, number * self.size)
+
+    def save(self, path):
+        """Write every frame to a frame file (video.FrameFile) with a slot for each."""
+        with video.FrameFile(path, self.mode, self.frames) as frames:
+            for number in range(self.frames):
+                frame = frames.next()
+                frame.pixels[frame.offset:frame.offset + self.size] = self.memory.buf[number * self.size:(number + 1) * self.size]
+                frames.publish()
+
+
+def worker_counts(workers):
+    """Return 1, 2, 4, ... up to workers, and workers itself."""
+    counts = [1 << n for n in range(workers.bit_length()) if 1 << n < workers]
+    return counts + [workers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render an animation with a pool of processes and report the scaling.")
+    parser.add_argument("--mode", default="640x480@60", choices=sorted(video.MODES),
+                        help="video mode (default: 640x480@60)")
+    parser.add_argument("--frames", type=int, default=256, choices=range(1, 1 << 20), metavar="FRAMES",
+                        help="frames of the animation (default: 256)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help=f"most worker processes to scale to (default: {os.cpu_count()})")
+    parser.add_argument("--split", default="frames", choices=SPLITS,
+                        help="split the work by whole frames or by bands of rows (default: frames)")
+    parser.add_argument("--blink-rate", type=int, default=4, choices=range(8),
+                        help="blink phases toggle every 2**rate frames, as in blink mode (default: 4)")
+    parser.add_argument("--output", help="frame file to write the frames to (see video.FrameFile)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mode = video.MODES[args.mode]
+    font = video.sample_font(rng)
+    screen = video.sample_screen(rng, mode)
+    print(f"{args.mode}: {args.frames} frames split by {args.split}, on {os.cpu_count()} CPUs")
+    baseline = None
+    for workers in worker_counts(args.workers):
+        with FramePool(mode, screen, font, args.frames, workers, blink_rate=args.blink_rate) as pool:
+            start = time.perf_counter()
+            pool.render(args.split)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"  {workers:3} workers: {args.frames / elapsed:8.1f} frames per second, "
+                f"speedup {baseline / elapsed:5.2f}, efficiency {baseline / elapsed / workers:4.0%}"
+            )
+            for number in sorted({0, args.frames // 2, args.frames - 1}):
+                phase, screen.cursor = video.frame_state(number, screen, args.blink_rate)
+                frame = pool.frame(number)
+                drawn = b"".join(frame.row(y) for y in range(mode.v_active))
+                assert drawn == video.render(mode, screen, font, phase=phase).pixels, f"frame {number} differs"
+            if args.output and workers == args.workers:
+                pool.save(args.output)
+                print(f"  wrote {args.frames} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Persistent cache of styled glyphs, so that runs which style the same
+# glyphs again (rendering the same screens, say) find them on disk instead.
+#
+# A styled glyph is stored under a hash of its 16 rows, the phase pins,
+# ctrl and attr (made canonical, so that bits which cannot change the result
+# do not split the cache) and VERSION, a hash of src/styler.v and model.py.
+# Changing either starts a new, empty cache: entries of other versions are
+# dropped when the cache is opened.
+#
+# The store is a single SQLite file in WAL mode, so parallel shards can read
+# it while another one writes. Each lookup of a batch is a single query, and
+# the glyphs it misses are styled together with model.style_glyphs and
+# written in a single transaction. The entries found are marked as used on
+# flush() or close(), which also evicts the least recently used entries
+# beyond max_entries.
+#
+# Run as a script, it styles a screen of text through the cache twice,
+# reporting the time and hits of the cold and the warm run:
+#
+#   ./glyphcache.py --cache /tmp/glyphs.sqlite --screens 4
+
+import argparse
+import array
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import model
+import regress
+import video
+from model import (
+    CURSOR, CURSOR_BOTTOM, CURSOR_TOP, CURSOR_BLINK, CURSOR_ENABLE, LINE_ENABLE, EXTRA_BOLD,
+    BOLD, UNDERLINE, DOUBLE_UNDERLINE, DOTTED_UNDERLINE, STRIKE, DOUBLE_STRIKE, DOTTED_STRIKE,
+    OVERLINE, DOUBLE_OVERLINE, DOTTED_OVERLINE, PHASE_MASK, ATTR_MASK,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+VERSION = regress.digest(regress.read(os.path.join(regress.SRC, "styler.v")), regress.read(os.path.join(HERE, "model.py")))
+
+DEFAULT_PATH = os.path.join(HERE, ".glyphcache.sqlite")
+
+LINES = (
+    UNDERLINE | DOUBLE_UNDERLINE | DOTTED_UNDERLINE | STRIKE | DOUBLE_STRIKE | DOTTED_STRIKE |
+    OVERLINE | DOUBLE_OVERLINE | DOTTED_OVERLINE
+)
+
+# Keys per query, under SQLite's limit on parameters
+QUERY = 500
+
+
+def canonical(phase, ctrl, attr):
+    """Return (phase, ctrl, attr) with the bits that cannot change a styled glyph cleared."""
+    phase &= PHASE_MASK
+    attr &= ATTR_MASK
+    if not ctrl & LINE_ENABLE:
+        attr &= ~LINES
+    if not attr & BOLD:
+        ctrl &= ~EXTRA_BOLD
+    if not (phase & CURSOR and ctrl & CURSOR_ENABLE):
+        phase &= ~CURSOR
+        ctrl &= ~(CURSOR_BOTTOM | CURSOR_TOP | CURSOR_BLINK | CURSOR_ENABLE)
+    return phase, ctrl, attr
+
+
+def _pack(rows):
+    rows = array.array("H", rows)
+    if sys.byteorder != "little":
+        rows.byteswap()
+    return rows.tobytes()
+
+
+def _unpack(data):
+    rows = array.array("H", data)
+    if sys.byteorder != "little":
+        rows.byteswap()
+    return rows.tolist()
+
+
+class GlyphCache:
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=1 << 20, version=VERSION):
+        self.max_entries = max_entries
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        # Keys found since the last flush
+        self.used = set()
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS glyphs (key BLOB PRIMARY KEY, rows BLOB, used REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS glyphs_used ON glyphs (used)")
+            row = self.db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != version:
+                self.db.execute("DELETE FROM glyphs")
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def flush(self):
+        """Mark the entries found since the last flush as used, and evict the least recently used."""
+        now = time.time()
+        used = list(self.used)
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            for i in range(0, len(used), QUERY):
+                chunk = used[i:i + QUERY]
+                self.db.execute(f"UPDATE glyphs SET used = ? WHERE key IN ({', '.join('?' * len(chunk))})", [now] + chunk)
+            (count,) = self.db.execute("SELECT COUNT(*) FROM glyphs").fetchone()
+            if count > self.max_entries:
+                self.db.execute(
+                    "DELETE FROM glyphs WHERE key IN (SELECT key FROM glyphs ORDER BY used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+        self.used.clear()
+
+    def keys(self, phase, ctrl, attr, glyphs):
+        """Return the key of each glyph of glyphs styled with phase, ctrl and attr."""
+        style = hashlib.blake2b(digest_size=16)
+        style.update(self.version.encode())
+        style.update(array.array("L", canonical(phase, ctrl, attr)).tobytes())
+        keys = []
+        for rows in glyphs:
+            h = style.copy()
+            h.update(_pack(rows))
+            keys.append(h.digest())
+        return keys
+
+    def style_glyphs(self, phase, ctrl, attr, glyphs):
+        """model.style_glyphs, from the cache where it can be."""
+        glyphs = list(glyphs)
+        keys = self.keys(phase, ctrl, attr, glyphs)
+        found = {}
+        for i in range(0, len(keys), QUERY):
+            chunk = keys[i:i + QUERY]
+            query = f"SELECT key, rows FROM glyphs WHERE key IN ({', '.join('?' * len(chunk))})"
+            found.update(self.db.execute(query, chunk))
+        self.used.update(found)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return [_unpack(found[key]) for key in keys]
+        styled = model.style_glyphs(phase, ctrl, attr, [glyphs[i] for i in missing])
+        now = time.time()
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO glyphs VALUES (?, ?, ?)",
+                [(keys[i], _pack(rows), now) for i, rows in zip(missing, styled)],
+            )
+        result = dict(zip(missing, styled))
+        return [result[i] if i in result else _unpack(found[key]) for i, key in enumerate(keys)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Style screens of text through the glyph cache, cold and warm.")
+    parser.add_argument("--cache", default=DEFAULT_PATH, help=f"cache file (default: {DEFAULT_PATH})")
+    parser.add_argument("--mode", default="640x480@60", choices=sorted(video.MODES),
+                        help="video mode of the screens (default: 640x480@60)")
+    parser.add_argument("--screens", type=int, default=4, help="screens of text to style (default: 4)")
+    parser.add_argument("--max-entries", type=int, default=1 << 20, help="entries kept (default: 1048576)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    font = video.sample_font(rng)
+    mode = video.MODES[args.mode]
+    screens = [video.sample_screen(rng, mode) for _ in range(args.screens)]
+    for run in ("cold", "warm"):
+        with GlyphCache(args.cache, args.max_entries) as cache:
+            if run == "cold":
+                cache.db.execute("DELETE FROM glyphs")
+            start = time.perf_counter()
+            for screen in screens:
+                video.style_screen(screen, font, model.CTRL_DEFAULT, 0, cache.style_glyphs)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{run}: {elapsed * 1e3:.0f} ms, {cache.hits} hits, {cache.misses} misses "
+                f"({cache.hits / max(1, cache.hits + cache.misses):.0%} hits)"
+            )
+    start = time.perf_counter()
+    for screen in screens:
+        video.style_screen(screen, font, model.CTRL_DEFAULT, 0)
+    print(f"without the cache: {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Host-side driver for a host that drives the pins itself, such as an MCU.
+#
+# set_ctrl(), set_attr(), style_row() and style_glyph() are compiled into
+# pin cycles following the README protocol and queued; flush() sends the
+# queue to a backend in one batch, after which the rows read back are
+# available (Pending.value). The compiler keeps a copy of the registers,
+# so it leaves out writes of values the chip already holds, and it works
+# out the logical scanline itself (it only depends on the Y attributes)
+# instead of reading it. Attribute bytes are written in one burst, and
+# bursts at the same address are broken only where the chip would
+# otherwise carry on at the wrong byte. The flow picks the mode for rows:
+#
+#   single   one addressed transaction per byte, as in the README
+#   burst    burst and line modes: a two-byte write and read per row
+#   stream   stream, burst and line modes: each row is read back while the
+#            next one is written, so a row is a single two-byte burst
+#
+# A backend runs a batch of (ui_in, uio_in, rst_n) cycles and returns the
+# (uo_out, uio_out, uio_oe) before each rising edge of clk: ModelBackend
+# runs model.Chip in this process, SerialBackend speaks the chipserver.py
+# frames on a serial port or pseudo-terminal (chipserver.py serve --pty),
+# and driver.CocotbBackend drives the DUT. Rows read in stream mode are
+# taken from uo_out, the rest from uio_out while the chip drives it.
+#
+# Run as a script, it styles a screen of glyphs with each flow and reports
+# the bus operations and clocks per glyph, and the microseconds per glyph
+# at the given bus clock:
+#
+#   ./host.py --glyphs 80 --bus-mhz 10
+#   ./host.py --serial /dev/pts/3 --pipeline 2
+
+import argparse
+import inspect
+import os
+import random
+
+import chipserver
+import model
+from model import LINE, CTRL, BMAP, ATTR, BURST, STREAM, LINE_AUTO, PHASE_MASK, MODE_MASK, CTRL_DEFAULT
+
+FLOWS = {
+    "single": 0,
+    "burst": BURST | LINE_AUTO,
+    "stream": STREAM | BURST | LINE_AUTO,
+}
+
+
+class Batch:
+    """Queued cycles, and the outputs once they have been run."""
+
+    def __init__(self):
+        self.cycles = []
+        self.outputs = None
+
+
+# The outputs a row is read from: the bidirectional pins, driven by a read,
+# or the dedicated outputs, which present the latched row in stream mode
+# while the next one is written
+UO_OUT = 0
+UIO_OUT = 1
+
+
+class Pending:
+    """A styled row read back by a queued operation."""
+
+    def __init__(self):
+        self.batch = None
+        self.low = self.high = None
+        self.pins = UIO_OUT
+
+    def bind(self, batch, low, high, pins=UIO_OUT):
+        """Read the row from pins (UIO_OUT or UO_OUT) at cycles low and high of batch."""
+        self.batch, self.low, self.high, self.pins = batch, low, high, pins
+
+    @property
+    def value(self):
+        if self.batch is None or self.batch.outputs is None:
+            raise RuntimeError("flush() the host first")
+        out = self.batch.outputs
+        if self.pins == UIO_OUT:
+            for i in (self.low, self.high):
+                assert out[i][2] == 0xFF, f"the bidirectional pins are not driven at cycle {i}"
+        return out[self.low][self.pins] | (out[self.high][self.pins] << 8)
+
+
+class Host:
+
+    def __init__(self, backend, cycles=1, latency=0, lanes=1, flow="burst"):
+        assert cycles in (1, 3)
+        self.backend = backend
+        self.cycles = cycles
+        self.latency = latency
+        self.lanes = lanes
+        self.mode = FLOWS[flow]
+        self.batch = Batch()
+        # The styled bitmap is up to date from cycle ready of the batch
+        # onwards, and the latched row (in line and stream modes) from
+        # cycle latch_ready onwards
+        self.ready = 0
+        self.latch_ready = 0
+        self.phase = 0
+        self.last = None
+        self.offset = 0
+        # The values in the chip's registers, or None if unknown
+        self.scanline = None
+        self.ctrl = None
+        self.attr = [None] * 4
+        self.bitmap = [None] * 2
+        # In stream mode, the last row written, to be read with the next one
+        self.latched = None
+        # Totals over every batch so far
+        self.operations = 0
+        self.clocks = 0
+
+    def cycle(self, ui_in, uio_in, rst_n=1):
+        """Queue a single cycle, returning its index in the batch."""
+        index = len(self.batch.cycles)
+        if ui_in & PHASE_MASK != self.phase:
+            self.phase = ui_in & PHASE_MASK
+            self.ready = max(self.ready, index + self.latency)
+        access = ui_in & 0xC0 in (0x40, 0x80)
+        # Follow the chip's burst counter (it counts with or without burst mode)
+        if access and self.last is not None and self.last[0] & 0xC7 == ui_in & 0xC7:
+            self.offset = (self.offset + 1) & 3
+        else:
+            self.offset = 0
+        self.batch.cycles.append((ui_in, uio_in & 0xFF, rst_n))
+        if not ui_in & 0x80:
+            # A write or a command changes the registers from the next cycle on
+            self.ready = max(self.ready, index + 1 + self.latency)
+        self.last = (ui_in, uio_in & 0xFF)
+        return index
+
+    def idle(self, count, phase=0):
+        a = self.last[0] & 7 if self.last else 0
+        d = self.last[1] if self.last else 0
+        for _ in range(count):
+            self.cycle(0xC0 | phase | a, d)
+
+    def settle(self, phase, until=None):
+        """Idle until the styled bitmap (or with until, the given cycle) is up to date."""
+        if phase != self.phase:
+            # The next cycle changes the phase pins
+            self.ready = max(self.ready, len(self.batch.cycles) + self.latency)
+        while True:
+            count = (self.ready if until is None else until) - len(self.batch.cycles)
+            if count <= 0:
+                return
+            self.idle(count, phase)
+
+    def access(self, strobe, phase, a, data):
+        """Queue one bus operation: a write (strobe 0x40) of data, or a read (0x80) of len(data) bytes.
+
+        Return the index of the cycle at which each byte is transferred.
+        """
+        ui_in = strobe | phase | a
+        d = data[0] if strobe == 0x40 else self.last[1] if self.last else 0
+        if self.cycles == 3:
+            if strobe == 0x40 and self.last != (0xC0 | phase | a, d):
+                # Set up the address and data
+                self.cycle(0xC0 | phase | a, d)
+        elif self.last is not None and self.last[0] & 0xC7 == ui_in & 0xC7:
+            # The chip would carry on with the previous burst: that is only
+            # the same as a new one for whole bitmaps in a single lane
+            burst = self.attr[3] is None or self.attr[3] & BURST
+            period = 4 if a & ATTR or self.lanes == 2 else 2 if a & BMAP else 1
+            if burst and (self.offset + 1) % period:
+                self.cycle(0xC0 | phase | a, d)
+        indices = []
+        for d in (data if strobe == 0x40 else [d] * len(data)):
+            indices.append(self.cycle(ui_in, d))
+        if self.cycles == 3:
+            self.cycle(0xC0 | phase | a, d)
+        self.operations += 1
+        return indices
+
+    def reset(self):
+        """Queue a reset through rst_n, holding it until the pipeline registers are flushed."""
+        for _ in range(self.latency + 1):
+            self.cycle(0xC0, 0, 0)
+        self.last = None
+        self.scanline = 0
+        self.ctrl = CTRL_DEFAULT
+        self.attr = [0] * 4
+        self.bitmap = [0] * 2
+        self.latched = None
+
+    def set_mode(self, phase=0):
+        """Set the mode bits for the flow, if they are not already set."""
+        if self.attr[3] is not None and self.attr[3] & MODE_MASK == self.mode:
+            return
+        d = (self.attr[3] or 0) & 1 | self.mode
+        self.access(0x40, phase, ATTR | 3, [d])
+        self.attr[3] = d
+
+    def set_ctrl(self, ctrl, phase=0):
+        if self.ctrl != ctrl:
+            self.access(0x40, phase, CTRL, [ctrl])
+            self.ctrl = ctrl
+
+    def set_attr(self, attr, phase=0):
+        self.set_mode(phase)
+        data = [attr & 0xFF, (attr >> 8) & 0xFF, (attr >> 16) & 0xFF, ((attr >> 24) & 1) | self.mode]
+        changed = [i for i in range(4) if self.attr[i] != data[i]]
+        if not changed:
+            return
+        if self.mode & BURST:
+            self.access(0x40, phase, ATTR | changed[0], data[changed[0]:changed[-1] + 1])
+        else:
+            for i in changed:
+                self.access(0x40, phase, ATTR | i, [data[i]])
+        self.attr = data
+
+    def row(self, phase, scanline, bitmap):
+        """Queue the styling of one row, with the registers already set; see style_row."""
+        result = Pending()
+        data = [bitmap & 0xFF, (bitmap >> 8) & 0xFF]
+        if self.scanline != scanline:
+            self.access(0x40, phase, LINE, [scanline])
+            self.scanline = scanline
+        if not self.mode:
+            for i in range(2):
+                if self.bitmap[i] != data[i]:
+                    self.access(0x40, phase, BMAP | i, [data[i]])
+                    self.bitmap[i] = data[i]
+            self.settle(phase)
+            (low,) = self.access(0x80, phase, BMAP | 0, [None])
+            (high,) = self.access(0x80, phase, BMAP | 1, [None])
+            result.bind(self.batch, low, high)
+            return result
+        if self.mode & STREAM:
+            # The previous row is read while this one is written
+            self.settle(phase, self.latch_ready)
+        low, high = self.access(0x40, phase, BMAP, data)
+        self.latch_ready = high + 1 + self.latency
+        self.bitmap = data
+        # Line mode advances the scanline
+        self.scanline = (scanline + 1) & 15
+        if self.mode & STREAM:
+            if self.latched is not None:
+                self.latched.bind(self.batch, low, high, UO_OUT)
+            self.latched = result
+            return result
+        self.settle(phase, self.latch_ready)
+        result.bind(self.batch, *self.access(0x80, phase, BMAP, [None, None]))
+        return result
+
+    def style_row(self, phase, ctrl, attr, scanline, bitmap):
+        """Queue the styling of bitmap at physical scanline, returning the styled row as a Pending."""
+        self.set_ctrl(ctrl, phase)
+        self.set_attr(attr, phase)
+        return self.row(phase, scanline, bitmap)
+
+    def style_glyph(self, phase, ctrl, attr, rows):
+        """Queue the styling of a whole glyph, returning a Pending for each row; see model.style_glyph."""
+        self.set_ctrl(ctrl, phase)
+        self.set_attr(attr, phase)
+        result = []
+        for scanline in range(16):
+            log_line = model.styler(phase, ctrl, attr, scanline, 0)[0]
+            result.append(self.row(phase, scanline, rows[log_line]))
+        return result
+
+    def flush(self):
+        """Run the queued cycles on the backend, after which every Pending has its value.
+
+        With an asynchronous backend (driver.CocotbBackend) this returns a
+        coroutine, which must be awaited.
+        """
+        if self.latched is not None:
+            # The last row in stream mode is still latched
+            self.settle(self.phase, self.latch_ready)
+            self.latched.bind(self.batch, *self.access(0x80, self.phase, BMAP, [None, None]))
+            self.latched = None
+        batch, self.batch = self.batch, Batch()
+        count = len(batch.cycles)
+        self.ready = max(0, self.ready - count)
+        self.latch_ready = max(0, self.latch_ready - count)
+        self.clocks += count
+        result = self.backend.run(batch.cycles)
+        if inspect.isawaitable(result):
+            async def finish():
+                batch.outputs = await result
+            return finish()
+        batch.outputs = result
+        return None
+
+
+class ModelBackend:
+    """Runs the cycles on model.Chip in this process."""
+
+    def __init__(self, pipeline=0, lanes=1):
+        self.chip = model.Chip(pipeline, lanes)
+
+    def run(self, cycles):
+        return chipserver.unpack(chipserver.run_cycles(self.chip, chipserver.pack(cycles)))
+
+
+class SerialBackend:
+    """Runs the cycles on whatever answers chipserver.py frames on a serial port or pseudo-terminal."""
+
+    def __init__(self, path, baud=None):
+        # Only needed for a serial port, and only available on Unix
+        import termios
+        import tty
+
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self.fd)
+        if baud is not None:
+            attrs = termios.tcgetattr(self.fd)
+            attrs[4] = attrs[5] = getattr(termios, f"B{baud}")
+            termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+
+    def close(self):
+        os.close(self.fd)
+
+    def read(self, size):
+        return os.read(self.fd, size)
+
+    def run(self, cycles):
+        if not cycles:
+            return []
+        chipserver.write_all(self.fd, chipserver.HEADER.pack(len(cycles)) + chipserver.pack(cycles))
+        header = chipserver.recv_exact(self.read, chipserver.HEADER.size)
+        if header is None or chipserver.HEADER.unpack(header)[0] != len(cycles):
+            raise ConnectionError("no answer from the serial port")
+        return chipserver.unpack(chipserver.recv_exact(self.read, len(cycles) * 3))
+
+
+def screen(rng, glyphs):
+    """Return random (ctrl, attr, rows) glyphs, with attributes from a short list as in running text."""
+    attrs = [0, 0, 0, model.BOLD, model.UNDERLINE, model.ITALIC | model.DOTTED_UNDERLINE, model.Y_SCALE]
+    return [
+        (CTRL_DEFAULT, rng.choice(attrs), [rng.getrandbits(16) for _ in range(16)])
+        for _ in range(glyphs)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the bus cost of styling glyphs with each flow.")
+    parser.add_argument("--glyphs", type=int, default=80, help="glyphs to style (default: 80)")
+    parser.add_argument("--bus-mhz", type=float, default=10, help="bus clock for the time estimates (default: 10)")
+    parser.add_argument("--pipeline", type=int, default=0, choices=[0, 1, 2],
+                        help="pipeline registers of the chip, see STYLER_PIPELINE (default: 0)")
+    parser.add_argument("--serial", help="serial port or pseudo-terminal to use instead of the model")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    glyphs = screen(random.Random(args.seed), args.glyphs)
+    expected = [model.style_glyph(0, ctrl, attr, rows) for ctrl, attr, rows in glyphs]
+    backend = SerialBackend(args.serial) if args.serial else ModelBackend(args.pipeline)
+    print(f"{args.glyphs} glyphs, {args.bus_mhz:g} MHz bus clock")
+    for cycles in (3, 1):
+        for flow in FLOWS:
+            host = Host(backend, cycles, args.pipeline, flow=flow)
+            host.reset()
+            host.flush()
+            start = (host.operations, host.clocks)
+            result = [host.style_glyph(0, ctrl, attr, rows) for ctrl, attr, rows in glyphs]
+            host.flush()
+            assert [[row.value for row in glyph] for glyph in result] == expected
+            operations = (host.operations - start[0]) / args.glyphs
+            clocks = (host.clocks - start[1]) / args.glyphs
+            print(
+                f"{cycles}-cycle bus operations, {flow} flow: {operations:.1f} bus operations, "
+                f"{clocks:.1f} clocks, {clocks / args.bus_mhz:.2f} us per glyph"
+            )
+
+
+if __name__ == "__main__":
+    main()
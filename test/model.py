@@ -0,0 +1,504 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Bit-exact Python model of tt_um_rebeccargb_styler (src/project.v, src/styler.v).
+# The functions below follow the Verilog modules wire for wire so that the
+# model can be used as a golden reference for randomly generated vectors.
+
+LINE = 0
+CTRL = 1
+BMAP = 2
+ATTR = 4
+
+FAINT_PHASE      = 0x08
+BLINK_PHASE      = 0x10
+CURSOR           = 0x20
+
+CURSOR_BOTTOM    = 0x01
+CURSOR_TOP       = 0x02
+CURSOR_EDGES     = 0x03
+CURSOR_BLINK     = 0x04
+CURSOR_ENABLE    = 0x08
+LINE_ENABLE      = 0x10
+BLINK_ENABLE     = 0x20
+EXTRA_BOLD       = 0x40
+PHASE_DECOUPLE   = 0x80
+CTRL_DEFAULT     = 0x3C
+
+# Mode bits, written along with the dotted overline attribute at address 7.
+BURST            = 0x02
+STREAM           = 0x04
+SHIFT            = 0x08
+BUFFER           = 0x10
+LINE_AUTO        = 0x20
+CURSOR_AUTO      = 0x40
+BLINK_AUTO       = 0x80
+
+# The modes built in by default (STYLER_MODES in project.v).
+MODES_DEFAULT    = BURST | STREAM | LINE_AUTO
+
+# Commands, given on ui_in[2:0] with /OE and /WE both low.
+COMMIT           = 0
+STORE            = 1
+RECALL           = 2
+HSYNC            = 3
+VSYNC            = 4
+CURSOR_COLUMN    = 5
+CURSOR_ROW       = 6
+BLINK_RATE       = 7
+
+PALETTE_SIZE     = 4
+
+# Written with the scanline at address 0: access the second styler lane
+# (dual-lane builds only).
+LANE_SELECT      = 0x10
+
+X_OFFSET         = 0x00000001
+X_SCALE          = 0x00000002
+Y_OFFSET         = 0x00000004
+Y_SCALE          = 0x00000008
+X_PREMIRROR      = 0x00000010
+X_POSTMIRROR     = 0x00000020
+Y_PREMIRROR      = 0x00000040
+Y_POSTMIRROR     = 0x00000080
+BOLD             = 0x00000100
+FAINT            = 0x00000200
+ITALIC           = 0x00000400
+REVERSE_ITALIC   = 0x00000800
+BLINK            = 0x00001000
+ALTERNATE        = 0x00002000
+INVERSE          = 0x00004000
+HIDDEN           = 0x00008000
+UNDERLINE        = 0x00010000
+DOUBLE_UNDERLINE = 0x00020000
+DOTTED_UNDERLINE = 0x00040000
+STRIKE           = 0x00080000
+DOUBLE_STRIKE    = 0x00100000
+DOTTED_STRIKE    = 0x00200000
+OVERLINE         = 0x00400000
+DOUBLE_OVERLINE  = 0x00800000
+DOTTED_OVERLINE  = 0x01000000
+
+PHASE_MASK       = FAINT_PHASE | BLINK_PHASE | CURSOR
+CTRL_MASK        = 0xFF
+ATTR_MASK        = 0x01FFFFFF
+MODE_MASK        = 0xFE
+
+_MIRROR = [int('{:016b}'.format(b)[::-1], 2) for b in range(0x10000)]
+_DOUBLE = [int(''.join(c + c for c in '{:08b}'.format(b)), 2) for b in range(0x100)]
+
+
+def linegen(scanline, attr, ctrl, faint_phase, cursor_enable, cursor_phase):
+    """Model of styler_linegen.
+
+    Returns (bitmapScanline, effectScanline, inverseOut, faintOut, faintPhaseOut, solidLineOut).
+    """
+    line_enable = bool(ctrl & LINE_ENABLE)
+    top = bool(ctrl & CURSOR_TOP)
+    bottom = bool(ctrl & CURSOR_BOTTOM)
+    cursor = cursor_enable and (cursor_phase or not (ctrl & CURSOR_BLINK)) and (
+        (not (top or bottom)) or (top and scanline < 3) or (bottom and scanline > 12)
+    )
+
+    s1 = (scanline ^ 0xF) if attr & Y_POSTMIRROR else scanline
+    s2 = (s1 >> 1) if attr & Y_SCALE else s1
+    s3 = (s2 ^ 0x8) if attr & Y_OFFSET else s2
+
+    sl0 = line_enable and bool(attr & (UNDERLINE | DOUBLE_UNDERLINE | DOTTED_UNDERLINE)) and (
+        ((s3 == 15) if attr & UNDERLINE else (s3 == 13 or s3 == 15)) if attr & DOUBLE_UNDERLINE else (s3 == 13)
+    )
+    sl1 = line_enable and bool(attr & (STRIKE | DOUBLE_STRIKE | DOTTED_STRIKE)) and (
+        ((s3 == 5 or s3 == 7 or s3 == 9) if attr & STRIKE else (s3 == 6 or s3 == 8)) if attr & DOUBLE_STRIKE else (s3 == 7)
+    )
+    sl2 = line_enable and bool(attr & (OVERLINE | DOUBLE_OVERLINE | DOTTED_OVERLINE)) and (
+        ((s3 == 2) if attr & OVERLINE else (s3 == 0 or s3 == 2)) if attr & DOUBLE_OVERLINE else (s3 == 0)
+    )
+    dotted_line = (
+        (sl0 and bool(attr & DOTTED_UNDERLINE)) or
+        (sl1 and bool(attr & DOTTED_STRIKE)) or
+        (sl2 and bool(attr & DOTTED_OVERLINE))
+    )
+    solid_line = sl0 or sl1 or sl2
+
+    return (
+        (s3 ^ 0xF) if attr & Y_PREMIRROR else s3,
+        s3,
+        bool(attr & INVERSE) != bool(cursor),
+        bool(attr & FAINT) or dotted_line,
+        bool(faint_phase) != bool(s1 & 1),
+        solid_line,
+    )
+
+
+def style(bitmap, attr, ctrl, scanline):
+    """Model of styler_style."""
+    b1 = _MIRROR[bitmap] if attr & X_PREMIRROR else bitmap
+
+    italic = attr & (ITALIC | REVERSE_ITALIC)
+    if italic == ITALIC:
+        b2 = (
+            (b1 >> 2) if scanline < 4 else
+            (b1 >> 1) if scanline < 8 else
+            b1 if scanline < 12 else
+            (b1 << 1) & 0xFFFF
+        )
+    elif italic == REVERSE_ITALIC:
+        b2 = (
+            (b1 << 2) & 0xFFFF if scanline < 4 else
+            (b1 << 1) & 0xFFFF if scanline < 8 else
+            b1 if scanline < 12 else
+            (b1 >> 1)
+        )
+    else:
+        b2 = b1
+
+    if attr & BOLD:
+        b3 = b2 | (b2 >> 1)
+        if ctrl & EXTRA_BOLD:
+            b3 |= (b2 << 1) & 0xFFFF
+    else:
+        b3 = b2
+
+    b4 = ((b3 & 0xFF) << 8) | (b3 >> 8) if attr & X_OFFSET else b3
+    b5 = _DOUBLE[b4 >> 8] if attr & X_SCALE else b4
+    return b5
+
+
+def invert(bitmap, attr, ctrl, blink_phase, inverse, faint, faint_phase, solid_line):
+    """Model of styler_invert."""
+    blink_enable = bool(ctrl & BLINK_ENABLE)
+    b1 = 0xFFFF if solid_line else bitmap
+    b2 = (b1 & (0x5555 if faint_phase else 0xAAAA)) if faint else b1
+    b3 = 0x0000 if attr & HIDDEN else b2
+    b4 = 0x0000 if (attr & BLINK and blink_phase and blink_enable) else b3
+    b5 = (b4 ^ 0xFFFF) if (attr & ALTERNATE and (blink_phase or not blink_enable)) else b4
+    b6 = (b5 ^ 0xFFFF) if inverse else b5
+    b7 = _MIRROR[b6] if attr & X_POSTMIRROR else b6
+    return b7
+
+
+def _phases(phase, ctrl):
+    """Return (faint_phase, blink_phase, cursor_phase, cursor_enable) as wired in tt_um_rebeccargb_styler."""
+    return (
+        bool(phase & FAINT_PHASE) and not (ctrl & PHASE_DECOUPLE),
+        bool(phase & BLINK_PHASE),
+        bool(phase & FAINT_PHASE) if ctrl & PHASE_DECOUPLE else not (phase & BLINK_PHASE),
+        bool(phase & CURSOR) and bool(ctrl & CURSOR_ENABLE),
+    )
+
+
+def styler(phase, ctrl, attr, scanline, bitmap):
+    """Model of tt_um_rebeccargb_styler for one bitmap row.
+
+    phase holds the FAINT_PHASE, BLINK_PHASE and CURSOR input pins as they
+    are placed on ui_in. Returns (logical scanline, styled bitmap), i.e. the
+    values read back from address 0 and addresses 2-3.
+    """
+    faint_phase, blink_phase, cursor_phase, cursor_enable = _phases(phase, ctrl)
+    scanline_out, scanline_int, inverse, faint, faint_phase, solid_line = linegen(
+        scanline, attr, ctrl, faint_phase, cursor_enable, cursor_phase
+    )
+    bitmap_int = style(bitmap, attr, ctrl, scanline_int)
+    bitmap_out = invert(bitmap_int, attr, ctrl, blink_phase, inverse, faint, faint_phase, solid_line)
+    return scanline_out, bitmap_out
+
+
+def style_glyph(phase, ctrl, attr, rows):
+    """Style a whole 16-row glyph the way the README describes.
+
+    rows is indexed by logical scanline; the result is indexed by physical
+    scanline.
+    """
+    result = []
+    for scanline in range(16):
+        log_line, _ = styler(phase, ctrl, attr, scanline, 0)
+        result.append(styler(phase, ctrl, attr, scanline, rows[log_line])[1])
+    return result
+
+
+def style_glyphs(phase, ctrl, attr, glyphs):
+    """Style many glyphs with the same phase, ctrl and attr: style_glyph for each of glyphs.
+
+    The scanline logic (linegen) is worked out once per scanline instead of
+    once per row, and each distinct row once per scanline, so a screen of
+    text costs little more than its distinct (glyph, attr) pairs. It is
+    plain Python because numpy is not in requirements.txt.
+    """
+    faint_phase, blink_phase, cursor_phase, cursor_enable = _phases(phase, ctrl)
+    result = [[0] * 16 for _ in glyphs]
+    for scanline in range(16):
+        log_line, scanline_int, inverse, faint, faint_phase_out, solid_line = linegen(
+            scanline, attr, ctrl, faint_phase, cursor_enable, cursor_phase
+        )
+        styled = {}
+        for rows, out in zip(glyphs, result):
+            bitmap = rows[log_line]
+            row = styled.get(bitmap)
+            if row is None:
+                row = styled[bitmap] = invert(
+                    style(bitmap, attr, ctrl, scanline_int),
+                    attr, ctrl, blink_phase, inverse, faint, faint_phase_out, solid_line
+                )
+            out[scanline] = row
+    return result
+
+
+def _load(a, d, ctrl, bitmap, attr):
+    """Return (ctrl, bitmap, attr) after writing d to register address a."""
+    if a == CTRL:
+        return d, bitmap, attr
+    if a == ATTR | 3:
+        return ctrl, bitmap, (attr & 0xFFFFFF) | ((d & 1) << 24)
+    if a & ATTR:
+        shift = (a & 3) * 8
+        return ctrl, bitmap, (attr & ~(0xFF << shift)) | (d << shift)
+    shift = (a & 1) * 8
+    return ctrl, (bitmap & ~(0xFF << shift)) | (d << shift), attr
+
+
+class Chip:
+    """Pin level model of tt_um_rebeccargb_styler.
+
+    clock() applies a rising edge of clk with the given inputs; outputs()
+    returns the values on (uo_out, uio_out) for the current register state
+    and inputs. pipeline is the number of pipeline registers the RTL was
+    built with (STYLER_PIPELINE); the styled bitmap then comes from the
+    inputs that many clocks earlier. lanes is the number of styler lanes
+    (STYLER_LANES); the bitmap and attribute registers are kept per lane.
+    modes is the mask of mode bits built in (STYLER_MODES), the others
+    reading back as 0, and palette whether the store and recall commands
+    are built in (STYLER_PALETTE).
+    """
+
+    def __init__(self, pipeline=0, lanes=1, modes=MODES_DEFAULT, palette=False):
+        assert 0 <= pipeline <= 2
+        assert lanes in (1, 2)
+        assert modes & ~MODE_MASK == 0
+        self.pipeline = pipeline
+        self.lanes = lanes
+        self.modes = modes
+        self.palette_enable = palette
+        self.reset()
+
+    def reset(self):
+        self.scanline = 0
+        self.ctrl = CTRL_DEFAULT
+        self.bitmap = [0] * self.lanes
+        self.attr = [0] * self.lanes
+        self.ctrl_next = CTRL_DEFAULT
+        self.bitmap_next = [0] * self.lanes
+        self.attr_next = [0] * self.lanes
+        self.lane = 0
+        self.palette = [0] * PALETTE_SIZE
+        self.mode = 0
+        self.burst_addr = 0
+        self.burst_write = False
+        self.burst_valid = False
+        self.burst_count = 0
+        self.stream_out = 0
+        self.shift_out = 0
+        self.shift_count = 0
+        self.cursor_column = 0
+        self.cursor_row = 0
+        self.char_count = 0xFF
+        self.row_count = 0
+        self.frame_count = 0
+        self.blink_rate = 4
+        self.cursor_rate = 4
+        # Styled bitmaps (per lane) and stream loads in the pipeline, oldest first
+        self.pipe = [[0] * self.pipeline for _ in range(self.lanes)]
+        self.load_pipe = [False] * self.pipeline
+
+    def stream_enable(self):
+        return bool(self.mode & STREAM) and not self.mode & BUFFER
+
+    def line_auto(self):
+        return bool(self.mode & LINE_AUTO) and not self.mode & BUFFER
+
+    def latch_enable(self):
+        return self.stream_enable() or self.line_auto()
+
+    def burst_offset(self, ui_in):
+        if not (self.mode & BURST and self.burst_valid):
+            return 0
+        if self.burst_addr != ui_in & 7 or self.burst_write != (not ui_in & 0x80):
+            return 0
+        return self.burst_count
+
+    def address(self, ui_in):
+        """Return the register address selected by ui_in, taking burst mode into account."""
+        a = ui_in & 7
+        offset = self.burst_offset(ui_in)
+        if a & ATTR:
+            return ATTR | ((a + offset) & 3)
+        if a & BMAP:
+            return BMAP | ((a ^ offset) & 1)
+        return a
+
+    def access_lane(self, ui_in):
+        """Return the lane accessed at the address on ui_in, taking bursts across lanes into account."""
+        if self.lanes == 1:
+            return 0
+        a = ui_in & 7
+        offset = self.burst_offset(ui_in)
+        if a & ATTR:
+            return self.lane
+        if a & BMAP:
+            return self.lane ^ (offset >> 1)
+        if a == LINE and ui_in & 0x80:
+            return self.lane ^ (offset & 1)
+        return self.lane
+
+    def styled(self, ui_in, uio_in, lane=0):
+        """Return the styler outputs (logical scanline, styled bitmap) of a lane for the given inputs."""
+        scanline, bitmap = self.scanline, self.bitmap[lane]
+        phase = ui_in & PHASE_MASK
+        if lane == 0:
+            a = self.address(ui_in)
+            load = self.access_lane(ui_in) == 0
+            if self.stream_enable() and not self.line_auto() and a == LINE and ui_in & 0x40:
+                scanline = uio_in & 0xF
+            if self.latch_enable() and a == BMAP | 1 and ui_in & 0xC0 == 0x40 and load:
+                bitmap = (bitmap & 0xFF) | ((uio_in & 0xFF) << 8)
+            if self.mode & CURSOR_AUTO:
+                match = self.char_count == self.cursor_column and self.row_count == self.cursor_row
+                phase = (phase & ~CURSOR) | (CURSOR if match else 0)
+        if self.mode & BLINK_AUTO:
+            phase &= ~BLINK_PHASE
+            if (self.frame_count >> self.blink_rate) & 1:
+                phase |= BLINK_PHASE
+            if self.ctrl & PHASE_DECOUPLE:
+                phase &= ~FAINT_PHASE
+                if (self.frame_count >> self.cursor_rate) & 1:
+                    phase |= FAINT_PHASE
+        return styler(phase, self.ctrl, self.attr[lane], scanline, bitmap)
+
+    def bus(self, ui_in, uio_in=0):
+        """Return the value of the register read at the address on ui_in."""
+        a = self.address(ui_in)
+        lane = self.access_lane(ui_in)
+        if a & ATTR:
+            if a == ATTR | 3:
+                return self.mode | (self.attr[lane] >> 24)
+            return (self.attr[lane] >> ((a & 3) * 8)) & 0xFF
+        if a == CTRL:
+            return self.ctrl
+        if a & BMAP:
+            return (self.latched(ui_in, uio_in, lane) >> ((a & 1) * 8)) & 0xFF
+        return self.styled(ui_in, uio_in, lane)[0]
+
+    def latched(self, ui_in, uio_in, lane=0):
+        """Return the styled bitmap read at the bitmap addresses (the latched one in stream or line mode)."""
+        if lane == 0 and self.latch_enable():
+            return self.stream_out
+        if self.pipeline:
+            return self.pipe[lane][0]
+        return self.styled(ui_in, uio_in, lane)[1]
+
+    def outputs(self, ui_in, uio_in=0):
+        f8 = self.bus(ui_in, uio_in)
+        if self.mode & SHIFT:
+            return (f8 & 0x7F) | ((self.shift_out >> 8) & 0x80), f8
+        return f8, f8
+
+    def write(self, a, d, lane=0):
+        if a == LINE:
+            self.scanline = d & 0xF
+            if self.lanes == 2:
+                self.lane = 1 if d & LANE_SELECT else 0
+            return
+        if a == CTRL:
+            self.ctrl_next = d
+            if not self.mode & BUFFER:
+                self.ctrl = d
+            return
+        _, self.bitmap_next[lane], self.attr_next[lane] = _load(
+            a, d, 0, self.bitmap_next[lane], self.attr_next[lane]
+        )
+        if not self.mode & BUFFER:
+            _, self.bitmap[lane], self.attr[lane] = _load(a, d, 0, self.bitmap[lane], self.attr[lane])
+        if a == ATTR | 3:
+            self.mode = d & self.modes
+
+    def commit(self):
+        self.ctrl = self.ctrl_next
+        self.bitmap = list(self.bitmap_next)
+        self.attr = list(self.attr_next)
+
+    def command(self, c, d):
+        if c == COMMIT:
+            self.commit()
+        elif c == STORE and self.palette_enable:
+            self.palette[d % PALETTE_SIZE] = self.attr_next[self.lane]
+        elif c == RECALL and self.palette_enable:
+            self.attr_next[self.lane] = self.palette[d % PALETTE_SIZE]
+            if not self.mode & BUFFER:
+                self.attr[self.lane] = self.attr_next[self.lane]
+        elif c == HSYNC:
+            if self.scanline == 15:
+                self.row_count = (self.row_count + 1) & 0xFF
+            self.scanline = (self.scanline + 1) & 0xF
+            self.char_count = 0xFF
+        elif c == VSYNC:
+            self.scanline = 0
+            self.char_count = 0xFF
+            self.row_count = 0
+            self.frame_count = (self.frame_count + 1) & 0xFF
+        elif c == CURSOR_COLUMN:
+            self.cursor_column = d
+        elif c == CURSOR_ROW:
+            self.cursor_row = d
+        elif c == BLINK_RATE:
+            self.blink_rate = d & 7
+            self.cursor_rate = (d >> 4) & 7
+
+    def clock(self, ui_in, uio_in, rst_n=1):
+        if not rst_n:
+            self.reset()
+            return
+        a = self.address(ui_in)
+        lane = self.access_lane(ui_in)
+        offset = self.burst_offset(ui_in)
+        if self.mode & SHIFT and self.shift_count != 15:
+            self.shift_out = (self.shift_out << 1) & 0xFFFF
+        else:
+            self.shift_out = self.latched(ui_in, uio_in)
+        self.shift_count = (self.shift_count + 1) & 15 if self.mode & SHIFT else 0
+        write = ui_in & 0xC0 == 0x40
+        if self.mode & BUFFER:
+            advance = ui_in & 0xC7 == COMMIT
+        else:
+            advance = write and a == BMAP and lane == 0
+        load = self.latch_enable() and a == BMAP | 1 and write and lane == 0
+        styled = [self.styled(ui_in, uio_in, i)[1] for i in range(self.lanes)]
+        if load and self.line_auto():
+            self.scanline = (self.scanline + 1) & 0xF
+        if self.pipeline:
+            for i in range(self.lanes):
+                self.pipe[i].append(styled[i])
+                styled[i] = self.pipe[i].pop(0)
+            self.load_pipe.append(load)
+            load = self.load_pipe.pop(0)
+        if load:
+            self.stream_out = styled[0]
+        if write:
+            self.write(a, uio_in & 0xFF, lane)
+        elif not ui_in & 0xC0:
+            self.command(ui_in & 7, uio_in & 0xFF)
+        if advance:
+            self.char_count = (self.char_count + 1) & 0xFF
+        self.burst_addr = ui_in & 7
+        self.burst_write = not ui_in & 0x80
+        self.burst_valid = ui_in & 0xC0 in (0x40, 0x80)
+        self.burst_count = (offset + 1) & 3
+
+
+def random_vector(rng):
+    """Return a random (phase, ctrl, attr, scanline, bitmap) vector."""
+    return (
+        rng.getrandbits(8) & PHASE_MASK,
+        rng.getrandbits(8),
+        rng.getrandbits(25),
+        rng.getrandbits(4),
+        rng.getrandbits(16),
+    )
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Incremental regression runner.
+#
+# Every @cocotb.test() in test.py is a test group. A group is skipped if a
+# passing result is cached for the same key, which is a hash of:
+#
+#   - src/*.v (or gate_level_netlist.v for GATES=yes), tb.v and the Makefile
+#   - the make variables the run uses (SIM, GATES, DUMP, GL_SAMPLE, PIPELINE, LANES,
+#     MODES, PALETTE and --make extras)
+#   - test.py outside of the test functions and the local modules it
+#     imports, directly or through other local modules
+#   - the source of the group itself, i.e. its vectors
+#   - for groups that read the vectors of every group (through vectors() or
+#     gl_sample(), which sty_tester() calls in gate level simulation), the
+#     source of every group that has vectors
+#
+# The compiled simulation is kept in sim_build/cache/<hash of the first two>
+# and reused as long as the sources are unchanged.
+#
+#   ./regress.py                 run the groups that need running
+#   ./regress.py --force         run every group
+#   ./regress.py test_cursor     only consider the given groups
+
+import argparse
+import ast
+import datetime
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+
+# Functions that read the vectors of every group in test.py (see sample.py).
+VECTOR_READERS = {"vectors", "gl_sample"}
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def groups(path):
+    """Return the test groups in path as {name: source}, plus the shared source."""
+    text = read(path).decode()
+    tree = ast.parse(text)
+    found = {}
+    shared = text
+    for node in tree.body:
+        if isinstance(node, ast.AsyncFunctionDef) and any(
+            ast.get_source_segment(text, d).startswith("cocotb.test") for d in node.decorator_list
+        ):
+            source = ast.get_source_segment(text, node)
+            found[node.name] = source
+            shared = shared.replace(source, "")
+    return found, shared
+
+
+def helpers(path, found=None):
+    """Return the file names of the local modules path imports, directly or through other local modules."""
+    found = set() if found is None else found
+    for node in ast.walk(ast.parse(read(path))):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and not node.level:
+            modules = [node.module]
+        else:
+            continue
+        for module in modules:
+            name = module.split(".")[0] + ".py"
+            if name not in found and os.path.exists(os.path.join(HERE, name)):
+                found.add(name)
+                helpers(os.path.join(HERE, name), found)
+    return sorted(found)
+
+
+def calls(source):
+    """Return the names of the functions source calls by name."""
+    return {
+        node.func.id for node in ast.walk(ast.parse(source))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+    }
+
+
+def group_keys(found, common, variables):
+    """Return {name: key} for the groups in found, see the top of this file."""
+    called = {name: calls(source) for name, source in found.items()}
+    vectors = digest(*(found[name] for name in sorted(found) if "sty_test" in called[name]))
+    readers = set(VECTOR_READERS)
+    if variables.get("GATES") == "yes" and variables.get("GL_SAMPLE") != "all":
+        readers.add("sty_tester")
+    return {
+        name: digest(common, name, found[name], *([vectors] if called[name] & readers else []))
+        for name in found
+    }
+
+
+def build_key(variables):
+    if variables.get("GATES") == "yes":
+        sources = [os.path.join(HERE, "gate_level_netlist.v")]
+    else:
+        sources = sorted(glob.glob(os.path.join(SRC, "*.v")))
+    parts = []
+    for path in sources + [os.path.join(HERE, "tb.v"), os.path.join(HERE, "Makefile")]:
+        parts += [os.path.basename(path), read(path)]
+    parts += [f"{k}={v}" for k, v in sorted(variables.items())]
+    return digest(*parts)
+
+
+def run_groups(names, build, variables):
+    results = os.path.join(build, "results.xml")
+    cmd = ["make", f"SIM_BUILD={build}", f"COCOTB_RESULTS_FILE={results}", f"TESTCASE={','.join(names)}"]
+    cmd += [f"{k}={v}" for k, v in sorted(variables.items())]
+    if os.path.exists(os.path.join(HERE, build, ".built")):
+        # Same sources as last time: don't let timestamps trigger a rebuild.
+        cmd += ["-o", f"{build}/sim.vvp", "-o", f"{build}/Vtop.mk", "-o", f"{build}/Vtop"]
+    if os.path.exists(os.path.join(HERE, results)):
+        os.remove(os.path.join(HERE, results))
+    subprocess.run(cmd, cwd=HERE)
+
+    status = {}
+    if os.path.exists(os.path.join(HERE, results)):
+        open(os.path.join(HERE, build, ".built"), "w").close()
+        for case in ET.parse(os.path.join(HERE, results)).iter("testcase"):
+            if case.get("name") in names:
+                failed = case.find("failure") is not None or case.find("error") is not None
+                status[case.get("name")] = "fail" if failed else "pass"
+    return status, os.path.join(HERE, results)
+
+
+def write_results(path, status, ran_results):
+    suite = ET.Element("testsuite", name="regress")
+    cases = {}
+    if ran_results and os.path.exists(ran_results):
+        for case in ET.parse(ran_results).iter("testcase"):
+            cases[case.get("name")] = case
+    for name, result in status.items():
+        case = cases.get(name)
+        if case is None:
+            case = ET.Element("testcase", name=name, classname="test")
+            if result == "cached":
+                ET.SubElement(case, "skipped", message="passed with identical sources (cached)")
+            elif result != "pass":
+                ET.SubElement(case, "failure", message="no result")
+        suite.append(case)
+    root = ET.Element("testsuites")
+    root.append(suite)
+    ET.ElementTree(root).write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the test groups in test.py that are not known to pass.")
+    parser.add_argument("groups", nargs="*", help="groups to consider (default: all)")
+    parser.add_argument("--force", action="store_true", help="ignore cached results and run every group")
+    parser.add_argument("--cache-dir", default=os.path.join(HERE, ".regress"), help="where passing results are kept")
+    parser.add_argument("--make", action="append", default=[], metavar="VAR=VALUE", help="extra make variable")
+    parser.add_argument("--results", default=os.path.join(HERE, "results.xml"), help="combined results file")
+    parser.add_argument("--list", action="store_true", help="only show which groups would run")
+    args = parser.parse_args()
+
+    variables = {
+        "SIM": os.environ.get("SIM", "icarus"),
+        "GATES": os.environ.get("GATES", "no"),
+        "DUMP": os.environ.get("DUMP", "yes"),
+    }
+    for var in ("GL_SAMPLE", "PIPELINE", "LANES", "MODES", "PALETTE"):
+        if var in os.environ:
+            variables[var] = os.environ[var]
+    for var in args.make:
+        k, _, v = var.partition("=")
+        variables[k] = v
+
+    test = os.path.join(HERE, "test.py")
+    found, shared = groups(test)
+    names = args.groups or list(found)
+    for name in names:
+        if name not in found:
+            sys.exit(f"No such test group: {name}")
+
+    bkey = build_key(variables)
+    common = digest(bkey, shared, *(part for helper in helpers(test) for part in (helper, read(os.path.join(HERE, helper)))))
+    keys = group_keys(found, common, variables)
+
+    cache = os.path.join(args.cache_dir, "results")
+    os.makedirs(cache, exist_ok=True)
+
+    status = {}
+    todo = []
+    for name in names:
+        if not args.force and os.path.exists(os.path.join(cache, keys[name] + ".json")):
+            status[name] = "cached"
+        else:
+            todo.append(name)
+
+    if args.list:
+        for name in names:
+            print(f"{name:24} {status.get(name, 'run')}")
+        return
+
+    ran_results = None
+    if todo:
+        build = os.path.join("sim_build", "cache", bkey[:16])
+        ran, ran_results = run_groups(todo, build, variables)
+        for name in todo:
+            status[name] = ran.get(name, "missing")
+            if status[name] == "pass":
+                with open(os.path.join(cache, keys[name] + ".json"), "w") as f:
+                    json.dump({
+                        "group": name,
+                        "variables": variables,
+                        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                    }, f)
+
+    write_results(args.results, status, ran_results)
+    for name in names:
+        print(f"{name:24} {status[name]}")
+    if any(result not in ("pass", "cached") for result in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Run the bench.py workload under every available configuration and append
+# the vectors-per-second figures to a CSV file, one row per configuration:
+#
+#   simulator   icarus, verilator (whichever is installed)
+#   netlist     rtl, gl (gl only if gate_level_netlist.v is present)
+#   access      frontdoor, backdoor (backdoor is rtl only)
+#   cycles      3 or 1 clocks per frontdoor bus operation
+#   dump        tb.vcd dumping on or off
+#
+# Example:
+#
+#   ./run_bench.py --vectors 10000 --seed 1 --csv bench.csv
+
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SIMULATORS = {
+    "icarus": ["iverilog", "-V"],
+    "verilator": ["verilator", "--version"],
+}
+
+DRIVERS = [
+    ("frontdoor", 3),
+    ("frontdoor", 1),
+    ("backdoor", 0),
+]
+
+FIELDS = [
+    "date", "revision", "host", "machine", "cpus", "python", "simulator", "version",
+    "netlist", "access", "cycles", "dump", "vectors", "seed", "seconds", "vectors_per_second",
+    "status",
+]
+
+
+def run(cmd):
+    try:
+        return subprocess.run(cmd, cwd=HERE, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def revision():
+    rev = run(["git", "rev-parse", "--short", "HEAD"]) or "unknown"
+    if run(["git", "status", "--porcelain", "--", "../src", "."]):
+        rev += "-dirty"
+    return rev
+
+
+def configurations(sims, gates):
+    netlists = ["rtl"] + (["gl"] if gates else [])
+    for sim, netlist, (access, cycles), dump in itertools.product(sims, netlists, DRIVERS, ["yes", "no"]):
+        if access == "backdoor" and netlist == "gl":
+            continue
+        yield sim, netlist, access, cycles, dump
+
+
+def bench(sim, netlist, access, cycles, dump, args):
+    name = f"{sim}-{netlist}-dump{dump}"
+    build = os.path.join("sim_build", "bench", name)
+    result = os.path.join(HERE, build, f"{access}{cycles}.json")
+    if os.path.exists(result):
+        os.remove(result)
+
+    cmd = [
+        "make", f"SIM={sim}", f"SIM_BUILD={build}", f"DUMP={dump}", "MODULE=bench",
+        f"COCOTB_RESULTS_FILE={build}/results.xml",
+    ]
+    if netlist == "gl":
+        cmd.append("GATES=yes")
+    env = dict(
+        os.environ,
+        BENCH_VECTORS=str(args.vectors),
+        BENCH_SEED=str(args.seed),
+        BENCH_ACCESS=access,
+        BENCH_CYCLES=str(cycles or 3),
+        BENCH_RESULT=result,
+    )
+    proc = subprocess.run(cmd, cwd=HERE, env=env, capture_output=not args.verbose, text=True)
+    if proc.returncode or not os.path.exists(result):
+        return None
+    with open(result) as f:
+        return json.load(f)["seconds"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the verification flow.")
+    parser.add_argument("--vectors", type=int, default=10000, help="number of model-checked vectors")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the workload")
+    parser.add_argument("--csv", default=os.path.join(HERE, "bench.csv"), help="CSV file to append to")
+    parser.add_argument("--sim", action="append", choices=sorted(SIMULATORS), help="simulator (default: all installed)")
+    parser.add_argument("--verbose", action="store_true", help="show simulator output")
+    args = parser.parse_args()
+
+    sims = [sim for sim in (args.sim or SIMULATORS) if shutil.which(SIMULATORS[sim][0])]
+    if not sims:
+        sys.exit("No simulator found.")
+    gates = os.path.exists(os.path.join(HERE, "gate_level_netlist.v")) and "PDK_ROOT" in os.environ
+
+    common = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": revision(),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "vectors": args.vectors,
+        "seed": args.seed,
+    }
+    versions = {sim: (run(SIMULATORS[sim]).splitlines() or [""])[0] for sim in sims}
+
+    new = not os.path.exists(args.csv)
+    with open(args.csv, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new:
+            writer.writeheader()
+        for sim, netlist, access, cycles, dump in configurations(sims, gates):
+            seconds = bench(sim, netlist, access, cycles, dump, args)
+            row = dict(
+                common, simulator=sim, version=versions[sim], netlist=netlist,
+                access=access, cycles=cycles or "", dump=dump,
+                seconds=f"{seconds:.3f}" if seconds else "",
+                vectors_per_second=f"{args.vectors / seconds:.1f}" if seconds else "",
+                status="pass" if seconds else "fail",
+            )
+            writer.writerow(row)
+            f.flush()
+            print(f"{sim:10} {netlist:3} {access:9} {cycles or '-':>2} dump={dump:3} {row['vectors_per_second'] or row['status']:>10}")
+
+
+if __name__ == "__main__":
+    main()
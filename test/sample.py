@@ -0,0 +1,153 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Coverage-weighted sampling of the test.py vectors for gate level runs.
+#
+# Gate level simulation is far slower than RTL, so with GATES=yes only a
+# sample of the sty_test() vectors is run. The sample always contains:
+#
+#   - at least one vector setting each attr bit, each ctrl bit and each
+#     phase pin, and taking each branch of the styler that the full list
+#     takes (see features() below)
+#   - every vector that is one of the RARE or fewer vectors taking some
+#     branch, so that rarely exercised logic is checked exactly as in RTL
+#
+# and is then topped up, rarest vectors first, to GL_SAMPLE vectors.
+# GL_SAMPLE=all runs the full list; the default is the minimal sample.
+
+import ast
+import os
+
+import model
+from model import (
+    CURSOR_TOP, CURSOR_BOTTOM, LINE_ENABLE, BLINK_ENABLE, EXTRA_BOLD, PHASE_DECOUPLE,
+    FAINT_PHASE, BLINK_PHASE, CURSOR, CURSOR_ENABLE,
+    Y_POSTMIRROR, X_PREMIRROR, X_POSTMIRROR, X_OFFSET, X_SCALE,
+    BOLD, ITALIC, REVERSE_ITALIC, BLINK, ALTERNATE, HIDDEN,
+    UNDERLINE, DOUBLE_UNDERLINE, DOTTED_UNDERLINE,
+    STRIKE, DOUBLE_STRIKE, DOTTED_STRIKE,
+    OVERLINE, DOUBLE_OVERLINE, DOTTED_OVERLINE,
+)
+
+RARE = 2
+
+
+def key(phase, ctrl, attr, bmp):
+    return (phase, ctrl, attr, tuple(bmp))
+
+
+def vectors(path, namespace):
+    """Return the arguments of every sty_test() call in the test functions of path.
+
+    The arguments are evaluated in namespace, normally the test module's globals().
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    found = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "sty_test":
+            args = [eval(compile(ast.Expression(arg), path, "eval"), namespace) for arg in node.args]
+            found.append(key(*args))
+    return found
+
+
+def _line_variant(attr, single, double, dotted):
+    if not attr & (single | double | dotted):
+        return None
+    return (bool(attr & single), bool(attr & double), bool(attr & dotted))
+
+
+def features(vector):
+    """Return the set of register bits, phase pins and styler branches a glyph vector exercises."""
+    phase, ctrl, attr, bmp = vector
+    found = set()
+    found.update(("phase", bit) for bit in (FAINT_PHASE, BLINK_PHASE, CURSOR) if phase & bit)
+    found.update(("ctrl", 1 << i) for i in range(8) if ctrl & (1 << i))
+    found.update(("attr", 1 << i) for i in range(25) if attr & (1 << i))
+
+    faint_phase = bool(phase & FAINT_PHASE) and not (ctrl & PHASE_DECOUPLE)
+    blink_phase = bool(phase & BLINK_PHASE)
+    cursor_phase = bool(phase & FAINT_PHASE) if ctrl & PHASE_DECOUPLE else not (phase & BLINK_PHASE)
+    cursor_enable = bool(phase & CURSOR) and bool(ctrl & CURSOR_ENABLE)
+    found.add(("cursor-phase", bool(ctrl & PHASE_DECOUPLE), cursor_phase))
+
+    lines = [
+        ("underline", _line_variant(attr, UNDERLINE, DOUBLE_UNDERLINE, DOTTED_UNDERLINE)),
+        ("strike", _line_variant(attr, STRIKE, DOUBLE_STRIKE, DOTTED_STRIKE)),
+        ("overline", _line_variant(attr, OVERLINE, DOUBLE_OVERLINE, DOTTED_OVERLINE)),
+    ]
+
+    for scanline in range(16):
+        _, s3, inverse, faint, fphase, solid = model.linegen(
+            scanline, attr, ctrl, faint_phase, cursor_enable, cursor_phase
+        )
+        if inverse != bool(attr & model.INVERSE):
+            found.add(("cursor", bool(ctrl & CURSOR_TOP), bool(ctrl & CURSOR_BOTTOM), scanline))
+        if solid:
+            for name, variant in lines:
+                if variant and ctrl & LINE_ENABLE:
+                    found.add((name, variant, s3))
+        if faint:
+            found.add(("faint", fphase))
+        if attr & (ITALIC | REVERSE_ITALIC) in (ITALIC, REVERSE_ITALIC):
+            found.add(("italic", attr & (ITALIC | REVERSE_ITALIC), s3 >> 2))
+        if attr & Y_POSTMIRROR:
+            found.add(("y-postmirror", s3 & 1))
+
+    if attr & BOLD:
+        found.add(("bold", bool(ctrl & EXTRA_BOLD)))
+    if attr & BLINK:
+        found.add(("blink", blink_phase and bool(ctrl & BLINK_ENABLE)))
+    if attr & ALTERNATE:
+        found.add(("alternate", blink_phase or not (ctrl & BLINK_ENABLE)))
+    if attr & HIDDEN:
+        found.add(("hidden", bool(attr & (BLINK | ALTERNATE))))
+    for bit in (X_PREMIRROR, X_POSTMIRROR, X_OFFSET, X_SCALE):
+        if attr & bit:
+            found.add(("x", bit, any(row != model._MIRROR[row] for row in bmp[0::2])))
+    return found
+
+
+def select(all_vectors, size=None, rare=RARE):
+    """Return the sample of all_vectors as a set of vectors."""
+    covers = {v: features(v) for v in all_vectors}
+    count = {}
+    for found in covers.values():
+        for f in found:
+            count[f] = count.get(f, 0) + 1
+
+    def weight(found):
+        return sum(1 / count[f] for f in found)
+
+    chosen = set()
+    covered = set()
+    for v, found in covers.items():
+        if any(count[f] <= rare for f in found):
+            chosen.add(v)
+            covered |= found
+
+    # Greedy set cover, weighting each feature by how rare it is.
+    while True:
+        best, best_score = None, 0
+        for v, found in covers.items():
+            if v not in chosen:
+                score = weight(found - covered)
+                if score > best_score:
+                    best, best_score = v, score
+        if best is None:
+            break
+        chosen.add(best)
+        covered |= covers[best]
+
+    if size is not None and size > len(chosen):
+        rest = sorted((v for v in covers if v not in chosen), key=lambda v: -weight(covers[v]))
+        chosen.update(rest[:size - len(chosen)])
+    return chosen
+
+
+def gl_sample(path, namespace):
+    """Return the sample selected by GL_SAMPLE, or None to run everything."""
+    setting = os.environ.get("GL_SAMPLE", "")
+    if setting == "all":
+        return None
+    return select(vectors(path, namespace), int(setting) if setting else None)
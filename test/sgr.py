@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Streaming parser from a VT100/ECMA-48 byte stream to (glyph, attr) cells,
+# with attr in the 25-bit layout of addresses 4-7 (see model.py).
+#
+# Parser.feed() takes the stream a chunk at a time and writes a cell for
+# every byte outside an escape sequence into the caller's buffers: the
+# glyph code into a bytearray and the attributes into an array('L').
+# Control characters are passed through as glyphs, for the caller to act
+# on; escape sequences may be split across chunks. SGR sequences (CSI ... m)
+# change the attributes, and every other sequence (CSI, OSC, DCS and so on)
+# is skipped. 8-bit C1 controls are not recognized, as bytes 0x80-0x9F are
+# glyphs of the character set.
+#
+# Each SGR parameter clears and sets some attr bits (SGR below), and so
+# does a whole sequence: the (keep, set) masks of each parameter string are
+# worked out once and kept in an LRU cache of CACHE_SIZE strings, so a
+# repeated sequence costs a lookup. The cache is bounded because truecolour
+# output (38;2;r;g;b) can make nearly every sequence different.
+# Runs of text are copied with slice assignments, without allocating
+# anything per character.
+#
+# Run as a script, it reports the MB/s for a generated stream of coloured
+# and styled text, with and without the cache:
+#
+#   ./sgr.py --megabytes 16
+
+import argparse
+import array
+import functools
+import random
+import re
+import time
+
+from model import (
+    BOLD, FAINT, ITALIC, REVERSE_ITALIC, BLINK, ALTERNATE, INVERSE, HIDDEN,
+    UNDERLINE, DOUBLE_UNDERLINE, DOTTED_UNDERLINE,
+    STRIKE, DOUBLE_STRIKE, DOTTED_STRIKE,
+    OVERLINE, DOUBLE_OVERLINE, DOTTED_OVERLINE,
+)
+
+ESC = 0x1B
+
+# The attributes SGR 0 resets; the X and Y attributes are left alone, as they
+# belong to the line (double width and height) rather than to the text.
+RENDITION = 0x01FFFF00
+
+UNDERLINES = UNDERLINE | DOUBLE_UNDERLINE | DOTTED_UNDERLINE
+STRIKES = STRIKE | DOUBLE_STRIKE | DOTTED_STRIKE
+OVERLINES = OVERLINE | DOUBLE_OVERLINE | DOTTED_OVERLINE
+
+# (clear, set) for each SGR parameter; anything else (colours, fonts) is ignored.
+SGR = {
+    0: (RENDITION, 0),
+    1: (0, BOLD),
+    2: (0, FAINT),
+    3: (0, ITALIC),
+    4: (UNDERLINES, UNDERLINE),
+    5: (0, BLINK),
+    6: (0, BLINK),
+    7: (0, INVERSE),
+    8: (0, HIDDEN),
+    9: (STRIKES, STRIKE),
+    21: (UNDERLINES, DOUBLE_UNDERLINE),
+    22: (BOLD | FAINT, 0),
+    23: (ITALIC | REVERSE_ITALIC, 0),
+    24: (UNDERLINES, 0),
+    25: (BLINK | ALTERNATE, 0),
+    27: (INVERSE, 0),
+    28: (HIDDEN, 0),
+    29: (STRIKES, 0),
+    53: (OVERLINES, OVERLINE),
+    55: (OVERLINES, 0),
+}
+
+# Underline styles given as 4:n
+UNDERLINE_STYLES = {
+    0: (UNDERLINES, 0),
+    1: (UNDERLINES, UNDERLINE),
+    2: (UNDERLINES, DOUBLE_UNDERLINE),
+    3: (UNDERLINES, UNDERLINE),
+    4: (UNDERLINES, DOTTED_UNDERLINE),
+    5: (UNDERLINES, DOTTED_UNDERLINE),
+}
+
+# Extended colours: 38;5;n and 38;2;r;g;b take 1 and 3 more parameters.
+EXTENDED_COLOURS = (38, 48, 58)
+EXTENDED_LENGTHS = {5: 1, 2: 3}
+
+CSI = re.compile(rb"\x1b\[([0-?]*)([ -/]*)([@-~])")
+# OSC, DCS, SOS, PM and APC, ended by BEL or ST
+STRINGS = (b"]", b"P", b"X", b"^", b"_")
+STRING = re.compile(rb"\x1b[\]PX^_].*?(\x07|\x1b\\)", re.S)
+OTHER = re.compile(rb"\x1b([ -/]+[0-~]|[0-Z\\`-~])")
+# The start of an escape sequence that may still be completed by the next chunk
+PARTIAL = re.compile(rb"\x1b(\[[0-?]*[ -/]*|[\]PX^_].*|[ -/]*)\Z", re.S)
+
+# Longest unfinished sequence kept for the next chunk; the ESC of a longer one is dropped.
+MAX_PARTIAL = 4096
+
+# Cells filled from one template at a time
+FILL = 4096
+
+# SGR parameter strings whose masks are cached
+CACHE_SIZE = 1024
+
+
+def _number(text):
+    return int(text) if text else 0
+
+
+def sgr_masks(params):
+    """Return (keep, set) for the parameter string of an SGR sequence: attr = (attr & keep) | set."""
+    keep, set_ = ~0, 0
+    if params.strip(b"0123456789:;"):
+        # Not made of numbers: ignore the whole sequence
+        return keep, set_
+    fields = params.split(b";")
+    i = 0
+    while i < len(fields):
+        parts = fields[i].split(b":")
+        i += 1
+        p = _number(parts[0])
+        if p in EXTENDED_COLOURS:
+            if len(parts) == 1 and i < len(fields):
+                i += EXTENDED_LENGTHS.get(_number(fields[i].partition(b":")[0]), 0) + 1
+            continue
+        if p == 4 and len(parts) > 1:
+            clear, bits = UNDERLINE_STYLES.get(_number(parts[1]), (0, 0))
+        else:
+            clear, bits = SGR.get(p, (0, 0))
+        keep &= ~clear
+        set_ = (set_ & ~clear) | bits
+    return keep, set_
+
+
+cached_sgr_masks = functools.lru_cache(maxsize=CACHE_SIZE)(sgr_masks)
+
+
+class Parser:
+    """The attributes so far and any unfinished escape sequence, from one feed() to the next."""
+
+    def __init__(self, attr=0, cache=True):
+        self.attr = attr
+        self.masks = cached_sgr_masks if cache else sgr_masks
+        self.partial = b""
+        self.fill_attr = None
+        self.fill = None
+
+    def set_masks(self, params):
+        keep, set_ = self.masks(params)
+        self.attr = (self.attr & keep) | set_
+
+    def text(self, data, start, end, glyphs, attrs, pos):
+        """Write cells for data[start:end] at pos, returning the next position."""
+        count = end - start
+        glyphs[pos:pos + count] = data[start:end]
+        if self.fill_attr != self.attr:
+            self.fill = memoryview(array.array("L", [self.attr]) * FILL)
+            self.fill_attr = self.attr
+        while count > FILL:
+            attrs[pos:pos + FILL] = self.fill
+            pos += FILL
+            count -= FILL
+        attrs[pos:pos + count] = self.fill[:count]
+        return pos + count
+
+    def feed(self, data, glyphs, attrs, pos=0):
+        """Parse a chunk of the stream, writing its cells from pos on; return the position after them.
+
+        glyphs is a bytearray and attrs an array('L') (or memoryviews of
+        them) with room for len(self.partial) + len(data) cells from pos on.
+        """
+        if self.partial:
+            data = self.partial + data
+            self.partial = b""
+        raw = data if isinstance(data, bytes) else bytes(data)
+        data = memoryview(raw)
+        glyphs = memoryview(glyphs)
+        attrs = memoryview(attrs)
+        i, end = 0, len(raw)
+        while i < end:
+            e = raw.find(ESC, i)
+            if e < 0:
+                e = end
+            if e > i:
+                pos = self.text(data, i, e, glyphs, attrs, pos)
+                if e == end:
+                    break
+            m = CSI.match(raw, e)
+            if m is not None:
+                # Private parameters (<, =, > or ?) or intermediates make it something else
+                if m.group(3) == b"m" and not m.group(2) and not m.group(1).startswith((b"<", b"=", b">", b"?")):
+                    self.set_masks(m.group(1))
+                i = m.end()
+                continue
+            m = (STRING if raw[e + 1:e + 2] in STRINGS else OTHER).match(raw, e)
+            if m is not None:
+                i = m.end()
+                continue
+            if end - e <= MAX_PARTIAL and PARTIAL.match(raw, e):
+                self.partial = raw[e:]
+                break
+            # Not an escape sequence: drop the ESC
+            i = e + 1
+        return pos
+
+
+def sample_stream(rng, size):
+    """Return about size bytes of text with SGR sequences, as from colourized tools."""
+    sequences = [
+        b"\x1b[0m", b"\x1b[1m", b"\x1b[1;31m", b"\x1b[4m", b"\x1b[0;1;4m", b"\x1b[22m",
+        b"\x1b[3;53m", b"\x1b[38;5;208m", b"\x1b[7m", b"\x1b[27m", b"\x1b[4:3m", b"\x1b[m",
+        b"\x1b[38;2;10;20;30;1m", b"\x1b[2K", b"\x1b]0;title\x07",
+    ]
+    words = [bytes(rng.choice(b"abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(1, 9))) for _ in range(200)]
+    parts = []
+    total = 0
+    while total < size:
+        part = rng.choice(sequences) if rng.random() < 0.15 else rng.choice(words) + (b"\r\n" if rng.random() < 0.1 else b" ")
+        parts.append(part)
+        total += len(part)
+    return b"".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the SGR parser's throughput.")
+    parser.add_argument("--megabytes", type=float, default=8, help="size of the stream (default: 8)")
+    parser.add_argument("--chunk", type=int, default=4096, help="bytes per feed() call (default: 4096)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    stream = sample_stream(random.Random(args.seed), int(args.megabytes * 1e6))
+    glyphs = bytearray(args.chunk)
+    attrs = array.array("L", [0]) * args.chunk
+    for cache in (True, False):
+        p = Parser(cache=cache)
+        cells = 0
+        start = time.perf_counter()
+        for i in range(0, len(stream), args.chunk):
+            cells += p.feed(stream[i:i + args.chunk], glyphs, attrs)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{'with' if cache else 'without'} the cache: {len(stream) / elapsed / 1e6:.1f} MB/s, "
+            f"{cells / elapsed / 1e6:.1f} M cells/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Automatic minimization of failing vectors.
+#
+# A vector is a (phase, ctrl, attr, rows) glyph vector, rows being the 16
+# bitmap rows indexed by logical scanline. Starting from a failing vector,
+# shrink() greedily tries simpler vectors -- dropping phase pins, clearing
+# ctrl and attr bits one at a time, zeroing bitmap rows and then clearing
+# the bits of the remaining rows -- and keeps every change that still
+# fails, until no single change does.
+#
+# minimize() does this against the DUT through the backdoor, using the
+# Python model as the reference, so it only works for RTL simulation.
+
+import model
+from driver import Backdoor
+
+PHASE_NAMES = ["FAINT_PHASE", "BLINK_PHASE", "CURSOR"]
+
+CTRL_NAMES = [
+    "CURSOR_BOTTOM", "CURSOR_TOP", "CURSOR_BLINK", "CURSOR_ENABLE",
+    "LINE_ENABLE", "BLINK_ENABLE", "EXTRA_BOLD", "PHASE_DECOUPLE",
+]
+
+ATTR_NAMES = [
+    "X_OFFSET", "X_SCALE", "Y_OFFSET", "Y_SCALE",
+    "X_PREMIRROR", "X_POSTMIRROR", "Y_PREMIRROR", "Y_POSTMIRROR",
+    "BOLD", "FAINT", "ITALIC", "REVERSE_ITALIC", "BLINK", "ALTERNATE", "INVERSE", "HIDDEN",
+    "UNDERLINE", "DOUBLE_UNDERLINE", "DOTTED_UNDERLINE",
+    "STRIKE", "DOUBLE_STRIKE", "DOTTED_STRIKE",
+    "OVERLINE", "DOUBLE_OVERLINE", "DOTTED_OVERLINE",
+]
+
+
+def bits(value):
+    return [1 << i for i in range(value.bit_length()) if value & (1 << i)]
+
+
+def candidates(vector):
+    """Yield the vectors that are one step simpler than vector."""
+    phase, ctrl, attr, rows = vector
+    for bit in bits(phase):
+        yield (phase & ~bit, ctrl, attr, rows)
+    for bit in bits(ctrl):
+        yield (phase, ctrl & ~bit, attr, rows)
+    for bit in bits(attr):
+        yield (phase, ctrl, attr & ~bit, rows)
+    for i, row in enumerate(rows):
+        if row:
+            yield (phase, ctrl, attr, rows[:i] + (0,) + rows[i + 1:])
+    for i, row in enumerate(rows):
+        for bit in bits(row):
+            if row != bit:
+                yield (phase, ctrl, attr, rows[:i] + (row & ~bit,) + rows[i + 1:])
+
+
+async def shrink(fails, vector):
+    """Return the smallest vector reachable from vector for which fails() is true."""
+    vector = (vector[0], vector[1], vector[2], tuple(vector[3]))
+    changed = True
+    while changed:
+        changed = False
+        for candidate in candidates(vector):
+            if await fails(candidate):
+                vector = candidate
+                changed = True
+                break
+    return vector
+
+
+async def minimize(dut, vector):
+    """Shrink a failing glyph vector against the DUT.
+
+    Returns None if the backdoor is not available or if the DUT agrees
+    with the model on vector (i.e. it is the expected result that is wrong).
+    """
+    if not Backdoor.available(dut):
+        return None
+    sty = Backdoor(dut)
+
+    async def fails(v):
+        return await sty.style_glyph(*v) != model.style_glyph(*v)
+
+    if not await fails(vector):
+        return None
+    return await shrink(fails, vector)
+
+
+def flags(value, names):
+    return "|".join(name for i, name in enumerate(names) if value & (1 << i)) or "0"
+
+
+def describe(vector):
+    phase, ctrl, attr, rows = vector
+    nonzero = ", ".join(f"{i}: 0b{row:016b}" for i, row in enumerate(rows) if row)
+    return (
+        f"phase={flags(phase >> 3, PHASE_NAMES)} ctrl={flags(ctrl, CTRL_NAMES)} "
+        f"attr={flags(attr, ATTR_NAMES)} rows={{{nonzero}}}"
+    )
+
+
+async def explain(dut, vector):
+    """Return a failure message for vector, including its minimized form if there is one."""
+    small = await minimize(dut, vector)
+    if small is None:
+        return f"vector failed: {describe(vector)}"
+    dut._log.error(f"smallest failing vector: {describe(small)}")
+    return f"vector failed: {describe(vector)}; smallest failing vector: {describe(small)}"
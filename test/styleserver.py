@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Styling service for preview and test clients, served with asyncio on a
+# Unix socket or a local TCP port. A client sends cells to style and gets
+# back their styled rows, all integers little endian:
+#
+#   request   u32 count, then count cells: u8 phase, u8 ctrl, u32 attr, 16 x u16 rows
+#   response  u32 count, then count x 16 x u16 styled rows
+#
+# The rows of a cell are indexed by logical scanline and the styled rows by
+# physical scanline, as in model.style_glyph. A client may send more
+# requests before the first is answered; the answers come back in order. A
+# request of zero cells is answered with the server's statistics instead:
+# u32 length, then that many bytes of JSON.
+#
+# Requests that arrive in the same turn of the event loop, from any client,
+# are styled together: identical cells (the same rows and canonical phase,
+# ctrl and attr, see glyphcache.canonical) are styled once, and the cells
+# of each style in one call of model.style_glyphs. The statistics give the
+# latency from a request's arrival to its answer, the cells and distinct
+# cells per batch, and the requests waiting when each batch was styled.
+#
+# bench starts a server (unless given --socket) and runs concurrent clients
+# that each send the text rows of a few screens, with and without
+# coalescing, and reports the throughput and the server's statistics:
+#
+#   ./styleserver.py serve --socket /tmp/styler-style.sock
+#   ./styleserver.py serve --port 7878
+#   ./styleserver.py bench --clients 16 --requests 50
+
+import argparse
+import array
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import random
+import socket
+import struct
+import sys
+import tempfile
+import time
+
+import model
+import video
+from chipserver import percentile, recv_exact
+from glyphcache import canonical
+
+HEADER = struct.Struct("<I")
+CELL = struct.Struct("<BBI16H")
+ROWS = struct.Struct("<16H")
+
+# Largest request accepted, in cells; anything bigger closes the connection.
+MAX_CELLS = 1 << 16
+
+# Latencies and batches kept for the statistics.
+HISTORY = 10000
+
+
+def pack_cells(cells):
+    """Pack (phase, ctrl, attr, rows) cells for a request."""
+    return b"".join(CELL.pack(phase, ctrl, attr, *rows) for phase, ctrl, attr, rows in cells)
+
+
+def unpack_rows(data):
+    """Unpack a response into lists of 16 styled rows."""
+    rows = array.array("H", data)
+    if sys.byteorder != "little":
+        rows.byteswap()
+    rows = rows.tolist()
+    return [rows[i:i + 16] for i in range(0, len(rows), 16)]
+
+
+class Stats:
+    """Requests, cells, batches and request latencies, in seconds."""
+
+    def __init__(self):
+        self.requests = 0
+        self.cells = 0
+        self.unique = 0
+        self.batches = 0
+        self.latencies = collections.deque(maxlen=HISTORY)
+        self.batch_cells = collections.deque(maxlen=HISTORY)
+        self.queue_depths = collections.deque(maxlen=HISTORY)
+
+    def summary(self):
+        def us(seconds):
+            return None if seconds is None else round(seconds * 1e6, 1)
+
+        return {
+            "requests": self.requests,
+            "cells": self.cells,
+            "unique_cells": self.unique,
+            "batches": self.batches,
+            "latency_us": {
+                "p50": us(percentile(self.latencies, 0.50)),
+                "p99": us(percentile(self.latencies, 0.99)),
+                "max": us(max(self.latencies, default=None)),
+            },
+            "batch_cells": {
+                "mean": round(sum(self.batch_cells) / len(self.batch_cells), 1) if self.batch_cells else None,
+                "max": max(self.batch_cells, default=None),
+            },
+            "queue_depth": {
+                "mean": round(sum(self.queue_depths) / len(self.queue_depths), 1) if self.queue_depths else None,
+                "max": max(self.queue_depths, default=None),
+            },
+        }
+
+
+class StyleServer:
+
+    def __init__(self, coalesce=True):
+        self.coalesce = coalesce
+        self.stats = Stats()
+        # (cells, future, arrival) of the requests not yet styled
+        self.pending = []
+
+    def submit(self, data):
+        """Queue a request of packed cells, returning a future of the packed answer."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((data, future, time.perf_counter()))
+        if not self.coalesce:
+            self.style_batch()
+        elif len(self.pending) == 1:
+            asyncio.get_running_loop().call_soon(self.style_batch)
+        return future
+
+    def style_batch(self):
+        """Style every pending request together and answer them."""
+        batch, self.pending = self.pending, []
+        # {canonical style: {rows: styled rows}} of the distinct cells
+        styles = {}
+        requests = []
+        for data, future, arrival in batch:
+            cells = []
+            for phase, ctrl, attr, *rows in CELL.iter_unpack(data):
+                style = canonical(phase, ctrl, attr)
+                rows = tuple(rows)
+                styles.setdefault(style, {})[rows] = None
+                cells.append((style, rows))
+            requests.append((cells, future, arrival))
+        for style, glyphs in styles.items():
+            for rows, styled in zip(glyphs, model.style_glyphs(*style, list(glyphs))):
+                glyphs[rows] = styled
+        done = time.perf_counter()
+        for cells, future, arrival in requests:
+            rows = array.array("H")
+            for style, glyph in cells:
+                rows.extend(styles[style][glyph])
+            if sys.byteorder != "little":
+                rows.byteswap()
+            if not future.cancelled():
+                future.set_result(HEADER.pack(len(cells)) + rows.tobytes())
+            self.stats.requests += 1
+            self.stats.cells += len(cells)
+            self.stats.latencies.append(done - arrival)
+        self.stats.batches += 1
+        self.stats.unique += sum(len(glyphs) for glyphs in styles.values())
+        self.stats.batch_cells.append(sum(len(cells) for cells, _, _ in requests))
+        self.stats.queue_depths.append(len(batch))
+
+    async def handle(self, reader, writer):
+        answers = asyncio.Queue()
+
+        async def answer():
+            while True:
+                future = await answers.get()
+                if future is None:
+                    return
+                writer.write(await future)
+                await writer.drain()
+
+        answering = asyncio.create_task(answer())
+        try:
+            while True:
+                (count,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if count == 0:
+                    text = json.dumps(self.stats.summary()).encode()
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result(HEADER.pack(len(text)) + text)
+                    await answers.put(future)
+                    continue
+                if count > MAX_CELLS:
+                    break
+                await answers.put(self.submit(await reader.readexactly(count * CELL.size)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            await answers.put(None)
+            try:
+                await answering
+            except ConnectionError:
+                pass
+            writer.close()
+
+
+async def serve(path=None, port=None, coalesce=True, ready=None):
+    server = StyleServer(coalesce)
+    if path is not None:
+        if os.path.exists(path):
+            os.unlink(path)
+        listener = await asyncio.start_unix_server(server.handle, path)
+    else:
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", port)
+    print(f"serving on {path or f'127.0.0.1:{port}'}", file=sys.stderr)
+    if ready is not None:
+        ready.set()
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        print(f"stopped: {json.dumps(server.stats.summary())}", file=sys.stderr)
+
+
+class Client:
+    """A connection to a styling service, at a Unix socket path or a local TCP port."""
+
+    def __init__(self, path=None, port=None):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection(("127.0.0.1", port))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def style(self, cells):
+        """Style (phase, ctrl, attr, rows) cells, returning the 16 styled rows of each."""
+        assert 0 < len(cells) <= MAX_CELLS
+        self.sock.sendall(HEADER.pack(len(cells)) + pack_cells(cells))
+        header = recv_exact(self.sock.recv, HEADER.size)
+        if header is None or HEADER.unpack(header)[0] != len(cells):
+            raise ConnectionError("styling service closed the connection")
+        return unpack_rows(recv_exact(self.sock.recv, len(cells) * ROWS.size))
+
+    def stats(self):
+        self.sock.sendall(HEADER.pack(0))
+        (size,) = HEADER.unpack(recv_exact(self.sock.recv, HEADER.size))
+        return json.loads(recv_exact(self.sock.recv, size))
+
+
+async def bench_client(path, requests, latencies):
+    """Send each packed request of requests in turn on a connection of its own, appending the round trips to latencies."""
+    reader, writer = await asyncio.open_unix_connection(path)
+    for data in requests:
+        sent = time.perf_counter()
+        writer.write(HEADER.pack(len(data) // CELL.size) + data)
+        (count,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+        await reader.readexactly(count * ROWS.size)
+        latencies.append(time.perf_counter() - sent)
+    writer.close()
+
+
+async def bench_clients(path, clients):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(bench_client(path, requests, latencies) for requests in clients))
+    return time.perf_counter() - start, latencies
+
+
+def serve_process(path, coalesce, ready):
+    # The server's own report goes to stderr; keep the benchmark's output clean
+    sys.stderr = open(os.devnull, "w")
+    try:
+        asyncio.run(serve(path, coalesce=coalesce, ready=ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def bench(args):
+    rng = random.Random(args.seed)
+    font = video.sample_font(rng)
+    mode = video.MODES["640x480@60"]
+    screens = [video.sample_screen(rng, mode) for _ in range(args.screens)]
+    rows = [
+        pack_cells(
+            (0, model.CTRL_DEFAULT, screen.attrs[i], font[screen.glyphs[i]])
+            for i in range(row * screen.columns, (row + 1) * screen.columns)
+        )
+        for screen in screens for row in range(screen.rows)
+    ]
+    clients = [[rng.choice(rows) for _ in range(args.requests)] for _ in range(args.clients)]
+    cells = sum(len(data) // CELL.size for requests in clients for data in requests)
+    print(f"{args.clients} clients, {args.requests} requests each, {cells // (args.clients * args.requests)} cells per request")
+    for coalesce in ([True] if args.socket else [True, False]):
+        server = None
+        path = args.socket
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(), "styler-style.sock")
+            ready = multiprocessing.Event()
+            server = multiprocessing.Process(target=serve_process, args=(path, coalesce, ready), daemon=True)
+            server.start()
+            ready.wait()
+        elapsed, latencies = asyncio.run(bench_clients(path, clients))
+        with Client(path) as client:
+            served = client.stats()
+        if server is not None:
+            server.terminate()
+            server.join()
+        print(
+            f"{'with' if coalesce else 'without'} coalescing: {cells / elapsed:.0f} cells per second, "
+            f"round trip p50 {percentile(latencies, 0.50) * 1e3:.2f} ms, p99 {percentile(latencies, 0.99) * 1e3:.2f} ms; "
+            f"{served['batch_cells']['mean']} cells per batch, "
+            f"{served['unique_cells'] / max(1, served['cells']):.0%} of them distinct, "
+            f"queue depth mean {served['queue_depth']['mean']}, max {served['queue_depth']['max']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve styling over a Unix socket or local TCP port, or benchmark it.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="serve styling")
+    where = serve_parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", help="Unix socket path")
+    where.add_argument("--port", type=int, help="TCP port on 127.0.0.1")
+    serve_parser.add_argument("--no-coalesce", action="store_true", help="style each request on its own")
+    bench_parser = sub.add_parser("bench", help="benchmark the service with concurrent clients")
+    bench_parser.add_argument("--socket", help="Unix socket path (default: start a server, with and without coalescing)")
+    bench_parser.add_argument("--clients", type=int, default=16, help="concurrent clients (default: 16)")
+    bench_parser.add_argument("--requests", type=int, default=50, help="requests per client (default: 50)")
+    bench_parser.add_argument("--screens", type=int, default=2, help="screens the rows are taken from (default: 2)")
+    bench_parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        bench(args)
+        return
+    try:
+        asyncio.run(serve(args.socket, args.port, not args.no_coalesce))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
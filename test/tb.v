@@ -7,11 +7,13 @@
 module tb ();
 
   // Dump the signals to a VCD file. You can view it with gtkwave.
+`ifndef NO_DUMP
   initial begin
     $dumpfile("tb.vcd");
     $dumpvars(0, tb);
     #1;
   end
+`endif
 
   // Wire up the inputs and outputs:
   reg clk;
@@ -1,294 +1,297 @@
 # SPDX-FileCopyrightText: © 2024 Tiny Tapeout
 # SPDX-License-Identifier: Apache-2.0
 
-import cocotb
-from cocotb.clock import Clock
-from cocotb.triggers import ClockCycles
-
+import random
 
-@cocotb.test()
-async def test_project(dut):
+import cocotb
+from cocotb.triggers import FallingEdge
+
+import model
+from driver import (
+    reset, pixel_monitor, output_monitor, Frontdoor, Backdoor, CocotbBackend, PIPELINE, LANES, MODES, PALETTE,
+)
+from host import Host, FLOWS
+from sample import gl_sample, key, vectors
+from shrink import explain
+from model import (
+    LINE, CTRL, BMAP, ATTR, BURST, STREAM, SHIFT, BUFFER, LINE_AUTO, CURSOR_AUTO,
+    BLINK_AUTO,
+    COMMIT, STORE, RECALL, HSYNC, VSYNC, CURSOR_COLUMN, CURSOR_ROW, BLINK_RATE,
+    MODE_MASK, LANE_SELECT,
+    FAINT_PHASE, BLINK_PHASE, CURSOR,
+    CURSOR_BOTTOM, CURSOR_TOP, CURSOR_EDGES, CURSOR_BLINK, CURSOR_ENABLE,
+    BLINK_ENABLE, EXTRA_BOLD, PHASE_DECOUPLE, CTRL_DEFAULT,
+    X_OFFSET, X_SCALE, Y_OFFSET, Y_SCALE,
+    X_PREMIRROR, X_POSTMIRROR, Y_PREMIRROR, Y_POSTMIRROR,
+    BOLD, FAINT, ITALIC, REVERSE_ITALIC, BLINK, ALTERNATE, INVERSE, HIDDEN,
+    UNDERLINE, DOUBLE_UNDERLINE, DOTTED_UNDERLINE,
+    STRIKE, DOUBLE_STRIKE, DOTTED_STRIKE,
+    OVERLINE, DOUBLE_OVERLINE, DOTTED_OVERLINE,
+)
+
+
+def missing(modes, palette=False):
+    """Return whether the RTL under test was built without any of the given modes, or the palette."""
+    return MODES & modes != modes or (palette and not PALETTE)
+
+
+async def setup(dut):
     dut._log.info("Start")
 
-    # Set the clock period to 10 us (100 KHz)
-    clock = Clock(dut.clk, 10, units="us")
-    cocotb.start_soon(clock.start())
-
     # Reset
     dut._log.info("Reset")
-    dut.ena.value = 1
-    dut.ui_in.value = 0
-    dut.uio_in.value = 0
-    dut.rst_n.value = 0
-    await ClockCycles(dut.clk, 10)
-    dut.rst_n.value = 1
+    await reset(dut)
 
     dut._log.info("Test project behavior")
+    return Frontdoor(dut)
+
 
-    LINE = 0
-    CTRL = 1
-    BMAP = 2
-    ATTR = 4
-
-    async def sty_write(a, d):
-        # Set address and data
-        dut.ui_in.value = 0xC0 | a
-        dut.uio_in.value = d & 0xFF
-        await ClockCycles(dut.clk, 1)
-        # Enable write
-        dut.ui_in.value = 0x40 | a
-        await ClockCycles(dut.clk, 1)
-        # Disable write
-        dut.ui_in.value = 0xC0 | a
-        await ClockCycles(dut.clk, 1)
-
-    async def sty_read(a):
-        # Enable output
-        dut.ui_in.value = 0x80 | a
-        await ClockCycles(dut.clk, 1)
-        r1 = dut.uo_out.value & 0xFF
-        r2 = dut.uio_out.value & 0xFF
-        # Disable output
-        dut.ui_in.value = 0xC0 | a
-        await ClockCycles(dut.clk, 1)
-        assert r1 == r2
-        return r1
-
-    async def bmp_write(a, d):
-        await sty_write(a | BMAP | 0, d >> 0)
-        await sty_write(a | BMAP | 1, d >> 8)
-
-    async def bmp_read(a):
-        b1 = await sty_read(a | BMAP | 0)
-        b2 = await sty_read(a | BMAP | 1)
-        return (b1 << 0) | (b2 << 8)
-
-    assert await sty_read(LINE) == 0x0
-    assert await sty_read(CTRL) == 0x3C
-    assert await bmp_read(0) == 0x0000
-
-    await sty_write(LINE, 0xF)
-    await sty_write(CTRL, 0xFF)
-    await bmp_write(0, 0xFFFF)
-
-    assert await sty_read(LINE) == 0xF
-    assert await sty_read(CTRL) == 0xFF
-    assert await bmp_read(0) == 0xFFFF
-
-    # Keep testing the module by changing the input values, waiting for
-    # one or more clock cycles, and asserting the expected output values.
-
-    FAINT_PHASE      = 0x08
-    BLINK_PHASE      = 0x10
-    CURSOR           = 0x20
-
-    CURSOR_BOTTOM    = 0x01
-    CURSOR_TOP       = 0x02
-    CURSOR_EDGES     = 0x03
-    CURSOR_BLINK     = 0x04
-    CURSOR_ENABLE    = 0x08
-    LINE_ENABLE      = 0x10
-    BLINK_ENABLE     = 0x20
-    EXTRA_BOLD       = 0x40
-    PHASE_DECOUPLE   = 0x80
-    CTRL_DEFAULT     = 0x3C
-
-    X_OFFSET         = 0x00000001
-    X_SCALE          = 0x00000002
-    Y_OFFSET         = 0x00000004
-    Y_SCALE          = 0x00000008
-    X_PREMIRROR      = 0x00000010
-    X_POSTMIRROR     = 0x00000020
-    Y_PREMIRROR      = 0x00000040
-    Y_POSTMIRROR     = 0x00000080
-    BOLD             = 0x00000100
-    FAINT            = 0x00000200
-    ITALIC           = 0x00000400
-    REVERSE_ITALIC   = 0x00000800
-    BLINK            = 0x00001000
-    ALTERNATE        = 0x00002000
-    INVERSE          = 0x00004000
-    HIDDEN           = 0x00008000
-    UNDERLINE        = 0x00010000
-    DOUBLE_UNDERLINE = 0x00020000
-    DOTTED_UNDERLINE = 0x00040000
-    STRIKE           = 0x00080000
-    DOUBLE_STRIKE    = 0x00100000
-    DOTTED_STRIKE    = 0x00200000
-    OVERLINE         = 0x00400000
-    DOUBLE_OVERLINE  = 0x00800000
-    DOTTED_OVERLINE  = 0x01000000
+def sty_tester(sty):
+    # Gate level simulation only runs a sample of the vectors (see sample.py).
+    sample = None if Backdoor.available(sty.dut) else gl_sample(__file__, globals())
 
     async def sty_test(phase, ctrl, attr, bmp):
-        await sty_write(phase | CTRL, ctrl)
-        await sty_write(phase | ATTR | 0, attr >> 0)
-        await sty_write(phase | ATTR | 1, attr >> 8)
-        await sty_write(phase | ATTR | 2, attr >> 16)
-        await sty_write(phase | ATTR | 3, attr >> 24)
+        if sample is not None and key(phase, ctrl, attr, bmp) not in sample:
+            return
+        await sty.write(phase | CTRL, ctrl)
+        await sty.write(phase | ATTR | 0, attr >> 0)
+        await sty.write(phase | ATTR | 1, attr >> 8)
+        await sty.write(phase | ATTR | 2, attr >> 16)
+        await sty.write(phase | ATTR | 3, attr >> 24)
         for phy_line in range(0, 16):
-            await sty_write(phase | LINE, phy_line)
-            log_line = await sty_read(phase | LINE)
-            await bmp_write(phase, bmp[log_line * 2])
-            res_bmp = await bmp_read(phase)
-            assert res_bmp == bmp[phy_line * 2 + 1]
-
-    #####################################################
-    #####################################################
-    ####   C U R S O R   D I S P L A Y   T E S T S   ####   240
-    #####################################################
-    #####################################################
-
-    NO_CHANGE = [
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000011000000, 0b0011000011000000,
-        0b0011000001100000, 0b0011000001100000,
-        0b0011000000110000, 0b0011000000110000,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b0011000000001100,
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-    ]
-
-    INVERTED = [
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000011000000, 0b1100111100111111,
-        0b0011000001100000, 0b1100111110011111,
-        0b0011000000110000, 0b1100111111001111,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b1100111111110011,
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-    ]
+            await sty.write(phase | LINE, phy_line)
+            log_line = await sty.read(phase | LINE)
+            await sty.bmp_write(phase, bmp[log_line * 2])
+            res_bmp = await sty.bmp_read(phase)
+            if res_bmp != bmp[phy_line * 2 + 1]:
+                raise AssertionError(await explain(sty.dut, (phase, ctrl, attr, bmp[0::2])))
 
-    INVERTED_TOP = [
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000011000000, 0b0011000011000000,
-        0b0011000001100000, 0b0011000001100000,
-        0b0011000000110000, 0b0011000000110000,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b0011000000001100,
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-    ]
+    return sty_test
 
-    INVERTED_BOTTOM = [
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000011000000, 0b0011000011000000,
-        0b0011000001100000, 0b0011000001100000,
-        0b0011000000110000, 0b0011000000110000,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b1100111111110011,
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-    ]
 
-    INVERTED_EDGES = [
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000001100, 0b0011000000001100,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000011000000, 0b0011000011000000,
-        0b0011000001100000, 0b0011000001100000,
-        0b0011000000110000, 0b0011000000110000,
-        0b0011000000011000, 0b0011000000011000,
-        0b0011000000001100, 0b1100111111110011,
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-    ]
+@cocotb.test()
+async def test_registers(dut):
+    sty = await setup(dut)
+
+    assert await sty.read(LINE) == 0x0
+    assert await sty.read(CTRL) == 0x3C
+    assert await sty.bmp_read(0) == 0x0000
+
+    await sty.write(LINE, 0xF)
+    await sty.write(CTRL, 0xFF)
+    await sty.bmp_write(0, 0xFFFF)
+
+    assert await sty.read(LINE) == 0xF
+    assert await sty.read(CTRL) == 0xFF
+    assert await sty.bmp_read(0) == 0xFFFF
+
+    # Only the mode bits of the modes built in read back (shift mode is left
+    # out, as it takes over uo_out[7])
+    await sty.set_mode(MODE_MASK & ~SHIFT)
+    assert await sty.read(ATTR | 3) == MODES & ~SHIFT
+    await sty.set_mode(0)
+
+
+NO_CHANGE = [
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000011000000, 0b0011000011000000,
+    0b0011000001100000, 0b0011000001100000,
+    0b0011000000110000, 0b0011000000110000,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b0011000000001100,
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+]
+
+INVERTED = [
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000011000000, 0b1100111100111111,
+    0b0011000001100000, 0b1100111110011111,
+    0b0011000000110000, 0b1100111111001111,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b1100111111110011,
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+]
+
+INVERTED_TOP = [
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000011000000, 0b0011000011000000,
+    0b0011000001100000, 0b0011000001100000,
+    0b0011000000110000, 0b0011000000110000,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b0011000000001100,
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+]
+
+INVERTED_BOTTOM = [
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000011000000, 0b0011000011000000,
+    0b0011000001100000, 0b0011000001100000,
+    0b0011000000110000, 0b0011000000110000,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b1100111111110011,
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+]
+
+INVERTED_EDGES = [
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000001100, 0b0011000000001100,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000011000000, 0b0011000011000000,
+    0b0011000001100000, 0b0011000001100000,
+    0b0011000000110000, 0b0011000000110000,
+    0b0011000000011000, 0b0011000000011000,
+    0b0011000000001100, 0b1100111111110011,
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+]
+
+INVERTED_NORMAL_TOP = [
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000011000000, 0b1100111100111111,
+    0b0011000001100000, 0b1100111110011111,
+    0b0011000000110000, 0b1100111111001111,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b1100111111110011,
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+]
+
+INVERTED_NORMAL_BOTTOM = [
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000011000000, 0b1100111100111111,
+    0b0011000001100000, 0b1100111110011111,
+    0b0011000000110000, 0b1100111111001111,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b0011000000001100,
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+]
+
+INVERTED_NORMAL_EDGES = [
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+    0b0011111111110000, 0b0011111111110000,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000001100, 0b1100111111110011,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011111111110000, 0b1100000000001111,
+    0b0011000011000000, 0b1100111100111111,
+    0b0011000001100000, 0b1100111110011111,
+    0b0011000000110000, 0b1100111111001111,
+    0b0011000000011000, 0b1100111111100111,
+    0b0011000000001100, 0b0011000000001100,
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+]
+
+WHITE_SPACE = [
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+    0b0011111111110000, 0b0000000000000000,
+    0b0011000000011000, 0b0000000000000000,
+    0b0011000000001100, 0b0000000000000000,
+    0b0011000000001100, 0b0000000000000000,
+    0b0011000000001100, 0b0000000000000000,
+    0b0011000000011000, 0b0000000000000000,
+    0b0011111111110000, 0b0000000000000000,
+    0b0011000011000000, 0b0000000000000000,
+    0b0011000001100000, 0b0000000000000000,
+    0b0011000000110000, 0b0000000000000000,
+    0b0011000000011000, 0b0000000000000000,
+    0b0011000000001100, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+    0b0000000000000000, 0b0000000000000000,
+]
+
+FULL_BLOCK = [
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+    0b0011111111110000, 0b1111111111111111,
+    0b0011000000011000, 0b1111111111111111,
+    0b0011000000001100, 0b1111111111111111,
+    0b0011000000001100, 0b1111111111111111,
+    0b0011000000001100, 0b1111111111111111,
+    0b0011000000011000, 0b1111111111111111,
+    0b0011111111110000, 0b1111111111111111,
+    0b0011000011000000, 0b1111111111111111,
+    0b0011000001100000, 0b1111111111111111,
+    0b0011000000110000, 0b1111111111111111,
+    0b0011000000011000, 0b1111111111111111,
+    0b0011000000001100, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+    0b0000000000000000, 0b1111111111111111,
+]
 
-    INVERTED_NORMAL_TOP = [
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000011000000, 0b1100111100111111,
-        0b0011000001100000, 0b1100111110011111,
-        0b0011000000110000, 0b1100111111001111,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b1100111111110011,
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-    ]
 
-    INVERTED_NORMAL_BOTTOM = [
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000011000000, 0b1100111100111111,
-        0b0011000001100000, 0b1100111110011111,
-        0b0011000000110000, 0b1100111111001111,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b0011000000001100,
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-    ]
+@cocotb.test()
+async def test_cursor(dut):
+    sty_test = sty_tester(await setup(dut))
 
-    INVERTED_NORMAL_EDGES = [
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-        0b0011111111110000, 0b0011111111110000,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000001100, 0b1100111111110011,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011111111110000, 0b1100000000001111,
-        0b0011000011000000, 0b1100111100111111,
-        0b0011000001100000, 0b1100111110011111,
-        0b0011000000110000, 0b1100111111001111,
-        0b0011000000011000, 0b1100111111100111,
-        0b0011000000001100, 0b0011000000001100,
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-    ]
+    #####################################################
+    #####################################################
+    ####   C U R S O R   D I S P L A Y   T E S T S   ####   240
+    #####################################################
+    #####################################################
 
     #              cursor/phase        control register                                       attributes         result
     await sty_test(0,                  0,                                                     0,                 NO_CHANGE)
@@ -542,50 +545,17 @@ async def test_project(dut):
     await sty_test(CURSOR|BLINK_PHASE, BLINK_ENABLE|CURSOR_ENABLE|CURSOR_BLINK|CURSOR_BOTTOM, ALTERNATE|INVERSE, NO_CHANGE)
     await sty_test(CURSOR|BLINK_PHASE, BLINK_ENABLE|CURSOR_ENABLE|CURSOR_BLINK|CURSOR_EDGES,  ALTERNATE|INVERSE, NO_CHANGE)
 
+
+@cocotb.test()
+async def test_inverter(dut):
+    sty_test = sty_tester(await setup(dut))
+
     #########################################
     #########################################
     ####   I N V E R T E R   T E S T S   ####   64
     #########################################
     #########################################
 
-    WHITE_SPACE = [
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-        0b0011111111110000, 0b0000000000000000,
-        0b0011000000011000, 0b0000000000000000,
-        0b0011000000001100, 0b0000000000000000,
-        0b0011000000001100, 0b0000000000000000,
-        0b0011000000001100, 0b0000000000000000,
-        0b0011000000011000, 0b0000000000000000,
-        0b0011111111110000, 0b0000000000000000,
-        0b0011000011000000, 0b0000000000000000,
-        0b0011000001100000, 0b0000000000000000,
-        0b0011000000110000, 0b0000000000000000,
-        0b0011000000011000, 0b0000000000000000,
-        0b0011000000001100, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-        0b0000000000000000, 0b0000000000000000,
-    ]
-
-    FULL_BLOCK = [
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-        0b0011111111110000, 0b1111111111111111,
-        0b0011000000011000, 0b1111111111111111,
-        0b0011000000001100, 0b1111111111111111,
-        0b0011000000001100, 0b1111111111111111,
-        0b0011000000001100, 0b1111111111111111,
-        0b0011000000011000, 0b1111111111111111,
-        0b0011111111110000, 0b1111111111111111,
-        0b0011000011000000, 0b1111111111111111,
-        0b0011000001100000, 0b1111111111111111,
-        0b0011000000110000, 0b1111111111111111,
-        0b0011000000011000, 0b1111111111111111,
-        0b0011000000001100, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-        0b0000000000000000, 0b1111111111111111,
-    ]
-
     #              phase        ctrl          attributes                      result
     await sty_test(0,           0,            0,                              NO_CHANGE)
     await sty_test(BLINK_PHASE, 0,            0,                              NO_CHANGE)
@@ -654,12 +624,18 @@ async def test_project(dut):
     await sty_test(0,           CTRL_DEFAULT, BLINK|ALTERNATE|INVERSE|HIDDEN, FULL_BLOCK)
     await sty_test(BLINK_PHASE, CTRL_DEFAULT, BLINK|ALTERNATE|INVERSE|HIDDEN, WHITE_SPACE)
 
+
+@cocotb.test()
+async def test_scaling_italics(dut):
+    sty_test = sty_tester(await setup(dut))
+
     #################################################################################
     #################################################################################
     ####   S C A L I N G   A N D   M I R R O R I N G   W I T H   I T A L I C S   ####   62
     #################################################################################
     #################################################################################
 
+
     await sty_test(0, 0x3D, ITALIC|OVERLINE, [
         0b0000000000000000, 0b1111111111111111,
         0b0000000000000000, 0b0000000000000000,
@@ -1836,12 +1812,18 @@ async def test_project(dut):
         0b0000000000000000, 0b1100111111100111,
     ])
 
+
+@cocotb.test()
+async def test_scaling_masking(dut):
+    sty_test = sty_tester(await setup(dut))
+
     #################################################################################
     #################################################################################
     ####   S C A L I N G   A N D   M I R R O R I N G   W I T H   M A S K I N G   ####   42
     #################################################################################
     #################################################################################
 
+
     await sty_test(0, 0x3D, FAINT|OVERLINE, [
         0b0000000000000000, 0b1010101010101010,
         0b0000000000000000, 0b0000000000000000,
@@ -2640,12 +2622,18 @@ async def test_project(dut):
         0b0000000000000000, 0b1110111111101111,
     ])
 
+
+@cocotb.test()
+async def test_bold_italic(dut):
+    sty_test = sty_tester(await setup(dut))
+
     #######################################################
     #######################################################
     ####   B O L D   A N D   I T A L I C   T E S T S   ####   24
     #######################################################
     #######################################################
 
+
     await sty_test(0, CTRL_DEFAULT, BOLD, [
         0b0000000000000000, 0b0000000000000000,
         0b0000000000000000, 0b0000000000000000,
@@ -3103,12 +3091,18 @@ async def test_project(dut):
     ])
 
     ###########################################
-    ###########################################
+
+
+@cocotb.test()
+async def test_underline(dut):
+    sty_test = sty_tester(await setup(dut))
+
     ####   U N D E R L I N E   T E S T S   ####   30
     ###########################################
     ###########################################
 
     await sty_test(0, CTRL_DEFAULT, OVERLINE, [
+
         0b0000000000000000, 0b1111111111111111,
         0b0000000000000000, 0b0000000000000000,
         0b0011111111110000, 0b0011111111110000,
@@ -3677,3 +3671,607 @@ async def test_project(dut):
         0b0000000000000000, 0b0000000000000000,
         0b0000000000000000, 0b0101010101010101,
     ])
+
+
+@cocotb.test(skip=missing(BURST))
+async def test_burst(dut):
+    sty = await setup(dut)
+
+    # Mode bits read back with the dotted overline attribute
+    await sty.write(ATTR | 3, BURST | 1)
+    assert await sty.read(ATTR | 3) == BURST | 1
+    await sty.set_mode(BURST)
+    assert await sty.read(ATTR | 3) == BURST
+
+    # Attribute bytes, starting from ATTR0 and wrapping from ATTR3
+    await sty.burst_write(ATTR, [0x12, 0x34, 0x56, BURST | 1])
+    assert await sty.burst_read(ATTR, 4) == [0x12, 0x34, 0x56, BURST | 1]
+    await sty.burst_write(ATTR | 2, [0x9A, BURST, 0xBC, 0xDE])
+    assert [await sty.read(ATTR | i) for i in range(4)] == [0xBC, 0xDE, 0x9A, BURST]
+    assert await sty.burst_read(ATTR | 1, 6) == [0xDE, 0x9A, BURST, 0xBC, 0xDE, 0x9A]
+
+    # Bitmap bytes, low then high (read back unstyled with no attributes)
+    await sty.burst_write(ATTR, [0, 0, 0, BURST])
+    await sty.burst_write(BMAP, [0x34, 0x12])
+    assert await sty.burst_read(BMAP, 2) == [0x34, 0x12]
+    # (with two lanes, a bitmap burst goes on to the other lane's bitmap)
+    assert await sty.burst_read(BMAP | 1, 3) == [0x12, 0x34, 0x12 if LANES == 1 else 0x00]
+
+    # Scanline and control registers do not auto-increment
+    await sty.burst_write(CTRL, [0x01, 0x02, 0x03])
+    assert await sty.read(CTRL) == 0x03
+    assert await sty.read(ATTR | 0) == 0
+    await sty.burst_write(LINE, [0x5, 0x6])
+    assert await sty.read(LINE) == 0x6
+    await sty.write(CTRL, CTRL_DEFAULT)
+
+    # Without burst mode, repeated accesses stay on the same address
+    await sty.set_mode(0)
+    await sty.burst_write(BMAP, [0x78, 0x56])
+    assert await sty.burst_read(BMAP, 2) == [0x56, 0x56]
+    assert await sty.read(BMAP | 1) == 0x12
+
+    # Clocks per glyph: the README flow, one addressed transaction per byte,
+    # against burst mode, with 3-cycle and 1-cycle bus operations
+    rows = NO_CHANGE[0::2]
+    attr = BOLD | UNDERLINE | DOTTED_OVERLINE
+    expected = model.style_glyph(0, CTRL_DEFAULT, attr, rows)
+    for cycles in (3, 1):
+        clocks = {}
+        for mode in (0, BURST):
+            sty = Frontdoor(dut, cycles)
+            await sty.set_mode(mode)
+            start = sty.clocks
+            assert await sty.style_glyph(0, CTRL_DEFAULT, attr, rows) == expected
+            clocks[mode] = sty.clocks - start
+        dut._log.info(
+            f"{cycles}-cycle bus operations: {clocks[0]} clocks per glyph, "
+            f"{clocks[BURST]} clocks per glyph in burst mode"
+        )
+        assert clocks[BURST] <= clocks[0]
+
+
+@cocotb.test(skip=missing(STREAM | BURST))
+async def test_stream(dut):
+    sty = await setup(dut)
+
+    await sty.set_mode(STREAM)
+    assert await sty.read(ATTR | 3) == STREAM
+
+    # The logical scanline for the physical scanline being written
+    await sty.attr_write(0, Y_PREMIRROR)
+    assert await sty.burst_write(LINE, [0x3, 0x4]) == [0xC, 0xB]
+    await sty.attr_write(0, 0)
+
+    # Each bitmap row written presents the previous styled row
+    await sty.write(CTRL, CTRL_DEFAULT)
+    await sty.write(LINE, 0)
+    assert await sty.stream_bmp_write(0, 0x1234) == 0x0000
+    assert await sty.stream_bmp_write(0, 0x5678) == 0x1234
+    await sty.write(ATTR | 0, X_POSTMIRROR)
+    assert await sty.stream_bmp_write(0, 0x8000) == 0x5678
+    assert await sty.bmp_read(0) == 0x0001
+
+    # Whole glyphs, with and without burst mode
+    for cycles in (3, 1):
+        for mode in (STREAM, STREAM | BURST):
+            sty = Frontdoor(dut, cycles)
+            await sty.set_mode(mode)
+            for attr in (0, BOLD | UNDERLINE, Y_PREMIRROR | ITALIC, Y_SCALE | Y_OFFSET | Y_POSTMIRROR):
+                rows = NO_CHANGE[0::2]
+                expected = model.style_glyph(CURSOR, CTRL_DEFAULT, attr, rows)
+                assert await sty.stream_glyph(CURSOR, CTRL_DEFAULT, attr, rows) == expected
+
+    # Bitmap bytes in and out per clock, with 1-cycle bus operations
+    rows = NO_CHANGE[0::2]
+    attr = BOLD | UNDERLINE
+    expected = model.style_glyph(0, CTRL_DEFAULT, attr, rows)
+    for mode in (0, STREAM | BURST):
+        sty = Frontdoor(dut, 1)
+        await sty.set_mode(mode)
+        start = sty.clocks
+        if mode:
+            assert await sty.stream_glyph(0, CTRL_DEFAULT, attr, rows) == expected
+        else:
+            assert await sty.style_glyph(0, CTRL_DEFAULT, attr, rows) == expected
+        clocks = sty.clocks - start
+        dut._log.info(
+            f"{'stream' if mode else 'README'} flow: {clocks} clocks per glyph, "
+            f"{64 / clocks:.2f} bitmap bytes per cycle"
+        )
+
+
+@cocotb.test(skip=missing(SHIFT | STREAM | BURST))
+async def test_shift(dut):
+    sty = await setup(dut)
+    pixels = []
+    cocotb.start_soon(pixel_monitor(dut, pixels))
+
+    rng = random.Random(1)
+    scanline = 5
+    for cycles, mode in ((1, SHIFT), (3, SHIFT | BURST), (1, SHIFT | STREAM | BURST)):
+        chars = [(rng.getrandbits(25), rng.getrandbits(16)) for _ in range(8)]
+        expected = []
+        for attr, bitmap in chars:
+            row = model.styler(0, CTRL_DEFAULT, attr, scanline, bitmap)[1]
+            expected.extend((row >> (15 - i)) & 1 for i in range(16))
+
+        # Load the first character, then enable shift mode
+        sty = Frontdoor(dut, cycles)
+        await sty.set_mode(mode & ~SHIFT)
+        await sty.write(CTRL, CTRL_DEFAULT)
+        await sty.write(LINE, scanline)
+        await sty.attr_write(0, chars[0][0])
+        await sty.bmp_write(0, chars[0][1])
+        await sty.settle()
+        first, start = len(pixels), sty.clocks
+        await sty.set_mode(mode, chars[0][0])
+        loaded = sty.clocks - (1 if cycles == 3 else 0)
+
+        # Load each following character before the previous one is shifted out
+        for i, (attr, bitmap) in enumerate(chars[1:], 1):
+            await sty.attr_write(0, attr)
+            await sty.bmp_write(0, bitmap)
+            await sty.settle()
+            await sty.idle(loaded + 16 * i - sty.clocks)
+        await sty.idle(loaded + 16 * len(chars) - sty.clocks)
+
+        first += loaded - start
+        assert pixels[first:first + len(expected)] == expected
+        await sty.set_mode(0)
+
+
+@cocotb.test(skip=missing(BUFFER | BURST))
+async def test_buffer(dut):
+    sty = await setup(dut)
+    # The styler outputs at every clock, when they can be seen (RTL only)
+    outputs = None
+    if Backdoor.available(dut):
+        outputs = []
+        cocotb.start_soon(output_monitor(dut, outputs))
+
+    rng = random.Random(1)
+    scanline = 9
+    for cycles, mode in ((3, BUFFER), (1, BUFFER), (1, BUFFER | BURST)):
+        sty = Frontdoor(dut, cycles)
+        await sty.set_mode(mode)
+        await sty.write(LINE, scanline)
+
+        current = None
+        for _ in range(6):
+            ctrl, attr, bitmap = rng.getrandbits(8), rng.getrandbits(25), rng.getrandbits(16)
+            start = len(outputs or [])
+
+            # Nothing changes while the next character is loaded
+            await sty.write(CTRL, ctrl)
+            await sty.attr_write(0, attr)
+            await sty.bmp_write(0, bitmap)
+            if current is not None:
+                assert await sty.read(CTRL) == current[0]
+                assert await sty.read(ATTR | 0) == current[1] & 0xFF
+                assert (await sty.read(LINE), await sty.bmp_read(0)) == current[3]
+                if outputs is not None:
+                    assert set(outputs[start:]) == {current[3]}
+
+            # Everything changes at once on commit
+            await sty.command(COMMIT)
+            current = (ctrl, attr, bitmap, model.styler(0, ctrl, attr, scanline, bitmap))
+            assert await sty.read(CTRL) == ctrl
+            assert (await sty.read(LINE), await sty.bmp_read(0)) == current[3]
+
+    # Without buffer mode, writes take effect immediately
+    await sty.set_mode(0)
+    await sty.write(CTRL, CTRL_DEFAULT)
+    assert await sty.read(CTRL) == CTRL_DEFAULT
+
+
+@cocotb.test(skip=missing(BUFFER, palette=True))
+async def test_palette(dut):
+    sty = await setup(dut)
+
+    # Store four entries, then recall them in a different order
+    entries = [BOLD | UNDERLINE, INVERSE | DOTTED_OVERLINE, ITALIC | X_SCALE, 0x01FFFFFF]
+    for i, attr in enumerate(entries):
+        await sty.attr_write(0, attr)
+        await sty.command(STORE, i)
+    for i in (2, 0, 3, 1, 1):
+        await sty.command(RECALL, i)
+        assert [await sty.read(ATTR | j) for j in range(4)] == [(entries[i] >> (8 * j)) & 0xFF for j in range(4)]
+
+    # Recall in buffer mode waits for the commit
+    await sty.set_mode(BUFFER)
+    await sty.command(RECALL, 0)
+    assert await sty.read(ATTR | 1) == (entries[1] >> 8) & 0xFF
+    await sty.command(COMMIT)
+    assert await sty.read(ATTR | 1) == (entries[0] >> 8) & 0xFF
+    await sty.set_mode(0, entries[0])
+
+    # Clocks per character across a scanline, writing each character's
+    # attributes against recalling them from the palette
+    rng = random.Random(1)
+    scanline = 13
+    chars = [(rng.randrange(len(entries)), rng.getrandbits(16)) for _ in range(16)]
+    expected = [model.styler(0, CTRL_DEFAULT, entries[i], scanline, bitmap)[1] for i, bitmap in chars]
+    for cycles in (3, 1):
+        clocks = {}
+        for palette in (False, True):
+            sty = Frontdoor(dut, cycles)
+            await sty.write(CTRL, CTRL_DEFAULT)
+            await sty.write(LINE, scanline)
+            start = sty.clocks
+            result = []
+            for i, bitmap in chars:
+                if palette:
+                    await sty.command(RECALL, i)
+                else:
+                    await sty.attr_write(0, entries[i])
+                await sty.bmp_write(0, bitmap)
+                result.append(await sty.bmp_read(0))
+            assert result == expected
+            clocks[palette] = (sty.clocks - start) / len(chars)
+        dut._log.info(
+            f"{cycles}-cycle bus operations: {clocks[False]:.0f} clocks per character, "
+            f"{clocks[True]:.0f} clocks per character with the palette"
+        )
+        assert clocks[True] < clocks[False]
+
+
+@cocotb.test(skip=missing(LINE_AUTO | BURST))
+async def test_line(dut):
+    sty = await setup(dut)
+
+    # The hsync command advances the scanline and wraps at 16, vsync resets it
+    await sty.write(LINE, 14)
+    await sty.command(HSYNC)
+    assert await sty.read(LINE) == 15
+    await sty.command(HSYNC)
+    assert await sty.read(LINE) == 0
+    await sty.write(LINE, 9)
+    await sty.command(VSYNC)
+    assert await sty.read(LINE) == 0
+
+    # Whole glyphs in line mode, with every combination of Y attributes
+    rows = NO_CHANGE[0::2]
+    y_bits = [Y_OFFSET, Y_SCALE, Y_PREMIRROR, Y_POSTMIRROR]
+    for cycles, mode in ((3, LINE_AUTO), (1, LINE_AUTO), (1, LINE_AUTO | BURST)):
+        sty = Frontdoor(dut, cycles)
+        await sty.set_mode(mode)
+        start = sty.clocks
+        for combo in range(16):
+            attr = sum(bit for i, bit in enumerate(y_bits) if combo & (1 << i))
+            attr |= DOUBLE_UNDERLINE | STRIKE | DOTTED_OVERLINE
+            expected = model.style_glyph(0, CTRL_DEFAULT, attr, rows)
+            assert await sty.style_glyph(0, CTRL_DEFAULT, attr, rows) == expected
+            # After 16 rows the scanline is back at the first one
+            assert await sty.read(LINE) == model.styler(0, CTRL_DEFAULT, attr, 0, 0)[0]
+        dut._log.info(f"line mode, {cycles}-cycle bus operations: {(sty.clocks - start) / 16:.0f} clocks per glyph")
+        await sty.set_mode(0)
+
+
+@cocotb.test(skip=missing(CURSOR_AUTO | BURST | BUFFER))
+async def test_cursor_auto(dut):
+    sty = await setup(dut)
+
+    # A small screen styled a scanline at a time, with the cursor swept over
+    # every cell and past the last column and row. CURSOR is held high
+    # throughout, so only the matching cell may show the cursor.
+    columns, rows = 4, 2
+    ctrl = CURSOR_ENABLE | CURSOR_BOTTOM
+    rng = random.Random(1)
+    positions = [(c, r) for r in range(rows) for c in range(columns)] + [(columns, 0), (0, rows)]
+    for cycles, mode in ((1, CURSOR_AUTO), (1, CURSOR_AUTO | BURST), (3, CURSOR_AUTO | BUFFER)):
+        sty = Frontdoor(dut, cycles)
+        await sty.set_mode(mode)
+        await sty.write(CTRL, ctrl)
+        if mode & BUFFER:
+            await sty.command(COMMIT)
+        for column, row in positions:
+            await sty.command(CURSOR_COLUMN, column)
+            await sty.command(CURSOR_ROW, row)
+            await sty.command(VSYNC)
+            for r in range(rows):
+                for scanline in range(16):
+                    for c in range(columns):
+                        bitmap = rng.getrandbits(16)
+                        await sty.bmp_write(CURSOR, bitmap)
+                        if mode & BUFFER:
+                            await sty.command(CURSOR | COMMIT)
+                        phase = CURSOR if (c, r) == (column, row) else 0
+                        expected = model.styler(phase, ctrl, 0, scanline, bitmap)[1]
+                        assert await sty.bmp_read(CURSOR) == expected
+                    await sty.command(CURSOR | HSYNC)
+        await sty.set_mode(0)
+
+    # Without cursor mode, CURSOR is used as before
+    await sty.write(LINE, 15)
+    await sty.bmp_write(0, 0x0000)
+    assert await sty.bmp_read(CURSOR) == 0xFFFF
+    assert await sty.bmp_read(0) == 0x0000
+
+
+@cocotb.test(skip=missing(BLINK_AUTO))
+async def test_blink_auto(dut):
+    sty = await setup(dut)
+    backdoor = Backdoor(dut) if Backdoor.available(dut) else None
+
+    # Blinking text with a decoupled blinking cursor: each combination of
+    # the two phases gives a different result. The phase pins are held
+    # high, so the result only depends on the frame counter.
+    ctrl = CURSOR_ENABLE | CURSOR_BLINK | BLINK_ENABLE | PHASE_DECOUPLE
+    pins = CURSOR | BLINK_PHASE | FAINT_PHASE
+    await sty.set_mode(BLINK_AUTO, BLINK)
+    await sty.write(CTRL, ctrl)
+    await sty.attr_write(0, BLINK)
+    await sty.bmp_write(0, 0x00FF)
+
+    async def check(frame, blink_rate, cursor_rate):
+        phase = CURSOR
+        if (frame >> blink_rate) & 1:
+            phase |= BLINK_PHASE
+        if (frame >> cursor_rate) & 1:
+            phase |= FAINT_PHASE
+        assert await sty.bmp_read(pins) == model.styler(phase, ctrl, BLINK, 0, 0x00FF)[1]
+
+    frame = 0
+    rng = random.Random(1)
+    for blink_rate, cursor_rate in ((4, 4), (0, 1), (5, 3), (2, 7)):
+        if (blink_rate, cursor_rate) != (4, 4):
+            await sty.command(BLINK_RATE, blink_rate | (cursor_rate << 4))
+
+        # Frame by frame through a whole cycle of the frame counter
+        for _ in range(256):
+            await sty.frames(1, pins)
+            frame += 1
+            await check(frame, blink_rate, cursor_rate)
+
+        # Many frames at once: a burst of vsync commands, then jumps of the
+        # frame counter through the backdoor
+        count = rng.randrange(1000, 5000)
+        await sty.frames(count, pins)
+        frame += count
+        await check(frame, blink_rate, cursor_rate)
+        if backdoor is not None:
+            for _ in range(64):
+                frame = rng.getrandbits(8)
+                backdoor.set_frame(frame)
+                await sty.idle(PIPELINE)
+                await check(frame, blink_rate, cursor_rate)
+
+
+@cocotb.test()
+async def test_pipeline(dut):
+    sty = await setup(dut)
+    sty = Frontdoor(dut, 1)
+    dut._log.info(f"{PIPELINE} pipeline registers")
+
+    async def watch(ui_in, count):
+        """Hold ui_in for count clocks, returning what was read at each one."""
+        dut.ui_in.value = ui_in
+        result = []
+        for _ in range(count):
+            result.append(await sty.sample())
+            await sty.clock()
+        return result
+
+    async def restart():
+        """Reset through rst_n, holding it until the pipeline registers are flushed."""
+        dut.ui_in.value = 0xC0
+        dut.rst_n.value = 0
+        await sty.idle(PIPELINE + 1)
+        dut.rst_n.value = 1
+
+    await sty.bmp_write(0, 0x0000)
+    await sty.settle()
+
+    # A bitmap write shows PIPELINE clocks after the clock that wrote it
+    await sty.write(BMAP | 0, 0x5A)
+    assert await watch(0x80 | BMAP, PIPELINE + 2) == [0x00] * PIPELINE + [0x5A] * 2
+
+    # A change of phase pins shows PIPELINE clocks after it is made
+    assert await watch(0x80 | CURSOR | BMAP, PIPELINE + 2) == [0x5A] * PIPELINE + [0xA5] * 2
+    assert await watch(0x80 | BMAP, PIPELINE + 2) == [0xA5] * PIPELINE + [0x5A] * 2
+
+    # The logical scanline is never delayed
+    await sty.write(ATTR | 0, Y_PREMIRROR)
+    assert await watch(0x80 | LINE, 1) == [0xF]
+    await sty.write(ATTR | 0, 0)
+
+    # In stream mode the row is latched PIPELINE clocks after it is completed
+    if not missing(STREAM):
+        await sty.set_mode(STREAM)
+        await sty.write(BMAP | 1, 0x12)
+        assert await watch(0x80 | BMAP, PIPELINE + 2) == [0x00] * PIPELINE + [0x5A] * 2
+        assert await watch(0x80 | BMAP | 1, 1) == [0x12]
+        await sty.set_mode(0)
+
+    # Any sequence of pins, clock by clock, including mode changes
+    await restart()
+    chip = model.Chip(PIPELINE, LANES, MODES, PALETTE)
+    rng = random.Random(1)
+    for _ in range(2000):
+        ui_in, uio_in = rng.getrandbits(8), rng.getrandbits(8)
+        if ui_in & 0xC7 == 0x47 and rng.random() < 0.75:
+            # Fewer mode changes, so that each mode is used for a while
+            ui_in ^= 0x04
+        dut.ui_in.value = ui_in
+        dut.uio_in.value = uio_in
+        await FallingEdge(dut.clk)
+        assert (dut.uo_out.value & 0xFF, dut.uio_out.value & 0xFF) == chip.outputs(ui_in, uio_in)
+        await sty.clock()
+        chip.clock(ui_in, uio_in)
+
+    # Clocks per glyph, including the wait for the pipeline
+    await restart()
+    rows = NO_CHANGE[0::2]
+    expected = model.style_glyph(0, CTRL_DEFAULT, BOLD, rows)
+    for cycles in (3, 1):
+        sty = Frontdoor(dut, cycles)
+        start = sty.clocks
+        assert await sty.style_glyph(0, CTRL_DEFAULT, BOLD, rows) == expected
+        dut._log.info(f"{cycles}-cycle bus operations: {sty.clocks - start} clocks per glyph")
+
+
+@cocotb.test(skip=LANES == 1 or missing(BURST))
+async def test_lanes(dut):
+    sty = await setup(dut)
+
+    # Each lane has its own bitmap and attributes, selected with the scanline
+    await sty.write(LINE, 3 | LANE_SELECT)
+    await sty.attr_write(0, X_POSTMIRROR)
+    await sty.bmp_write(0, 0x8101)
+    await sty.write(LINE, 3)
+    await sty.attr_write(0, INVERSE)
+    await sty.bmp_write(0, 0x1234)
+    assert await sty.bmp_read(0) == 0xEDCB
+    assert await sty.read(ATTR | 0) == 0x00
+    await sty.write(LINE, 3 | LANE_SELECT)
+    assert await sty.bmp_read(0) == 0x8081
+    assert await sty.read(ATTR | 0) == X_POSTMIRROR
+    assert await sty.read(LINE) == 3
+
+    # Bursts: the bitmap goes on to the other lane after the high byte, and
+    # the logical scanline alternates between the lanes
+    await sty.set_mode(BURST)
+    await sty.write(LINE, 3)
+    await sty.burst_write(ATTR, [0, 0, 0, BURST])
+    await sty.burst_write(BMAP, [0x34, 0x12, 0x78, 0x56])
+    assert await sty.burst_read(BMAP, 4) == [0x34, 0x12, 0x6A, 0x1E]
+    await sty.write(LINE, 3 | LANE_SELECT)
+    await sty.burst_write(ATTR, [Y_PREMIRROR, 0, 0, BURST])
+    await sty.write(LINE, 3)
+    assert await sty.burst_read(LINE, 4) == [3, 12, 3, 12]
+    await sty.set_mode(0)
+
+    # The palette stores and recalls the selected lane's attributes
+    if not missing(0, palette=True):
+        await sty.write(LINE, 3 | LANE_SELECT)
+        await sty.command(STORE, 1)
+        await sty.write(LINE, 3)
+        await sty.command(RECALL, 1)
+        assert await sty.read(ATTR | 0) == Y_PREMIRROR
+        assert await sty.read(LINE) == 12
+
+    # Golden vectors on both lanes: each vector is styled in lane 0 with the
+    # next one sharing its phase and control register in lane 1, and the
+    # other way round, and both results are checked. Gate level simulation
+    # only runs a sample of the vectors (see sample.py).
+    found = vectors(__file__, globals())
+    sample = None if Backdoor.available(dut) else gl_sample(__file__, globals())
+    groups = {}
+    for v in dict.fromkeys(found):
+        if sample is None or v in sample:
+            groups.setdefault(v[:2], []).append(v)
+    sty = Frontdoor(dut, 1)
+    await sty.set_mode(BURST)
+    for (phase, ctrl), group in groups.items():
+        for i, v in enumerate(group):
+            pair = (v, group[(i + 1) % len(group)])
+            attrs = [attr for _, _, attr, _ in pair]
+            rows = [list(bmp[0::2]) for _, _, _, bmp in pair]
+            result = await sty.style_glyph_pair(phase, ctrl, attrs, rows)
+            for lane in (0, 1):
+                assert result[lane] == list(pair[lane][3][1::2]), f"lane {lane}: {pair[lane][:3]}"
+
+    # Clocks per character: one glyph at a time in burst mode against two
+    # glyphs at a time, one in each lane
+    rows = NO_CHANGE[0::2]
+    attrs = [BOLD | UNDERLINE, ITALIC | DOTTED_OVERLINE]
+    expected = tuple(model.style_glyph(0, CTRL_DEFAULT, attr, rows) for attr in attrs)
+    for cycles in (3, 1):
+        clocks = {}
+        for lanes in (1, 2):
+            sty = Frontdoor(dut, cycles)
+            await sty.set_mode(BURST)
+            start = sty.clocks
+            if lanes == 1:
+                result = tuple([await sty.style_glyph(0, CTRL_DEFAULT, attr, rows) for attr in attrs])
+            else:
+                result = tuple(await sty.style_glyph_pair(0, CTRL_DEFAULT, attrs, [rows, rows]))
+            assert result == expected
+            clocks[lanes] = (sty.clocks - start) / len(attrs)
+        dut._log.info(
+            f"{cycles}-cycle bus operations: {clocks[1]:.0f} clocks per character with one lane "
+            f"({16 / clocks[1]:.3f} character rows per clock), {clocks[2]:.0f} with two "
+            f"({16 / clocks[2]:.3f} character rows per clock)"
+        )
+        assert clocks[2] < clocks[1]
+
+
+@cocotb.test()
+async def test_host(dut):
+    await setup(dut)
+    flows = [flow for flow in FLOWS if not missing(FLOWS[flow])]
+
+    # Golden vectors through each flow of the host driver, a batch per flow
+    # (gate level simulation only runs a sample, see sample.py)
+    found = vectors(__file__, globals())
+    sample = None if Backdoor.available(dut) else gl_sample(__file__, globals())
+    found = [v for v in dict.fromkeys(found) if sample is None or v in sample]
+    for flow in flows:
+        host = Host(CocotbBackend(dut), 1, PIPELINE, LANES, flow)
+        host.reset()
+        result = [host.style_glyph(phase, ctrl, attr, bmp[0::2]) for phase, ctrl, attr, bmp in found]
+        await host.flush()
+        # Read the bidirectional pins as a board would: they carry the
+        # host's own data unless the chip drives them
+        batch = result[0][0].batch
+        batch.outputs = [
+            (uo_out, uio_out if uio_oe == 0xFF else uio_in, uio_oe)
+            for (uo_out, uio_out, uio_oe), (_, uio_in, _) in zip(batch.outputs, batch.cycles)
+        ]
+        for v, rows in zip(found, result):
+            assert [row.value for row in rows] == list(v[3][1::2]), f"{flow} flow: {v[:3]}"
+
+    # Single rows, and registers the chip already holds are not written again
+    for flow in flows:
+        host = Host(CocotbBackend(dut), 3, PIPELINE, LANES, flow)
+        host.reset()
+        row = host.style_row(CURSOR, CURSOR_ENABLE | CURSOR_TOP, INVERSE, 1, 0x1234)
+        await host.flush()
+        assert row.value == model.styler(CURSOR, CURSOR_ENABLE | CURSOR_TOP, INVERSE, 1, 0x1234)[1]
+        operations = host.operations
+        row = host.style_row(CURSOR, CURSOR_ENABLE | CURSOR_TOP, INVERSE, 2, 0x1234)
+        await host.flush()
+        assert row.value == model.styler(CURSOR, CURSOR_ENABLE | CURSOR_TOP, INVERSE, 2, 0x1234)[1]
+        # Only the scanline and the two bytes read back with one transaction
+        # per byte, and a burst write and read in line mode (which already
+        # advanced the scanline)
+        assert host.operations - operations == (3 if flow == "single" else 2)
+        # Only the phase pins change, which takes as long as a write to come
+        # through the pipeline registers
+        row = host.style_row(0, CURSOR_ENABLE | CURSOR_TOP, INVERSE, 2, 0x1234)
+        await host.flush()
+        assert row.value == model.styler(0, CURSOR_ENABLE | CURSOR_TOP, INVERSE, 2, 0x1234)[1]
+
+    # Bus operations and clocks per glyph across a line of text, against
+    # the test driver's README flow
+    rng = random.Random(1)
+    attrs = [0, 0, 0, BOLD, UNDERLINE, ITALIC | DOTTED_UNDERLINE]
+    glyphs = [(rng.choice(attrs), [rng.getrandbits(16) for _ in range(16)]) for _ in range(8)]
+    expected = [model.style_glyph(0, CTRL_DEFAULT, attr, rows) for attr, rows in glyphs]
+    for cycles in (3, 1):
+        sty = Frontdoor(dut, cycles)
+        start = sty.clocks
+        for (attr, rows), styled in zip(glyphs, expected):
+            assert await sty.style_glyph(0, CTRL_DEFAULT, attr, rows) == styled
+        clocks = {"README": (sty.clocks - start) / len(glyphs)}
+        operations = {}
+        for flow in flows:
+            host = Host(CocotbBackend(dut), cycles, PIPELINE, LANES, flow)
+            host.reset()
+            await host.flush()
+            start = (host.operations, host.clocks)
+            result = [host.style_glyph(0, CTRL_DEFAULT, attr, rows) for attr, rows in glyphs]
+            await host.flush()
+            assert [[row.value for row in rows] for rows in result] == expected
+            operations[flow] = (host.operations - start[0]) / len(glyphs)
+            clocks[flow] = (host.clocks - start[1]) / len(glyphs)
+        dut._log.info(
+            f"{cycles}-cycle bus operations: {clocks['README']:.0f} clocks per glyph with the README flow; "
+            + ", ".join(
+                f"{operations[flow]:.0f} bus operations and {clocks[flow]:.0f} clocks per glyph with the {flow} flow"
+                for flow in flows
+            )
+        )
+        if flows == list(FLOWS):
+            assert clocks["stream"] < clocks["burst"] < clocks["README"]
@@ -0,0 +1,112 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Tests of font.py on small synthetic fonts, with the rows expected of each
+# worked out by hand. They need no simulator:
+#
+#   pytest test_font.py
+
+import gzip
+import struct
+
+from font import PSF1_MAGIC, PSF1_MODEHASTAB, PSF2_MAGIC, PSF2_HAS_UNICODE_TABLE, load, load_bdf, load_psf
+
+
+def psf1(height):
+    """Return a PSF1 font of 256 glyphs: glyph n has n in its first row and 0x80 in its last, and maps to U+0100 + n."""
+    glyphs = b"".join(bytes([n]) + bytes(height - 2) + b"\x80" for n in range(256))
+    table = b"".join(struct.pack("<HH", 0x100 + n, 0xFFFF) for n in range(256))
+    return PSF1_MAGIC + bytes([PSF1_MODEHASTAB, height]) + glyphs + table
+
+
+def test_psf1(tmp_path):
+    path = tmp_path / "font.psf"
+    path.write_bytes(psf1(8))
+    font = load(path)
+    assert (len(font), font.width, font.height) == (256, 8, 8)
+    # Each byte is the top byte of a row, and rows below the eighth are blank
+    assert list(font[0x41]) == [0x4100] + [0] * 6 + [0x8000] + [0] * 8
+    assert list(font[0xFF]) == [0xFF00] + [0] * 6 + [0x8000] + [0] * 8
+    assert list(font.glyph(0x141)) == list(font[0x41])
+    assert font.index[0x100] == 0 and font.index[0x1FF] == 255
+
+
+def test_psf2(tmp_path):
+    # Three glyphs of 12x14: two bytes per row, big endian, left aligned
+    rows = [
+        [0xFFF0] + [0] * 13,
+        [0x8010] * 14,
+        [0x0000] * 13 + [0xA5A0],
+    ]
+    glyphs = b"".join(row.to_bytes(2, "big") for glyph in rows for row in glyph)
+    header = struct.pack("<4s7I", PSF2_MAGIC, 0, 32, PSF2_HAS_UNICODE_TABLE, 3, 28, 14, 12)
+    # "A" for glyph 0, "é" and a sequence for glyph 1, "€" and "₠" for glyph 2
+    table = "A".encode() + b"\xff" + "é".encode() + b"\xfe" + "é".encode() + b"\xff" + "€₠".encode() + b"\xff"
+    path = tmp_path / "font.psf.gz"
+    path.write_bytes(gzip.compress(header + glyphs + table))
+    font = load(path)
+    assert (len(font), font.width, font.height) == (3, 12, 14)
+    for glyph, expected in enumerate(rows):
+        assert list(font[glyph]) == expected + [0, 0]
+    assert font.index == {ord("A"): 0, ord("é"): 1, ord("€"): 2, ord("₠"): 2}
+    # The same font, not gzipped and straight from a buffer
+    assert list(load_psf(header + glyphs + table).rows) == list(font.rows)
+
+
+BDF = """STARTFONT 2.1
+FONT test
+SIZE 16 75 75
+FONTBOUNDINGBOX 16 16 0 -2
+CHARS 4
+STARTCHAR full8
+ENCODING 65
+BBX 8 16 0 -2
+BITMAP
+{full8}
+ENDCHAR
+STARTCHAR full16
+ENCODING 66
+BBX 16 16 0 -2
+BITMAP
+{full16}
+ENDCHAR
+STARTCHAR offset
+ENCODING 67
+BBX 4 5 2 1
+BITMAP
+F0
+90
+90
+90
+F0
+ENDCHAR
+STARTCHAR unencoded
+ENCODING -1
+BBX 16 16 0 -2
+BITMAP
+{full16}
+ENDCHAR
+ENDFONT
+"""
+
+
+def test_bdf(tmp_path):
+    full8 = [(0x11 * n) & 0xFF for n in range(16)]
+    full16 = [0x8001 | (n << 4) for n in range(16)]
+    text = BDF.format(
+        full8="\n".join(f"{row:02X}" for row in full8),
+        full16="\n".join(f"{row:04X}" for row in full16),
+    )
+    path = tmp_path / "font.bdf"
+    path.write_text(text)
+    font = load(path)
+    assert (len(font), font.width, font.height) == (3, 16, 16)
+    assert font.index == {65: 0, 66: 1, 67: 2}
+    # A whole cell 8 pixels wide is left aligned
+    assert list(font.glyph(65)) == [row << 8 for row in full8]
+    assert list(font.glyph(66)) == full16
+    # 4x5 pixels at (2, 1) from the origin, which is 2 rows above the bottom
+    # of the cell: the top row is 16 - 2 - (1 + 5) = 8 and the pixels start
+    # 2 columns in, so 0xF0 becomes 0x3C00
+    assert list(font.glyph(67)) == [0] * 8 + [0x3C00, 0x2400, 0x2400, 0x2400, 0x3C00] + [0] * 3
+    assert list(load_bdf(text.encode()).rows) == list(font.rows)
@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Tests of glyphcache.py, against model.style_glyphs. They need no
+# simulator:
+#
+#   pytest test_glyphcache.py
+
+import random
+
+import model
+from glyphcache import GlyphCache, canonical
+
+
+def random_glyph(rng):
+    return [rng.getrandbits(16) for _ in range(16)]
+
+
+def random_style(rng):
+    return rng.getrandbits(8), rng.getrandbits(8), rng.getrandbits(32)
+
+
+def test_canonical():
+    # A bit cleared by canonical() that does change the result would make
+    # the cache return another style's glyphs
+    rng = random.Random(1)
+    changed = 0
+    for _ in range(3000):
+        phase, ctrl, attr = random_style(rng)
+        glyphs = [random_glyph(rng), random_glyph(rng)]
+        style = canonical(phase, ctrl, attr)
+        assert model.style_glyphs(*style, glyphs) == model.style_glyphs(phase, ctrl, attr, glyphs), (phase, ctrl, attr)
+        assert canonical(*style) == style
+        changed += style != (phase, ctrl, attr)
+    assert changed > 1000
+
+
+def test_round_trip(tmp_path):
+    rng = random.Random(2)
+    requests = [(*random_style(rng), [random_glyph(rng) for _ in range(rng.randrange(1, 8))]) for _ in range(50)]
+    cells = sum(len(glyphs) for _, _, _, glyphs in requests)
+    for run in ("cold", "warm"):
+        with GlyphCache(tmp_path / "glyphs.sqlite") as cache:
+            for phase, ctrl, attr, glyphs in requests:
+                assert cache.style_glyphs(phase, ctrl, attr, glyphs) == model.style_glyphs(phase, ctrl, attr, glyphs)
+            assert (cache.hits, cache.misses) == ((0, cells) if run == "cold" else (cells, 0)), run
+
+
+def test_version_change(tmp_path):
+    rng = random.Random(3)
+    phase, ctrl, attr = random_style(rng)
+    glyphs = [random_glyph(rng) for _ in range(4)]
+    path = tmp_path / "glyphs.sqlite"
+    with GlyphCache(path, version="old") as cache:
+        cache.style_glyphs(phase, ctrl, attr, glyphs)
+    with GlyphCache(path, version="old") as cache:
+        assert cache.style_glyphs(phase, ctrl, attr, glyphs) == model.style_glyphs(phase, ctrl, attr, glyphs)
+        assert cache.hits == len(glyphs)
+    with GlyphCache(path, version="new") as cache:
+        assert cache.db.execute("SELECT COUNT(*) FROM glyphs").fetchone() == (0,)
+        assert cache.style_glyphs(phase, ctrl, attr, glyphs) == model.style_glyphs(phase, ctrl, attr, glyphs)
+        assert (cache.hits, cache.misses) == (0, len(glyphs))
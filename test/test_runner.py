@@ -0,0 +1,23 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# pytest entry point for the cocotb tests: one item per test group in
+# test.py and one per random-seed shard of the bench.py workload.
+#
+#   pytest -n auto test_runner.py
+#   pytest test_runner.py --sim verilator --shards 16 --shard-vectors 5000
+#
+# See conftest.py for the options and how the build is shared.
+
+
+def test_group(sim, group):
+    sim("test", testcase=group)
+
+
+def test_random(sim, seed, pytestconfig):
+    sim(
+        "bench",
+        BENCH_SEED=str(seed),
+        BENCH_VECTORS=str(pytestconfig.getoption("shard_vectors")),
+        BENCH_CYCLES="1",
+    )
@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Tests of sgr.py. They need no simulator:
+#
+#   pytest test_sgr.py
+
+import array
+
+from model import BOLD, ITALIC, UNDERLINE, DOUBLE_UNDERLINE, DOTTED_UNDERLINE, INVERSE, X_SCALE
+from sgr import CACHE_SIZE, Parser, cached_sgr_masks
+
+
+def parse(*chunks, attr=0, cache=True):
+    """Feed chunks to a new parser, returning the cells as (text, [attr, ...])."""
+    parser = Parser(attr, cache)
+    size = sum(len(chunk) for chunk in chunks)
+    glyphs = bytearray(size)
+    attrs = array.array("L", [0]) * size
+    pos = 0
+    for chunk in chunks:
+        pos = parser.feed(chunk, glyphs, attrs, pos)
+    return bytes(glyphs[:pos]), list(attrs[:pos])
+
+
+def test_sgr():
+    for cache in (True, False):
+        assert parse(b"a\x1b[1mb\x1b[4;7mc\x1b[22;24md\x1b[0me", cache=cache) == (
+            b"abcde", [0, BOLD, BOLD | UNDERLINE | INVERSE, INVERSE, 0]
+        )
+    # Underline styles replace each other, and SGR 0 keeps the line's X and Y attributes
+    assert parse(b"\x1b[4ma\x1b[21mb\x1b[4:4mc\x1b[4:0md\x1b[me", attr=X_SCALE) == (
+        b"abcde", [X_SCALE | UNDERLINE, X_SCALE | DOUBLE_UNDERLINE, X_SCALE | DOTTED_UNDERLINE, X_SCALE, X_SCALE]
+    )
+
+
+def test_csi_split():
+    expected = (b"abcd", [0, 0, BOLD | UNDERLINE, BOLD | UNDERLINE])
+    assert parse(b"ab\x1b", b"[1;4mcd") == expected
+    assert parse(b"ab\x1b[1", b";", b"4mcd") == expected
+    assert parse(b"ab\x1b[1;4", b"m", b"cd") == expected
+
+
+def test_extended_colours():
+    # The colour values are not SGR parameters, in either form
+    assert parse(b"\x1b[38;2;1;4;9;3ma") == (b"a", [ITALIC])
+    assert parse(b"\x1b[48;5;4;1ma") == (b"a", [BOLD])
+    assert parse(b"\x1b[38:5:4;1ma") == (b"a", [BOLD])
+    assert parse(b"\x1b[58:2::1:4:9;7ma") == (b"a", [INVERSE])
+    assert parse(b"\x1b[38;2;1;4", b";9ma") == (b"a", [0])
+
+
+def test_osc_split():
+    assert parse(b"x\x1b]0;ti", b"tle\x1b", b"\\y") == (b"xy", [0, 0])
+    assert parse(b"x\x1b", b"]2;\x1b[1m", b"\x07\x1b[1my") == (b"xy", [0, BOLD])
+
+
+def test_private():
+    assert parse(b"a\x1b[?25lb\x1b[?25hc") == (b"abc", [0, 0, 0])
+    assert parse(b"\x1b[?4ma\x1b[>1mb") == (b"ab", [0, 0])
+    assert parse(b"a\x1b[?2", b"5lb") == (b"ab", [0, 0])
+
+
+def test_cache_bounded():
+    cached_sgr_masks.cache_clear()
+    parse(*(b"\x1b[38;2;%d;%d;%dm." % (n >> 16, (n >> 8) & 0xFF, n & 0xFF) for n in range(2 * CACHE_SIZE)))
+    assert cached_sgr_masks.cache_info().currsize == CACHE_SIZE
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Compare the critical path of the design built with 0, 1 and 2 pipeline
+# registers in the styler (STYLER_PIPELINE in project.v), and the size of
+# the single and dual-lane builds (STYLER_LANES) with the modes and palette
+# built in (STYLER_MODES and STYLER_PALETTE).
+#
+# Each build is synthesized with yosys. With a liberty file (by default
+# the sky130_fd_sc_hd typical corner under $PDK_ROOT) it is mapped to
+# standard cells and OpenSTA reports the worst slack at the CLOCK_PERIOD
+# in src/config.json; without one, or without OpenSTA, the generic gate
+# depth of the longest path between registers and pins is reported
+# instead. Inputs and outputs are constrained with zero delay, so paths
+# from the pins and to the pins count in full. The size is given in cells
+# and flip-flops, and with a liberty file as the cell area against the
+# 1x1 tile in info.yaml.
+#
+# The yosys script, SDC constraints and OpenSTA script for each build are
+# left in sim_build/timing/p<N>-l<lanes>-m<modes>, so they can be rerun or
+# adapted by hand.
+#
+#   ./timing.py
+#   ./timing.py --pipeline 0 --pipeline 2 --liberty path/to/cells.lib
+#   ./timing.py --lanes 1 --lanes 2
+#   ./timing.py --pipeline 0 --modes 254 --palette
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from model import MODES_DEFAULT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+TOP = "tt_um_rebeccargb_styler"
+
+# Keep in sync with PROJECT_SOURCES in the Makefile.
+PROJECT_SOURCES = ["project.v", "styler.v"]
+
+# A 1x1 tile, in square microns (see info.yaml).
+TILE_AREA = 167 * 108
+
+
+def clock_period():
+    with open(os.path.join(ROOT, "src", "config.json")) as f:
+        return float(json.load(f)["CLOCK_PERIOD"])
+
+
+def default_liberty():
+    if "PDK_ROOT" not in os.environ:
+        return None
+    path = os.path.join(
+        os.environ["PDK_ROOT"], "sky130A", "libs.ref", "sky130_fd_sc_hd", "lib",
+        "sky130_fd_sc_hd__tt_025C_1v80.lib",
+    )
+    return path if os.path.exists(path) else None
+
+
+def relative(path):
+    # The tools run in the repository root, so paths are given relative to it.
+    return os.path.relpath(path, ROOT)
+
+
+def yosys_script(pipeline, lanes, modes, palette, liberty, period, work):
+    sources = " ".join(relative(os.path.join(ROOT, "src", source)) for source in PROJECT_SOURCES)
+    defines = f"-DSTYLER_PIPELINE={pipeline} -DSTYLER_LANES={lanes} -DSTYLER_MODES={modes} -DSTYLER_PALETTE={int(palette)}"
+    lines = [
+        f"read_verilog {defines} {sources}",
+        f"synth -flatten -top {TOP}",
+    ]
+    if liberty:
+        lines += [
+            f"dfflibmap -liberty {relative(liberty)}",
+            f"abc -D {period * 1000:.0f} -liberty {relative(liberty)}",
+            "opt_clean",
+            f"tee -o {relative(os.path.join(work, 'stat.txt'))} stat -liberty {relative(liberty)}",
+            f"write_verilog -noattr {relative(os.path.join(work, 'netlist.v'))}",
+        ]
+    else:
+        lines += [
+            "abc -g AND,NAND,OR,NOR,XOR,XNOR,MUX",
+            "opt_clean",
+            f"tee -o {relative(os.path.join(work, 'stat.txt'))} stat",
+        ]
+    # Longest combinational path between flip-flops and ports, in cells
+    lines.append(f"tee -o {relative(os.path.join(work, 'ltp.txt'))} ltp -noff")
+    return "\n".join(lines) + "\n"
+
+
+def sdc(period):
+    return "\n".join([
+        f"create_clock -name clk -period {period} [get_ports clk]",
+        "set clk_index [lsearch [all_inputs] [get_ports clk]]",
+        "set_input_delay 0 -clock clk [lreplace [all_inputs] $clk_index $clk_index]",
+        "set_output_delay 0 -clock clk [all_outputs]",
+    ]) + "\n"
+
+
+def sta_script(liberty, work):
+    return "\n".join([
+        f"read_liberty {relative(liberty)}",
+        f"read_verilog {relative(os.path.join(work, 'netlist.v'))}",
+        f"link_design {TOP}",
+        f"read_sdc {relative(os.path.join(work, 'constraints.sdc'))}",
+        "report_checks -path_delay max -fields {fanout} -digits 3",
+        "report_worst_slack -max -digits 3",
+        "exit",
+    ]) + "\n"
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def run(cmd, log):
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    write(log, proc.stdout + proc.stderr)
+    return proc.stdout if proc.returncode == 0 else None
+
+
+def build_name(pipeline, lanes, args):
+    return f"p{pipeline}-l{lanes}-m{args.modes}" + ("-palette" if args.palette else "")
+
+
+def analyze(pipeline, lanes, args, period):
+    """Return a result row for one build, or None if synthesis failed."""
+    work = os.path.join(HERE, "sim_build", "timing", build_name(pipeline, lanes, args))
+    os.makedirs(work, exist_ok=True)
+    liberty = args.liberty
+    write(os.path.join(work, "synth.ys"), yosys_script(pipeline, lanes, args.modes, args.palette, liberty, period, work))
+    write(os.path.join(work, "constraints.sdc"), sdc(period))
+    if run([args.yosys, "-q", relative(os.path.join(work, "synth.ys"))], os.path.join(work, "yosys.log")) is None:
+        return None
+
+    row = {"pipeline": pipeline, "lanes": lanes}
+    with open(os.path.join(work, "ltp.txt")) as f:
+        found = re.search(r"length=(\d+)", f.read())
+    row["depth"] = int(found.group(1)) if found else None
+    with open(os.path.join(work, "stat.txt")) as f:
+        stat = f.read()
+    found = re.search(r"(\d+)\s+cells", stat)
+    row["cells"] = int(found.group(1)) if found else None
+    row["flops"] = sum(int(n) for n, cell in re.findall(r"(\d+)\s+(\S*df\S*)", stat, re.IGNORECASE))
+    found = re.search(r"Chip area for module .*:\s+([\d.]+)", stat)
+    if found:
+        row["area"] = float(found.group(1))
+
+    if liberty and shutil.which(args.sta):
+        write(os.path.join(work, "sta.tcl"), sta_script(liberty, work))
+        out = run([args.sta, "-no_init", "-exit", relative(os.path.join(work, "sta.tcl"))], os.path.join(work, "sta.log"))
+        found = re.search(r"worst slack\s+(-?[\d.]+)", out or "")
+        if found:
+            row["slack"] = float(found.group(1))
+            row["arrival"] = period - row["slack"]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the critical path with 0, 1 and 2 pipeline registers, and one or two lanes.")
+    parser.add_argument("--pipeline", type=int, action="append", choices=[0, 1, 2],
+                        help="pipeline registers to analyze (default: all)")
+    parser.add_argument("--lanes", type=int, action="append", choices=[1, 2],
+                        help="styler lanes to analyze (default: 1)")
+    parser.add_argument("--modes", type=int, default=MODES_DEFAULT,
+                        help=f"modes to build in, see STYLER_MODES (default: {MODES_DEFAULT})")
+    parser.add_argument("--palette", action="store_true", help="build in the attribute palette, see STYLER_PALETTE")
+    parser.add_argument("--liberty", default=default_liberty(),
+                        help="liberty file for cell mapping and timing (default: sky130_fd_sc_hd under $PDK_ROOT)")
+    parser.add_argument("--period", type=float, help="clock period in ns (default: CLOCK_PERIOD in src/config.json)")
+    parser.add_argument("--yosys", default=os.environ.get("YOSYS", "yosys"), help="yosys command")
+    parser.add_argument("--sta", default=os.environ.get("STA", "sta"), help="OpenSTA command")
+    args = parser.parse_args()
+
+    if not shutil.which(args.yosys):
+        sys.exit(f"{args.yosys} not found.")
+    period = args.period or clock_period()
+
+    print(f"clock period {period:g} ns ({1000 / period:.1f} MHz), modes {args.modes}" + (" with the palette" if args.palette else ""))
+    for lanes in args.lanes or [1]:
+        for pipeline in args.pipeline or [0, 1, 2]:
+            name = f"pipeline {pipeline}" + (f", {lanes} lanes" if lanes > 1 else "")
+            row = analyze(pipeline, lanes, args, period)
+            if row is None:
+                print(f"{name}: synthesis failed (see sim_build/timing/{build_name(pipeline, lanes, args)}/yosys.log)")
+                continue
+            line = f"{name}: {row['cells']} cells ({row['flops']} flip-flops)"
+            if "area" in row:
+                line += f", {row['area']:.0f} um2 ({100 * row['area'] / TILE_AREA:.0f}% of a 1x1 tile)"
+            line += f", longest path {row['depth']} cells deep"
+            if "slack" in row:
+                line += (
+                    f", worst slack {row['slack']:.3f} ns"
+                    f" ({row['arrival']:.3f} ns, {1000 / row['arrival']:.1f} MHz)"
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
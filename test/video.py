@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: © 2024 Rebecca G. Bettencourt
+# SPDX-License-Identifier: Apache-2.0
+
+# Timing model of a text display built around the styler, following the
+# blocks of docs/tmvdh.svg: the hsync and vsync timers count out the raster,
+# the vram holds the glyph and attr of each cell (Screen), the chargen the
+# rows of each glyph (the font), the linegen, styler and inverter style them
+# (model.style_glyphs, for all the cells with the same attributes at once)
+# and the out mux gives the pixels, blank outside the active area.
+#
+# render() draws a frame as packed 1bpp rows, leftmost pixel in the top bit,
+# and raster() gives the hsync, vsync and pixel levels for every pixel
+# clock of a frame, blanking included. Cells are 16 pixels by 16 scanlines.
+#
+# The bus budget is the time a host has to style one row of a character:
+# a character time (16 pixel clocks) if each row is styled just in time, as
+# with shift mode, or a whole line over the number of columns if each line
+# is styled during the one before. The clocks per character are measured by
+# styling a row of characters in raster order on the model with host.Host,
+# for each flow, and with the 18 README steps as written (readme_row).
+#
+# Frames can also be drawn straight into a memory-mapped file (FrameFile),
+# a ring of frames after a small header, for a viewer or encoder to read
+# without copying them, or as a recording of a whole run to compare against
+# another (read_frames).
+#
+# Run as a script, it reports the clocks per character, the bus clock each
+# flow needs and whether it fits at --bus-mhz, and the render time. With
+# --output, the frames rendered are written to a frame file: an animation
+# blinking as in blink mode, with the cursor moving a cell a frame
+# (frame_state):
+#
+#   ./video.py --bus-mhz 50
+#   ./video.py --mode 800x600@60 --pipeline 2
+#   ./video.py --mode 640x480@60 --frames 128 --blink-rate 3 --output blink.fb
+#   ./video.py --font /usr/share/consolefonts/Lat15-Terminus16.psf.gz
+
+import argparse
+import array
+import collections
+import mmap
+import random
+import struct
+import sys
+import time
+
+import model
+from font import Font, load as load_font
+from host import Host, ModelBackend, Pending, FLOWS
+from model import LINE, BMAP, CURSOR, CTRL_DEFAULT
+
+CELL = 16
+
+# Header of a FrameFile, all integers little endian
+HEADER_FIELDS = ["magic", "header_size", "width", "height", "stride", "frames", "published"]
+HEADER = struct.Struct("<8sIIIIIQ")
+PUBLISHED = struct.Struct("<Q")
+MAGIC = b"STYLERFB"
+# The frames start on a page boundary
+HEADER_SIZE = 4096
+
+Mode = collections.namedtuple("Mode", [
+    "pixel_mhz",
+    "h_active", "h_front", "h_sync", "h_back", "h_polarity",
+    "v_active", "v_front", "v_sync", "v_back", "v_polarity",
+])
+
+# VESA DMT timings; polarity 0 means an active low sync pulse.
+MODES = {
+    "640x480@60": Mode(25.175, 640, 16, 96, 48, 0, 480, 10, 2, 33, 0),
+    "800x600@60": Mode(40.0, 800, 40, 128, 88, 1, 600, 1, 4, 23, 1),
+}
+
+
+def h_total(mode):
+    return mode.h_active + mode.h_front + mode.h_sync + mode.h_back
+
+
+def v_total(mode):
+    return mode.v_active + mode.v_front + mode.v_sync + mode.v_back
+
+
+def text_size(mode):
+    """Return the (columns, rows) of whole cells in the active area."""
+    return mode.h_active // CELL, mode.v_active // CELL
+
+
+class Screen:
+    """The vram: glyph codes and attr words of columns x rows cells, and the cursor cell."""
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.glyphs = array.array("H", [0]) * (columns * rows)
+        self.attrs = array.array("L", [0]) * (columns * rows)
+        self.cursor = None
+
+
+class Frame:
+    """The active area of a frame as packed 1bpp rows, stride bytes apart.
+
+    The rows are in pixels from offset on: a new bytearray by default, or a
+    slot of a FrameFile.
+    """
+
+    def __init__(self, mode, pixels=None, offset=0):
+        self.mode = mode
+        self.stride = mode.h_active // 8
+        self.size = self.stride * mode.v_active
+        self.pixels = bytearray(self.size) if pixels is None else pixels
+        self.offset = offset
+
+    def row(self, y):
+        start = self.offset + y * self.stride
+        return memoryview(self.pixels)[start:start + self.stride]
+
+
+class FrameFile:
+    """A ring of frames in a memory-mapped file, for a viewer or encoder to read as they are drawn.
+
+    The file starts with HEADER (then zeros up to header_size), followed by
+    the frames as packed rows. published counts the frames published so
+    far, so the latest is in slot (published - 1) % frames; with two or more
+    slots, it is not drawn over until the next one is published. With as
+    many slots as frames, the file is a recording of the whole run.
+    """
+
+    def __init__(self, path, mode, frames=2):
+        self.mode = mode
+        self.frames = frames
+        self.published = 0
+        self.size = (mode.h_active // 8) * mode.v_active
+        with open(path, "w+b") as f:
+            f.truncate(HEADER_SIZE + self.size * frames)
+            self.map = mmap.mmap(f.fileno(), 0)
+        HEADER.pack_into(self.map, 0, MAGIC, HEADER_SIZE, mode.h_active, mode.v_active, mode.h_active // 8, frames, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Unmap the file; frames from next() must not be in use."""
+        self.map.close()
+
+    def next(self):
+        """Return the frame to draw next, in its slot of the file."""
+        return Frame(self.mode, self.map, HEADER_SIZE + (self.published % self.frames) * self.size)
+
+    def publish(self):
+        """Mark the frame from next() as the latest."""
+        self.published += 1
+        PUBLISHED.pack_into(self.map, HEADER.size - PUBLISHED.size, self.published)
+
+
+def read_frames(path):
+    """Return (header, frames) for a FrameFile: its HEADER fields as a dict, and its published frames, oldest first.
+
+    Each frame is a memoryview of packed rows, straight from the file.
+    """
+    with open(path, "rb") as f:
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    header = dict(zip(HEADER_FIELDS, HEADER.unpack_from(data)))
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a frame file")
+    size = header["stride"] * header["height"]
+    first = max(0, header["published"] - header["frames"])
+    frames = []
+    for number in range(first, header["published"]):
+        start = header["header_size"] + (number % header["frames"]) * size
+        frames.append(data[start:start + size])
+    return header, frames
+
+
+def style_screen(screen, font, ctrl, phase, style_glyphs=model.style_glyphs):
+    """Style every cell of screen, returning its 16 styled rows in cell order.
+
+    Cells with the same attributes (and cursor) are styled together, and
+    each distinct (glyph, attr) pair only once, with style_glyphs (or a
+    cache of it, glyphcache.GlyphCache.style_glyphs).
+    """
+    groups = {}
+    for index, (glyph, attr) in enumerate(zip(screen.glyphs, screen.attrs)):
+        cursor = CURSOR if screen.cursor == (index % screen.columns, index // screen.columns) else 0
+        groups.setdefault((phase | cursor, attr), {}).setdefault(glyph, []).append(index)
+    cells = [None] * len(screen.glyphs)
+    for (cell_phase, attr), glyphs in groups.items():
+        styled = style_glyphs(cell_phase, ctrl, attr, [font[glyph] for glyph in glyphs])
+        for rows, indices in zip(styled, glyphs.values()):
+            for index in indices:
+                cells[index] = rows
+    return cells
+
+
+def render(mode, screen, font, ctrl=CTRL_DEFAULT, phase=0, frame=None, style_glyphs=model.style_glyphs):
+    """Draw screen into frame (a new Frame by default) and return it.
+
+    font is indexed by glyph code, each glyph a list of 16 rows indexed by
+    logical scanline. Lines below the last whole row of cells are blank.
+    """
+    if frame is None:
+        frame = Frame(mode)
+    cells = style_screen(screen, font, ctrl, phase, style_glyphs)
+    line = array.array("H", [0]) * screen.columns
+    for y in range(min(screen.rows * CELL, mode.v_active)):
+        base, scanline = (y // CELL) * screen.columns, y % CELL
+        for x in range(screen.columns):
+            line[x] = cells[base + x][scanline]
+        if sys.byteorder == "little":
+            line.byteswap()
+        frame.row(y)[:len(line) * 2] = memoryview(line).cast("B")
+    return frame
+
+
+def raster(frame):
+    """Yield (hsync, vsync, pixel) pin levels for every pixel clock of frame, in raster order."""
+    mode = frame.mode
+    for y in range(v_total(mode)):
+        vsync = int(mode.v_active + mode.v_front <= y < mode.v_active + mode.v_front + mode.v_sync) ^ (1 - mode.v_polarity)
+        row = frame.row(y) if y < mode.v_active else None
+        for x in range(h_total(mode)):
+            hsync = int(mode.h_active + mode.h_front <= x < mode.h_active + mode.h_front + mode.h_sync) ^ (1 - mode.h_polarity)
+            pixel = (row[x >> 3] >> (7 - (x & 7))) & 1 if row is not None and x < mode.h_active else 0
+            yield hsync, vsync, pixel
+
+
+def blink_phase(number, rate=4):
+    """Return the phase pins for frame number as blink mode drives them, toggling every 2**rate frames."""
+    return model.BLINK_PHASE if (number >> rate) & 1 else 0
+
+
+def frame_state(number, screen, rate=4):
+    """Return (phase, cursor) of frame number of the animation of screen, the cursor moving a cell a frame."""
+    cell = number % (screen.columns * screen.rows)
+    return blink_phase(number, rate), (cell % screen.columns, cell // screen.columns)
+
+
+def readme_row(host, phase, ctrl, attr, scanline, bitmap):
+    """Queue one row following the 18 README steps as written, returning the styled row as a host.Pending.
+
+    Unlike Host.style_row, the scanline and both halves of the bitmap are
+    written and the logical scanline is read back for every row, even when
+    the chip already holds them. host must use the single flow.
+    """
+    host.set_ctrl(ctrl, phase)
+    host.set_attr(attr, phase)
+    host.access(0x40, phase, LINE, [scanline])
+    host.access(0x80, phase, LINE, [None])
+    host.access(0x40, phase, BMAP | 0, [bitmap & 0xFF])
+    host.access(0x40, phase, BMAP | 1, [bitmap >> 8])
+    host.scanline = scanline
+    host.bitmap = [bitmap & 0xFF, bitmap >> 8]
+    host.settle(phase)
+    (low,) = host.access(0x80, phase, BMAP | 0, [None])
+    (high,) = host.access(0x80, phase, BMAP | 1, [None])
+    result = Pending()
+    result.bind(host.batch, low, high)
+    return result
+
+
+def clocks_per_character(screen, font, flow, cycles=1, pipeline=0, ctrl=CTRL_DEFAULT, phase=0, row=0):
+    """Style one row of cells of screen in raster order with the host flow ("readme" for readme_row).
+
+    Return the average clocks per character, checked against render().
+    """
+    host = Host(ModelBackend(pipeline), cycles, pipeline, flow="single" if flow == "readme" else flow)
+    host.reset()
+    host.flush()
+    start = host.clocks
+    cells = style_screen(screen, font, ctrl, phase)
+    result = []
+    for scanline in range(CELL):
+        for x in range(screen.columns):
+            index = row * screen.columns + x
+            cell_phase = phase | (CURSOR if screen.cursor == (x, row) else 0)
+            attr = screen.attrs[index]
+            rows = font[screen.glyphs[index]]
+            bitmap = rows[model.styler(cell_phase, ctrl, attr, scanline, 0)[0]]
+            if flow == "readme":
+                result.append(readme_row(host, cell_phase, ctrl, attr, scanline, bitmap))
+            else:
+                result.append(host.style_row(cell_phase, ctrl, attr, scanline, bitmap))
+    host.flush()
+    expected = [cells[row * screen.columns + x][scanline] for scanline in range(CELL) for x in range(screen.columns)]
+    assert [pending.value for pending in result] == expected, f"{flow} flow does not match render()"
+    return (host.clocks - start) / (CELL * screen.columns)
+
+
+def budget(mode, clocks, bus_mhz):
+    """Return (just in time, line buffered): the bus clock in MHz needed for clocks per character, and whether bus_mhz is enough."""
+    columns = text_size(mode)[0]
+    just_in_time = clocks * mode.pixel_mhz / CELL
+    line_buffered = clocks * columns * mode.pixel_mhz / h_total(mode)
+    return (just_in_time, just_in_time <= bus_mhz), (line_buffered, line_buffered <= bus_mhz)
+
+
+def sample_font(rng, count=256):
+    """Return count random glyphs, with blank rows above and below as in a real font."""
+    return [[0, 0] + [rng.getrandbits(16) & 0x7FFE for _ in range(11)] + [0, 0, 0] for _ in range(count)]
+
+
+def sample_screen(rng, mode, index=None):
+    """Return a screen of random text, with attributes from a short list as in running text.
+
+    index maps the characters to glyph numbers (font.Font.index), if they are not the same.
+    """
+    attrs = [0, 0, 0, 0, model.BOLD, model.UNDERLINE, model.INVERSE, model.ITALIC | model.DOTTED_UNDERLINE]
+    screen = Screen(*text_size(mode))
+    attr = 0
+    for cell in range(len(screen.glyphs)):
+        if rng.random() < 0.1:
+            attr = rng.choice(attrs)
+        code = rng.randrange(0x20, 0x7F)
+        screen.glyphs[cell] = code if index is None else index.get(code, 0)
+        screen.attrs[cell] = attr
+    screen.cursor = (0, 0)
+    return screen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check which styler flows keep up with a video mode.")
+    parser.add_argument("--mode", action="append", choices=sorted(MODES),
+                        help="video mode, may be given more than once (default: all)")
+    parser.add_argument("--bus-mhz", type=float, default=25, help="bus clock of the host (default: 25)")
+    parser.add_argument("--pipeline", type=int, default=0, choices=[0, 1, 2],
+                        help="pipeline registers of the chip, see STYLER_PIPELINE (default: 0)")
+    parser.add_argument("--frames", type=int, default=4, help="frames to render for the render time (default: 4)")
+    parser.add_argument("--font", help="PSF or BDF font to render the text with (default: random glyphs)")
+    parser.add_argument("--blink-rate", type=int, default=4, choices=range(8),
+                        help="blink phases toggle every 2**rate frames, as in blink mode (default: 4)")
+    parser.add_argument("--output", help="frame file to write the rendered frames to (see FrameFile)")
+    parser.add_argument("--ring", type=int, help="frames in the ring of the frame file (default: all of them)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    args = parser.parse_args()
+    if args.output and len(args.mode or MODES) != 1:
+        parser.error("--output needs a single --mode")
+
+    rng = random.Random(args.seed)
+    font = load_font(args.font) if args.font else sample_font(rng)
+    for name in args.mode or sorted(MODES):
+        mode = MODES[name]
+        columns, rows = text_size(mode)
+        screen = sample_screen(rng, mode, font.index if isinstance(font, Font) else None)
+        print(
+            f"{name}: {columns}x{rows} characters, {mode.pixel_mhz:g} MHz pixel clock, "
+            f"{CELL / mode.pixel_mhz * 1e3:.1f} ns per character, {args.bus_mhz:g} MHz bus clock"
+        )
+        for cycles in (3, 1):
+            for flow in ["readme"] + list(FLOWS):
+                clocks = clocks_per_character(screen, font, flow, cycles, args.pipeline)
+                (jit, jit_fits), (buffered, buffered_fits) = budget(mode, clocks, args.bus_mhz)
+                print(
+                    f"  {cycles}-cycle bus operations, {flow} flow: {clocks:.1f} clocks per character, "
+                    f"needs {jit:.0f} MHz just in time ({'fits' if jit_fits else 'too slow'}), "
+                    f"{buffered:.0f} MHz line buffered ({'fits' if buffered_fits else 'too slow'})"
+                )
+        frames = FrameFile(args.output, mode, args.ring or args.frames) if args.output else None
+        frame = Frame(mode)
+        start = time.perf_counter()
+        for number in range(args.frames):
+            if frames is not None:
+                frame = frames.next()
+            phase, screen.cursor = frame_state(number, screen, args.blink_rate)
+            render(mode, screen, font, phase=phase, frame=frame)
+            if frames is not None:
+                frames.publish()
+        elapsed = (time.perf_counter() - start) / args.frames
+        print(f"  render: {elapsed * 1e3:.1f} ms per frame ({1 / elapsed:.1f} frames per second)")
+        if frames is not None:
+            del frame
+            frames.close()
+            print(f"  wrote {args.frames} frames to {args.output}")
+
+
+if __name__ == "__main__":
+    main()